@@ -1,17 +1,26 @@
+from startup import StartupTimer, run_in_background
+import asyncio
 import os
 import re
 import sys
 import subprocess
 import tkinter as tk
 from tkinter import scrolledtext
-import google.generativeai as genai
 import threading
+from concurrent.futures import CancelledError
+from output_stream import console_encoding, stream_process
+from process_group import interrupt_process, new_group_options
+from render_pump import RenderPump
+from translation_cache import TranslationCache
+from fast_path import get_translator
+from llm_client import AsyncLLMClient
+from llm_provider import provider_from_environment
 
 GOOGLE_API_KEY = "place your api key here"
 
 
 class NaturalLanguageTerminal:
-    def __init__(self, root):
+    def __init__(self, root, timer=None):
         self.root = root
         self.root.title("Easy Terminal for PowerShell")
         self.root.configure(bg='navy blue')
@@ -23,21 +32,31 @@ class NaturalLanguageTerminal:
         self.command_history = []
         self.history_index = 0
         self.current_directory = os.getcwd()
+        self.foreground_process = None
 
         self.terminal = scrolledtext.ScrolledText(root, bg=self.bg_color, fg=self.text_color,
                                                   font=self.terminal_font, insertbackground=self.text_color)
         self.terminal.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.pump = RenderPump(self.root, self.write_output, self.scroll_to_end)
 
         self.input_start = "1.0"
         self.input_active = False
         self.current_command = ""
 
-        self.setup_genai()
+        self.timer = timer or StartupTimer()
+        self.provider = None
+        self.setup_error = None
+        self.llm_ready = run_in_background(self.timer.timed, "LLM setup", self.setup_llm)
+        self.translation_cache = TranslationCache()
+        self.fast_path = get_translator('powershell')
+        self.output_encoding = console_encoding()
+        self.llm_client = AsyncLLMClient()
 
         self.terminal.bind('<Return>', self.handle_return)
         self.terminal.bind('<BackSpace>', self.handle_backspace)
         self.terminal.bind('<Up>', self.handle_up)
         self.terminal.bind('<Down>', self.handle_down)
+        self.terminal.bind('<Control-c>', self.handle_interrupt)
 
         welcome_msg = "Welcome to Natural Language Terminal for PowerShell\n"
         welcome_msg += "- Type PowerShell commands OR natural language\n"
@@ -48,14 +67,23 @@ class NaturalLanguageTerminal:
         self.terminal.config(state=tk.NORMAL)
         self.terminal.focus_set()
 
-    def setup_genai(self):
+    def setup_llm(self):
         try:
-            genai.configure(api_key=GOOGLE_API_KEY)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+            self.provider = provider_from_environment(GOOGLE_API_KEY, 'genai')
         except Exception as e:
-            self.append_output(f"Error initializing AI: {str(e)}\n")
+            self.provider = None
+            self.setup_error = f"Error initializing AI: {str(e)}"
+
+    async def ask_llm(self, prompt):
+        await asyncio.shield(asyncio.wrap_future(self.llm_ready))
+        if self.provider is None:
+            raise RuntimeError(self.setup_error)
+        return await self.provider.agenerate(prompt)
 
     def display_prompt(self):
+        self.pump.call(self.draw_prompt)
+
+    def draw_prompt(self):
         self.enable_text_widget()
         prompt = f"{self.current_directory}> "
         self.terminal.insert(tk.END, prompt)
@@ -64,8 +92,13 @@ class NaturalLanguageTerminal:
         self.input_active = True
 
     def append_output(self, text):
+        self.pump.put(text)
+
+    def write_output(self, text):
         self.enable_text_widget()
         self.terminal.insert(tk.END, text)
+
+    def scroll_to_end(self):
         self.terminal.see(tk.END)
 
     def get_current_command(self):
@@ -88,6 +121,11 @@ class NaturalLanguageTerminal:
                 self.root.quit()
                 return "break"
 
+            if command.lower() == ':startup':
+                self.append_output(self.timer.report())
+                self.display_prompt()
+                return "break"
+
             if command.lower() in ['clear', 'cls']:
                 self.clear_terminal()
                 return "break"
@@ -102,6 +140,18 @@ class NaturalLanguageTerminal:
             return "break"
         return
 
+    def handle_interrupt(self, event):
+        # Ctrl+Break to the running command, then kill its process tree
+        process = self.foreground_process
+        if process is not None:
+            threading.Thread(target=interrupt_process, args=(process,), daemon=True).start()
+            self.append_output("^C\n")
+            return "break"
+        self.llm_client.cancel_all()
+        self.append_output("\n^C\n")
+        self.display_prompt()
+        return "break"
+
     def handle_up(self, event):
         if not self.command_history or self.history_index <= 0:
             return "break"
@@ -135,20 +185,11 @@ class NaturalLanguageTerminal:
         command_type = self.detect_command_type(command)
 
         if command_type == 'powershell':
-            output = self.execute_powershell_command(command)
-            self.append_output(output)
+            self.stream_powershell_command(command, self.append_output)
         else:
             self.append_output(f"Translating: {command}\n")
             try:
-                prompt = f"""
-You are an AI that converts natural language requests into PowerShell commands.
-Current directory: {self.current_directory}
-User query: {command}
-Provide ONLY the PowerShell command without any explanations.
-If no valid command exists, return "ERROR: Unable to translate."
-                """
-                response = self.model.generate_content(prompt)
-                translated_command = response.text.strip()
+                translated_command = self.translate_command(command)
 
                 if translated_command.startswith("ERROR:"):
                     self.append_output(f"{translated_command}\n")
@@ -156,32 +197,64 @@ If no valid command exists, return "ERROR: Unable to translate."
                     return
 
                 self.append_output(f"Executing: {translated_command}\n")
-                output = self.execute_powershell_command(translated_command)
-                self.append_output(output)
+                self.stream_powershell_command(translated_command, self.append_output)
+            except CancelledError:
+                return
             except Exception as e:
                 self.append_output(f"Error processing: {str(e)}\n")
 
         self.display_prompt()
 
-    def execute_powershell_command(self, command):
+    def translate_command(self, command):
+        translated_command = self.fast_path.translate(command)
+        if translated_command is not None:
+            return translated_command
+
+        translated_command = self.translation_cache.get(command, 'powershell', self.current_directory)
+        if translated_command is not None:
+            return translated_command
+
+        prompt = f"""
+You are an AI that converts natural language requests into PowerShell commands.
+Current directory: {self.current_directory}
+User query: {command}
+Provide ONLY the PowerShell command without any explanations.
+If no valid command exists, return "ERROR: Unable to translate."
+        """
+        response = self.llm_client.request(lambda: self.ask_llm(prompt))
+        translated_command = response.strip()
+        if not translated_command.startswith("ERROR:"):
+            self.translation_cache.put(command, 'powershell', self.current_directory, translated_command)
+        return translated_command
+
+    def stream_powershell_command(self, command, on_output):
         try:
             process = subprocess.Popen(["powershell", "-Command", command],
-                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                       text=True, cwd=self.current_directory)
-            stdout, stderr = process.communicate()
-            return stderr if stderr else stdout
+                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       cwd=self.current_directory, **new_group_options())
+            self.foreground_process = process
+            try:
+                stream_process(process, on_output, encoding=self.output_encoding)
+            finally:
+                self.foreground_process = None
         except Exception as e:
-            return f"Error executing: {str(e)}\n"
+            on_output(f"Error executing: {str(e)}\n")
 
     def enable_text_widget(self):
         self.terminal.config(state=tk.NORMAL)
 
 
 def main():
+    timer = StartupTimer()
+    timer.mark("imports")
     root = tk.Tk()
     root.geometry("800x600")
-    app = NaturalLanguageTerminal(root)
+    timer.mark("Tk window")
+    app = NaturalLanguageTerminal(root, timer)
+    timer.mark("terminal and first prompt")
+    root.after_idle(timer.mark, "first frame")
     root.mainloop()
+    app.llm_client.close()
 
 
 if __name__ == "__main__":
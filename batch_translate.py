@@ -0,0 +1,158 @@
+import json
+import re
+
+# Most queries packed into a single LLM call
+BATCH_SIZE = 25
+
+SHELL_NAMES = {
+    'bash': "bash commands that run in a Linux terminal",
+    'cmd': "Windows Command Prompt (cmd.exe) commands",
+    'powershell': "PowerShell commands",
+}
+
+# Prompt for translating several numbered queries at once
+BATCH_PROMPT = """
+You are an expert in translating natural language queries into {shell_name}.
+
+Current working directory: {current_dir}
+
+Translate each numbered query below into a single-line command. The queries are
+steps of one task and will run in order in the same shell, so a step may rely on
+the effects of the steps before it (for example a change of directory).
+
+{queries}
+
+Respond with a JSON object mapping each query number to its command, for example
+{{"1": "ls -la", "2": "mkdir build"}}. Do not include explanations or markdown.
+If a query is already a valid command, use "VALID_COMMAND" as its value.
+If a query cannot be translated, or could be harmful or destructive, use a value
+that starts with "ERROR:" followed by the reason.
+"""
+
+MISSING = "ERROR: No translation was returned for this query."
+
+
+def build_batch_prompt(queries, shell, current_dir):
+    """Pack queries into one numbered prompt"""
+    numbered = "\n".join(f"{number}. {query}" for number, query in enumerate(queries, 1))
+    return BATCH_PROMPT.format(shell_name=SHELL_NAMES[shell], current_dir=current_dir,
+                               queries=numbered)
+
+
+def clean_command(command):
+    """Strip quotes, backticks and surrounding whitespace from one parsed command"""
+    command = command.strip()
+    if len(command) > 1 and command[0] == command[-1] and command[0] in '`"\'':
+        command = command[1:-1].strip()
+    return command
+
+
+def parse_batch_response(response, count):
+    """
+    Map an LLM response back onto the queries it answers
+    Returns: a list of count commands - MISSING where a query got no answer
+    """
+    # Drop markdown code fences the model may add anyway
+    response = re.sub(r'```(?:json)?\s*(.*?)\s*```', r'\1', response.strip(), flags=re.DOTALL)
+    commands = [MISSING] * count
+
+    answers = None
+    match = re.search(r'[\[{].*[\]}]', response, flags=re.DOTALL)
+    if match is not None:
+        try:
+            answers = json.loads(match.group(0))
+        except ValueError:
+            answers = None
+
+    if isinstance(answers, dict):
+        for key, command in answers.items():
+            number = re.sub(r'\D', '', str(key))
+            if number and 1 <= int(number) <= count and isinstance(command, str) and command.strip():
+                commands[int(number) - 1] = clean_command(command)
+    elif isinstance(answers, list):
+        for index, command in enumerate(answers[:count]):
+            if isinstance(command, str) and command.strip():
+                commands[index] = clean_command(command)
+    else:
+        # Fall back to "1. command" / "1: command" lines
+        for line in response.split('\n'):
+            match = re.match(r'^\s*(\d+)\s*[.:)]\s*(.+)$', line)
+            if match and 1 <= int(match.group(1)) <= count:
+                commands[int(match.group(1)) - 1] = clean_command(match.group(2))
+    return commands
+
+
+def read_steps(path):
+    """Read a file of natural language steps - one per line, blank lines and # comments skipped"""
+    with open(path, encoding="utf-8") as steps_file:
+        return [line.strip() for line in steps_file
+                if line.strip() and not line.strip().startswith('#')]
+
+
+class BatchTranslator:
+    """
+    Translates many queries with as few LLM calls as possible. Queries the
+    fast path or the cache can answer never reach the LLM, duplicates are
+    sent once, and the rest go out batch_size at a time.
+    """
+
+    def __init__(self, generate, shell, cache=None, fast_path=None, batch_size=BATCH_SIZE):
+        self.generate = generate          # prompt -> response text
+        self.shell = shell
+        self.cache = cache
+        self.fast_path = fast_path
+        self.batch_size = batch_size
+        self.calls = 0
+
+    def translate(self, queries, current_dir):
+        """
+        Translate a list of queries
+        Returns: a list with one command (or "VALID_COMMAND" / "ERROR: ...") per query
+        """
+        commands = [None] * len(queries)
+        pending = {}
+        for index, query in enumerate(queries):
+            command = self.fast_path.translate(query) if self.fast_path else None
+            if command is None and self.cache is not None:
+                command = self.cache.get(query, self.shell, current_dir)
+            if command is not None:
+                commands[index] = command
+            else:
+                pending.setdefault(query, []).append(index)
+
+        unique = list(pending)
+        for start in range(0, len(unique), self.batch_size):
+            batch = unique[start:start + self.batch_size]
+            self.calls += 1
+            response = self.generate(build_batch_prompt(batch, self.shell, current_dir))
+            for query, command in zip(batch, parse_batch_response(response, len(batch))):
+                for index in pending[query]:
+                    commands[index] = command
+                # Errors are not cached so that they can be retried
+                if self.cache is not None and not command.startswith("ERROR:"):
+                    self.cache.put(query, self.shell, current_dir, command)
+        return commands
+
+
+def run_steps(steps, commands, execute, on_output, stop_on_error=True):
+    """
+    Execute translated steps in order
+    execute(command) runs one command and returns its exit status (or None if unknown)
+    Returns: the number of steps that ran
+    """
+    for number, (step, command) in enumerate(zip(steps, commands), 1):
+        on_output(f"[{number}/{len(steps)}] {step}\n")
+        if command.startswith("ERROR:"):
+            on_output(f"{command}\n")
+            if stop_on_error:
+                on_output(f"Stopped at step {number}\n")
+                return number - 1
+            continue
+        if command == "VALID_COMMAND":
+            command = step
+        on_output(f"Executing: {command}\n")
+        status = execute(command)
+        if status and stop_on_error:
+            on_output(f"Step {number} failed with exit status {status} - stopping\n")
+            return number
+    return len(steps)
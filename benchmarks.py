@@ -0,0 +1,383 @@
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+from completion import Completer
+from engine import TerminalEngine
+from main3 import NaturalLanguageTerminal
+from render_pump import RenderPump
+from screen_view import ScreenView
+from vt_screen import LINE_MODE_COLUMNS, Screen
+
+# A run is flagged as a regression when its median is this much slower than the baseline's
+REGRESSION_THRESHOLD = 0.25
+
+# Files in the directory tab completion is measured on
+LARGE_DIRECTORY_FILES = 20000
+
+# How long a Tab press may take to be answered before the benchmark gives up
+COMPLETION_TIMEOUT_SECONDS = 60
+
+# Lines pushed through append_output per sample
+OUTPUT_LINES = 20000
+
+# Realistic input for detect_command_type: typed commands and natural language
+CLASSIFY_CORPUS = [
+    "ls -la", "cd ..", "git status", "git log --oneline -n 20", "make", "make -j8 install",
+    "find . -name '*.py' | xargs wc -l", "python3 manage.py runserver", "docker ps -a",
+    "grep -rn TODO src/", "tail -f /var/log/syslog", "echo $PATH", "cat README.md", "top",
+    "sort data.csv | uniq -c | sort -rn | head", "kill -9 1234", "npm install", "pip list",
+    "show me all python files", "list the biggest files in this folder",
+    "find all files modified in the last day", "what is my ip address",
+    "how much disk space is left", "make a folder called backups", "count the lines in main.py",
+    "delete all the .pyc files please", "compress the logs directory into a tarball",
+    "which process is using port 8080", "show the last 10 commits", "sort the file by the second column",
+    "watch the log file", "time", "help", "..", "!!", "tell me the current date",
+]
+
+# LLM replies in the shapes clean_llm_response has to deal with
+LLM_RESPONSES = [
+    "ls -la",
+    "```bash\nfind . -name '*.py' -mtime -1\n```",
+    "```\ndu -sh * | sort -h | tail -n 10\n```",
+    "# List the files\nls -lah\n# done",
+    "Here is the command:\n```shell\nps aux --sort=-%mem | head\n```\nIt lists processes by memory.",
+    "VALID_COMMAND",
+    "ERROR: That request is not possible",
+    "\n\n   tar -czf logs.tar.gz logs/   \n\n",
+    "```bash\n# comment\n\ncurl -s ifconfig.me\n```\nExplanation: prints the public address.\n" * 3,
+]
+
+# Output fed to append_output: plain, colored, and carriage-return progress lines
+OUTPUT_SAMPLES = [
+    "drwxr-xr-x  2 user user  4096 Jan  1 12:00 plain-directory-entry-{0}\n",
+    "\x1b[01;34msrc{0}\x1b[0m  \x1b[01;32mrun.sh\x1b[0m  \x1b[31mcore.{0}\x1b[0m\n",
+    "downloading {0}%\r",
+]
+
+
+def measure(func, number, repeat):
+    """
+    Time func() - number calls per sample, repeat samples
+    Returns: seconds per call as {'median', 'min', 'max', 'samples', 'number'}
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    return {'median': statistics.median(samples), 'min': min(samples), 'max': max(samples),
+            'samples': repeat, 'number': number}
+
+
+class StubText:
+    """Stand-in for a Tk Text widget when there is no display - every call is a no-op"""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: "1.0"
+
+    def compare(self, *args):
+        return False
+
+
+class StubRoot:
+    """Stand-in for the Tk root a RenderPump schedules frames on"""
+
+    def after(self, ms, func, *args):
+        return None
+
+
+class StubInput:
+    """Stand-in for the input line of the Text widget, edited the way apply_completion edits it"""
+
+    def __init__(self, line=""):
+        self.line = line
+
+    def get(self, start, end):
+        return self.line
+
+    def delete(self, start, end):
+        offset = re.search(r'\+(\d+)c', start)
+        self.line = self.line[:int(offset.group(1)) if offset else 0]
+
+    def insert(self, index, text, *tags):
+        self.line += text
+
+    def mark_set(self, name, index):
+        pass
+
+
+class CompletionShim:
+    """
+    Just enough of main3's NaturalLanguageTerminal to run its Tab handler
+    without Tk - the cache check on the UI thread, the worker thread when
+    the listing isn't cached, and apply_completion. Work handed back to the
+    Tk thread runs at once and sets applied.
+    """
+
+    handle_tab = NaturalLanguageTerminal.handle_tab
+    complete_in_background = NaturalLanguageTerminal.complete_in_background
+    end_search = NaturalLanguageTerminal.end_search
+    input_text = NaturalLanguageTerminal.input_text
+    clear_suggestion = NaturalLanguageTerminal.clear_suggestion
+
+    def __init__(self, completer, directory):
+        self.engine = SimpleNamespace(completer=completer)
+        self.current_directory = directory
+        self.terminal = StubInput()
+        self.pump = SimpleNamespace(call=self.call)
+        self.applied = threading.Event()
+        self.input_start = "1.0"
+        self.input_active = True
+        self.search = None
+        self.suggestion = None
+
+    def call(self, func, *args):
+        func(*args)
+
+    def display_prompt(self):
+        pass
+
+    def apply_completion(self, line, result):
+        NaturalLanguageTerminal.apply_completion(self, line, result)
+        self.applied.set()
+
+    def press_tab(self, line):
+        """Type line, press Tab and wait until the completion is applied"""
+        self.terminal.line = line
+        self.applied.clear()
+        self.handle_tab(None)
+        if not self.applied.wait(COMPLETION_TIMEOUT_SECONDS):
+            raise RuntimeError("tab completion never finished")
+
+
+def bench_classify(engine, scale):
+    """detect_command_type over the whole corpus"""
+    def run():
+        for command in CLASSIFY_CORPUS:
+            engine.detect_command_type(command)
+    result = measure(run, max(int(200 * scale), 1), 5)
+    result['per'] = f"{len(CLASSIFY_CORPUS)} inputs"
+    return result
+
+
+def bench_clean(engine, scale):
+    """clean_llm_response over the sample replies"""
+    def run():
+        for response in LLM_RESPONSES:
+            engine.clean_llm_response(response.strip())
+    result = measure(run, max(int(1000 * scale), 1), 5)
+    result['per'] = f"{len(LLM_RESPONSES)} responses"
+    return result
+
+
+def output_text(lines):
+    """lines lines of mixed sample output"""
+    return "".join(OUTPUT_SAMPLES[number % len(OUTPUT_SAMPLES)].format(number) for number in range(lines))
+
+
+def bench_append_output(scale):
+    """
+    append_output from a worker until everything is drawn - in a real Tk
+    terminal when there is a display (e.g. under xvfb-run), otherwise
+    through the render pump and VT screen into a stub widget
+    """
+    lines = max(int(OUTPUT_LINES * scale), 10)
+    text = output_text(lines)
+    chunks = [text[start:start + 4096] for start in range(0, len(text), 4096)]
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        root = None
+
+    if root is None:
+        view = ScreenView(StubText(), Screen(24, LINE_MODE_COLUMNS))
+        pump = RenderPump(StubRoot(), view.screen.feed, view.render, max_pending=len(chunks) + 1)
+
+        def run():
+            for chunk in chunks:
+                pump.put(chunk)
+            pump.drain()
+        backend = 'stub'
+    else:
+        root.withdraw()
+        app = NaturalLanguageTerminal(root)
+
+        def run():
+            for chunk in chunks:
+                app.pump.put(chunk)
+            while app.pump.pending:
+                app.pump.drain(app.pump.max_pending)
+            root.update()
+        backend = 'tk'
+    try:
+        result = measure(run, 1, 5)
+    finally:
+        if root is not None:
+            app.engine.close()
+            app.scrollback.close()
+            root.destroy()
+    result['per'] = f"{lines} lines"
+    result['backend'] = backend
+    return result
+
+
+def bench_tab_completion(scale):
+    """
+    main3's Tab handler (handle_tab through apply_completion), in a directory
+    of many files: cold (the listing is read on a worker thread) and warm
+    (answered on the UI thread from the cache without I/O)
+    """
+    directory = tempfile.mkdtemp(prefix="easy_terminal_bench_")
+    try:
+        files = max(int(LARGE_DIRECTORY_FILES * scale), 10)
+        for number in range(files):
+            open(os.path.join(directory, f"file_{number:06d}.txt"), "w").close()
+        line = "cat file_0"
+
+        def cold():
+            CompletionShim(Completer(), directory).press_tab(line)
+
+        shim = CompletionShim(Completer(), directory)
+        shim.press_tab(line)
+
+        def warm():
+            shim.press_tab(line)
+
+        return {'cold': dict(measure(cold, 1, 5), per=f"{files} files"),
+                'warm': dict(measure(warm, max(int(200 * scale), 1), 5), per=f"{files} files")}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_execute(engine, scale):
+    """execute_bash_command round trip for a command that does nothing"""
+    engine.execute_bash_command("true")
+    return measure(lambda: engine.execute_bash_command("true"), max(int(50 * scale), 1), 5)
+
+
+def run_benchmarks(scale=1.0, only=None):
+    """
+    Run every benchmark (or the ones named in only)
+    Returns: {name: result} - each result's 'median' is seconds per call
+    """
+    engine = TerminalEngine()
+    # The benchmark's own commands shouldn't show up in the latency traces
+    engine.tracer.enabled = False
+    results = {}
+    try:
+        benchmarks = [
+            ('detect_command_type', lambda: bench_classify(engine, scale)),
+            ('clean_llm_response', lambda: bench_clean(engine, scale)),
+            ('append_output', lambda: bench_append_output(scale)),
+            ('tab_completion', lambda: bench_tab_completion(scale)),
+            ('execute_bash_command', lambda: bench_execute(engine, scale)),
+        ]
+        for name, bench in benchmarks:
+            if only and name not in only:
+                continue
+            result = bench()
+            if 'median' in result:
+                results[name] = result
+            else:
+                for variant, variant_result in result.items():
+                    results[f"{name}.{variant}"] = variant_result
+    finally:
+        engine.close()
+    return results
+
+
+def format_seconds(seconds):
+    """Seconds with a unit that keeps a few significant digits"""
+    for unit, scale in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * scale >= 1:
+            return f"{seconds * scale:.3g} {unit}"
+    return f"{seconds * 1e9:.3g} ns"
+
+
+def report(results):
+    """Results as a table"""
+    lines = [f"{'benchmark':<30}{'median':>12}{'min':>12}  per call of"]
+    for name, result in results.items():
+        lines.append(f"{name:<30}{format_seconds(result['median']):>12}{format_seconds(result['min']):>12}  "
+                     f"{result.get('per', '1 call')}{' (' + result['backend'] + ')' if 'backend' in result else ''}")
+    return "\n".join(lines) + "\n"
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare medians against a baseline run
+    Returns: (report text, names of the benchmarks that regressed)
+    """
+    lines = [f"{'benchmark':<30}{'baseline':>12}{'now':>12}{'change':>9}"]
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None or not before.get('median'):
+            lines.append(f"{name:<30}{'-':>12}{format_seconds(result['median']):>12}{'new':>9}")
+            continue
+        change = result['median'] / before['median'] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        lines.append(f"{name:<30}{format_seconds(before['median']):>12}{format_seconds(result['median']):>12}"
+                     f"{change * 100:>+8.1f}%{flag}")
+    return "\n".join(lines) + "\n", regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks for the terminal's hot paths. Runs without a display; "
+                    "under xvfb-run append_output is measured in a real Tk window.")
+    parser.add_argument("-o", "--output", help="save the results as JSON (e.g. a baseline)")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare with a saved run and exit with status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown flagged as a regression, as a fraction (default %(default)s)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply the amount of work per benchmark (e.g. 0.1 for a quick run)")
+    parser.add_argument("--only", action="append", metavar="NAME",
+                        help="run only this benchmark (repeatable)")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, encoding="utf-8") as baseline_file:
+                baseline = json.load(baseline_file)['results']
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"can't read baseline {args.compare}: {str(e)}")
+
+    results = run_benchmarks(args.scale, args.only)
+    sys.stdout.write(report(results))
+
+    if args.output:
+        run = {'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'python': platform.python_version(),
+               'platform': platform.platform(), 'scale': args.scale, 'results': results}
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(run, output_file, indent=2)
+        print(f"Saved to {args.output}")
+
+    if baseline is not None:
+        text, regressions = compare(results, baseline, args.threshold)
+        sys.stdout.write("\n" + text)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold * 100:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import stat
+import threading
+import time
+
+# How often (at most) the PATH directories are checked for changes
+REFRESH_SECONDS = 2.0
+
+# Bash builtins and reserved words - valid commands that aren't files on PATH
+BASH_BUILTINS = frozenset("""
+. : [ alias bg bind break builtin caller cd command compgen complete compopt
+continue declare dirs disown echo enable eval exec exit export false fc fg
+getopts hash help history jobs kill let local logout mapfile popd printf pushd
+pwd read readarray readonly return set shift shopt source suspend test times
+trap true type typeset ulimit umask unalias unset wait
+if then else elif fi case esac for select while until do done function time
+coproc { } ! [[ ]]
+""".split())
+
+# Commands the terminals handle themselves
+TERMINAL_COMMANDS = frozenset(['clear', 'cls', 'exit', 'quit'])
+
+
+class CommandIndex:
+    """
+    Set of every command name the shell would run: executables on PATH,
+    bash builtins and the session's aliases and functions. Each PATH
+    directory is listed once and only listed again when its mtime changes,
+    so keeping the index fresh costs a stat() per directory.
+    """
+
+    def __init__(self, path=None, refresh_seconds=REFRESH_SECONDS):
+        self.path = path if path is not None else os.environ.get("PATH", os.defpath)
+        self.refresh_seconds = refresh_seconds
+        self.directories = {}     # directory -> (mtime, names)
+        self.shell_names = set()  # aliases and functions
+        self.commands = set()
+        self.checked = None
+        self.lock = threading.Lock()
+
+    def __contains__(self, name):
+        self.maybe_refresh()
+        return name in self.commands
+
+    def set_path(self, path):
+        """Use a new PATH (e.g. after an export in the shell session)"""
+        with self.lock:
+            if path != self.path:
+                self.path = path
+                self.checked = None
+
+    def set_shell_names(self, names):
+        """Replace the alias and function names defined in the shell session"""
+        with self.lock:
+            self.shell_names = set(names)
+            self.rebuild()
+
+    def stale(self):
+        """True if the last check is older than refresh_seconds"""
+        return self.checked is None or time.monotonic() - self.checked >= self.refresh_seconds
+
+    def maybe_refresh(self):
+        """Refresh if the last check is older than refresh_seconds"""
+        if self.stale():
+            self.refresh()
+
+    def refresh(self):
+        """Re-list the PATH directories that changed since the last refresh"""
+        with self.lock:
+            changed = False
+            directories = {}
+            for directory in self.path.split(os.pathsep):
+                directory = directory or "."
+                if directory in directories:
+                    continue
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    changed = changed or directory in self.directories
+                    continue
+                known = self.directories.get(directory)
+                if known is None or known[0] != mtime:
+                    known = (mtime, self.list_executables(directory))
+                    changed = True
+                directories[directory] = known
+
+            changed = changed or directories.keys() != self.directories.keys()
+            self.directories = directories
+            if changed or self.checked is None:
+                self.rebuild()
+            self.checked = time.monotonic()
+
+    @staticmethod
+    def list_executables(directory):
+        """Names of the executable files in a directory"""
+        names = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        mode = entry.stat().st_mode
+                    except OSError:
+                        continue
+                    if stat.S_ISREG(mode) and mode & 0o111:
+                        names.add(entry.name)
+        except OSError:
+            pass
+        return frozenset(names)
+
+    def rebuild(self):
+        """Recompute the combined set - callers hold the lock"""
+        commands = set(BASH_BUILTINS)
+        commands.update(TERMINAL_COMMANDS)
+        commands.update(self.shell_names)
+        for _, names in self.directories.values():
+            commands.update(names)
+        self.commands = commands
@@ -0,0 +1,239 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Directory listings kept in the cache
+MAX_DIRECTORIES = 64
+
+# A cached listing younger than this is used without checking the directory's mtime
+FRESH_SECONDS = 1.0
+
+# Most completions returned for one request
+MAX_MATCHES = 1000
+
+
+class PrefixTrie:
+    """Character trie over a set of words with sorted prefix lookups"""
+
+    END = None  # key marking that a word ends at a node
+
+    def __init__(self, words=()):
+        self.root = {}
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        """Insert a word"""
+        node = self.root
+        for char in word:
+            child = node.get(char)
+            if child is None:
+                child = node[char] = {}
+            node = child
+        if PrefixTrie.END not in node:
+            node[PrefixTrie.END] = word
+            self.size += 1
+
+    def __len__(self):
+        return self.size
+
+    def complete(self, prefix, limit=MAX_MATCHES):
+        """Words starting with prefix, in sorted order, at most limit of them"""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+
+        matches = []
+        stack = [node]
+        while stack and len(matches) < limit:
+            node = stack.pop()
+            if PrefixTrie.END in node:
+                matches.append(node[PrefixTrie.END])
+            # Push children in reverse so the smallest is visited first
+            stack.extend(node[char] for char in sorted((key for key in node if key is not None),
+                                                       reverse=True))
+        return matches
+
+    def extend(self, prefix):
+        """
+        Longest string every word starting with prefix starts with - found by
+        following the path below prefix while it doesn't branch, so it holds
+        for all the words, not only the first limit of them
+        Returns: None if no word starts with prefix
+        """
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return None
+
+        chars = []
+        while len(node) == 1 and PrefixTrie.END not in node:
+            char, node = next(iter(node.items()))
+            chars.append(char)
+        return prefix + "".join(chars)
+
+
+class DirectoryCache:
+    """
+    LRU cache of directory listings, each held in a PrefixTrie. A listing is
+    re-read only when the directory's mtime changes; listings checked within
+    the last FRESH_SECONDS are trusted without touching the filesystem.
+    """
+
+    def __init__(self, max_directories=MAX_DIRECTORIES, fresh_seconds=FRESH_SECONDS):
+        self.max_directories = max_directories
+        self.fresh_seconds = fresh_seconds
+        self.listings = OrderedDict()  # path -> (mtime, checked, trie)
+        self.lock = threading.Lock()
+
+    def cached(self, path):
+        """The trie for path if it can be used without any I/O, else None"""
+        with self.lock:
+            entry = self.listings.get(path)
+            if entry is None or time.monotonic() - entry[1] > self.fresh_seconds:
+                return None
+            self.listings.move_to_end(path)
+            return entry[2]
+
+    def get(self, path):
+        """The trie for path, re-listing the directory if it changed"""
+        mtime = os.stat(path).st_mtime_ns
+        with self.lock:
+            entry = self.listings.get(path)
+            if entry is not None and entry[0] == mtime:
+                self.listings[path] = (mtime, time.monotonic(), entry[2])
+                self.listings.move_to_end(path)
+                return entry[2]
+
+        # Directories get a trailing slash so they can be told apart
+        names = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    names.append(entry.name + "/" if entry.is_dir() else entry.name)
+                except OSError:
+                    names.append(entry.name)
+        trie = PrefixTrie(names)
+
+        with self.lock:
+            self.listings[path] = (mtime, time.monotonic(), trie)
+            self.listings.move_to_end(path)
+            while len(self.listings) > self.max_directories:
+                self.listings.popitem(last=False)
+        return trie
+
+
+class Completer:
+    """
+    Tab completion for a command line: command names (from a CommandIndex)
+    for the first word, file names anywhere (including nested paths such as
+    src/ma), and words from the command history.
+    """
+
+    def __init__(self, command_index=None, directories=None):
+        self.command_index = command_index
+        self.directories = directories or DirectoryCache()
+        self.history = PrefixTrie()
+        self.commands = None
+        self.commands_source = None
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def add_history(self, command):
+        """Make the words of a command available for completion"""
+        for word in command.split():
+            if len(word) > 1:
+                self.history.add(word)
+
+    def command_names(self, refresh=True):
+        """
+        Trie of command names, rebuilt when the index's set is replaced -
+        refresh=False uses the index as it is, without checking PATH
+        """
+        if refresh:
+            self.command_index.maybe_refresh()
+        commands = self.command_index.commands
+        if commands is not self.commands_source:
+            self.commands = PrefixTrie(commands)
+            self.commands_source = commands
+        return self.commands
+
+    def refresh_in_background(self):
+        """Check PATH for new commands on a worker thread if the index is due - later completions see them"""
+        with self.lock:
+            if self.refreshing or not self.command_index.stale():
+                return
+            self.refreshing = True
+
+        def refresh():
+            try:
+                self.command_names()
+            except Exception:
+                pass
+            finally:
+                self.refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    @staticmethod
+    def current_word(line):
+        """Start offset and text of the word being completed (the last one on the line)"""
+        start = max(line.rfind(" "), line.rfind("\t")) + 1
+        return start, line[start:]
+
+    def complete(self, line, cwd, allow_io=True):
+        """
+        Completions for the last word of line
+        Returns: (start, matches, prefix) - matches replace line[start:], and
+        prefix is the longest one all of them share (even those past
+        MAX_MATCHES) - or None if allow_io is False and answering would need
+        the filesystem
+        """
+        start, word = self.current_word(line)
+        first_word = not line[:start].strip()
+        matches = []
+        prefixes = []
+
+        # Command names for the first word, unless it looks like a path
+        if first_word and "/" not in word and self.command_index is not None:
+            if allow_io:
+                commands = self.command_names()
+            elif self.command_index.checked is not None:
+                # Answer from the index as it is and leave the PATH check to a worker
+                commands = self.command_names(refresh=False)
+                self.refresh_in_background()
+            else:
+                return None
+            matches.extend(commands.complete(word))
+            prefixes.append(commands.extend(word))
+
+        # File names, relative to cwd or a directory typed so far
+        if not first_word or "/" in word or not matches:
+            directory, prefix = os.path.split(word)
+            path = os.path.join(cwd, os.path.expanduser(directory)) if directory else cwd
+            trie = self.directories.cached(path)
+            if trie is None:
+                if not allow_io:
+                    return None
+                try:
+                    trie = self.directories.get(path)
+                except OSError:
+                    trie = PrefixTrie()
+            base = directory + "/" if directory and not directory.endswith("/") else directory
+            matches.extend(base + name for name in trie.complete(prefix))
+            extended = trie.extend(prefix)
+            prefixes.append(base + extended if extended is not None else None)
+
+        # Words from earlier commands
+        if not first_word:
+            seen = set(matches)
+            matches.extend(match for match in self.history.complete(word) if match not in seen)
+            prefixes.append(self.history.extend(word))
+
+        prefixes = [prefix for prefix in prefixes if prefix is not None]
+        return start, matches[:MAX_MATCHES], os.path.commonprefix(prefixes) if prefixes else word
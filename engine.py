@@ -0,0 +1,892 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError
+from shell_session import BashSession, with_definitions
+from output_stream import stream_process
+from translation_cache import TranslationCache
+from fast_path import get_translator
+from llm_client import AsyncLLMClient
+from batch_translate import BatchTranslator, read_steps, run_steps
+from startup import StartupTimer, run_in_background
+from command_index import CommandIndex
+from completion import Completer
+from jobs import JobTable, SIGNALS, format_job, split_background
+from process_group import interrupt_process, new_group_options
+from limits import CommandLimits, LimitGuard, LIMIT_NAMES
+from spill import SpillBuffer, SpillKeeper
+from pty_session import DEFAULT_SIZE, PtyProcess, needs_tty, pty_supported
+from tracing import Tracer
+from llm_provider import provider_from_environment
+
+# Configure the Google API key
+GOOGLE_API_KEY = "Replace with your actual API key"  # Replace with your actual API key
+
+# Prompt for translating one query
+TRANSLATION_TEMPLATE = """
+            You are an expert in translating natural language queries into bash commands.
+            
+            Current working directory: {current_dir}
+            
+            User query: {query}
+            
+            Determine if this query is already a valid bash command. If it is, return "VALID_COMMAND".
+            
+            If it's natural language, translate it into a valid bash command that would run in a Linux terminal.
+            Provide ONLY the bash command without any explanations, prefixes, or comments.
+            Do not include ANY extra text, markdown formatting, or code blocks in your response.
+            Your response must contain exactly one line with just the bash command.
+            
+            Be lenient with natural language queries and try to find the most reasonable bash equivalent.
+            Only respond with "ERROR: Unable to translate to a valid bash command." if you're absolutely certain 
+            there is no reasonable bash command that can satisfy the request.
+            
+            If the query is asking for something that could be harmful or destructive, respond with 
+            "ERROR: This command could be potentially harmful."
+            """
+
+# Input classification - shell syntax (pipes, redirection, flags, paths,
+# variables, quoted strings) and plain words are matched in a single scan
+TOKEN_PATTERN = re.compile(
+    r"(?P<syntax>[|;>&<`$/~]|(?<!\S)-|\"[^\"]*\"|'[^']*')|(?P<word>[^\s|;>&<`$/~\"']+)"
+)
+SHORTHAND_COMMANDS = frozenset(['..', '.', '!!', '!$'])
+NATURAL_INDICATORS = frozenset(['show', 'list', 'display', 'find', 'get', 'what', 'how', 'create',
+                                'make', 'write', 'search', 'tell', 'give', 'count', 'calculate',
+                                'please', 'help', 'can', 'could', 'would', 'do', 'does'])
+
+# Installed commands that are also everyday English verbs or question words
+AMBIGUOUS_COMMANDS = frozenset(['make', 'find', 'help', 'time', 'test', 'watch', 'sort', 'join',
+                                'split', 'show', 'list', 'look', 'which', 'who', 'what', 'tell',
+                                'print', 'open', 'say', 'read', 'wait', 'type', 'file', 'locate',
+                                'count', 'search', 'get', 'give', 'write', 'display', 'top', 'kill'])
+
+# Words that mark the rest of an input starting with an ambiguous command as prose
+ENGLISH_WORDS = frozenset(['a', 'an', 'the', 'all', 'any', 'every', 'some', 'me', 'my', 'i', 'it',
+                           'of', 'in', 'on', 'for', 'to', 'from', 'with', 'that', 'this', 'these',
+                           'those', 'which', 'called', 'named', 'is', 'are', 'files', 'folder',
+                           'folders', 'directory', 'directories', 'please', 'what', 'how', 'where',
+                           'biggest', 'largest', 'newest', 'oldest', 'recent', 'current'])
+
+# Per-command resource limits (None = unlimited): wall and cpu in seconds,
+# memory (address space) and output in MiB, files in open descriptors.
+# Commands typed as bash are trusted; ones the LLM wrote are bounded so a bad
+# translation can't pin a core or flood the terminal. An address space cap
+# breaks programs that reserve large virtual ranges (JVMs, Go, sanitizers),
+# so memory is only limited when asked for with --limit or :limits
+TYPED_LIMITS = dict(wall=None, cpu=None, memory=None, files=None, output=None)
+TRANSLATED_LIMITS = dict(wall=600, cpu=300, memory=None, files=4096, output=512)
+
+# Commands after which the session's aliases, functions or PATH may have changed
+SHELL_STATE_PATTERN = re.compile(r'\b(alias|unalias|source|function|export|PATH|unset)\b|\(\)|^\s*\.\s')
+
+
+class TerminalEngine:
+    """
+    Headless core of the natural language terminal: classifies input,
+    translates natural language to bash and runs commands in a persistent
+    bash session. Output goes to callbacks, so the same engine drives the Tk
+    frontend, the command line interface and load tests.
+    """
+
+    def __init__(self, current_directory=None, timer=None, llm=None):
+        # Current working directory
+        self.current_directory = current_directory or os.getcwd()
+        
+        # Persistent bash session - started lazily on the first command
+        self.shell_session = BashSession(self.current_directory) if shutil.which("bash") else None
+        
+        # Every command name the shell knows - PATH executables, builtins, aliases
+        self.command_index = CommandIndex()
+        
+        # Tab completion over commands, cached directory listings and history
+        self.completer = Completer(self.command_index)
+        
+        # Translations are cached in memory and on disk
+        self.translation_cache = TranslationCache()
+        
+        # Common queries are translated locally without calling the LLM
+        self.fast_path = get_translator('bash')
+        
+        # LLM requests run on an asyncio loop with deadlines and can be cancelled
+        self.llm_client = AsyncLLMClient()
+        
+        # Script runs translate all of their steps in as few LLM calls as possible
+        self.batch_translator = BatchTranslator(self.generate, 'bash', self.translation_cache,
+                                                self.fast_path)
+        
+        # Translation started ahead of time for input that is still being typed:
+        # (query, cwd, future) - set from the UI thread, claimed from workers
+        self.speculation = None
+        self.speculation_lock = threading.Lock()
+        
+        # Background jobs started with '&'; on_job_done(job) is called when one
+        # finishes that isn't in the foreground
+        self.jobs = JobTable(on_done=self.job_finished)
+        self.foreground_job = None
+        self.on_job_done = None
+        
+        # One-off shell running the current command when there is no bash session
+        self.foreground_process = None
+        
+        # Interactive commands (top, vim, python, ...) run on a pseudo-terminal;
+        # the frontend forwards keystrokes with send_input() and window size
+        # changes with resize_pty(). on_pty(active) is called from the worker
+        # thread just before such a command starts and after it ends
+        self.use_pty = pty_supported()
+        self.pty_process = None
+        self.pty_size = DEFAULT_SIZE
+        self.on_pty = None
+        
+        # Resource limits for commands typed as bash and for translated ones
+        self.limits = {'typed': CommandLimits(**TYPED_LIMITS),
+                       'translated': CommandLimits(**TRANSLATED_LIMITS)}
+        
+        # Output too big to keep in memory stays in temporary files for a while
+        self.spill_keeper = SpillKeeper('bash')
+        
+        # Latency spans per command - ':stats' shows percentiles per stage
+        self.tracer = Tracer()
+        
+        # Set up the LLM provider on a background thread - importing LangChain
+        # takes seconds, and only natural language queries need it. llm is a
+        # provider spec (see llm_provider.make_provider), e.g. replay:FILE
+        self.timer = timer or StartupTimer()
+        self.provider = None
+        self.setup_error = None
+        self.llm_ready = run_in_background(self.timer.timed, "LLM setup", self.setup_llm, llm)
+
+    def setup_llm(self, spec):
+        """Set up the LLM provider - Gemini through LangChain unless spec or EASY_TERMINAL_LLM names another"""
+        try:
+            self.provider = provider_from_environment(GOOGLE_API_KEY, 'langchain', spec)
+        except Exception as e:
+            self.provider = None
+            self.setup_error = f"Error initializing the LLM provider: {str(e)}"
+
+    def detect_command_type(self, command):
+        """
+        Detect if the command is a bash command or natural language
+        Returns: 'bash' or 'natural'
+        """
+        # Check if it's a common shorthand command
+        if command in SHORTHAND_COMMANDS:
+            return 'bash'
+            
+        # One pass over the input: any shell syntax (pipes, redirection, flags,
+        # paths, quoting) makes it bash, and the words are kept for the checks below
+        words = []
+        for match in TOKEN_PATTERN.finditer(command):
+            if match.lastgroup == 'syntax':
+                return 'bash'
+            words.append(match.group())
+            
+            # A known command that isn't also an English word settles it right away
+            if len(words) == 1 and words[0] in self.command_index and words[0] not in AMBIGUOUS_COMMANDS:
+                return 'bash'
+                
+        if not words:
+            return 'bash'
+            
+        # Commands like 'make' or 'find' are bash unless the rest reads like English
+        lowered = [word.lower() for word in words]
+        if words[0] in self.command_index:
+            if len(words) == 1:
+                return 'natural' if lowered[0] in NATURAL_INDICATORS else 'bash'
+            if not any(word in ENGLISH_WORDS for word in lowered[1:]):
+                return 'bash'
+            return 'natural'
+            
+        # By default, try to interpret as natural language if it's more than one word
+        # or contains certain natural language indicators
+        if len(words) > 1 or lowered[0] in NATURAL_INDICATORS:
+            return 'natural'
+            
+        # Default to bash if we're not sure
+        return 'bash'
+
+    def run_command(self, command, on_output, on_message=None):
+        """
+        Classify, translate if needed and execute one line of input
+        Progress messages go to on_message (on_output if not given)
+        Returns: a dict describing what was run - query, type, command, status,
+        cwd, error, limit (the resource limit that stopped it, if any) and
+        trace (the id its latency spans are logged under)
+        """
+        trace = self.tracer.start()
+        started = time.perf_counter()
+        result = None
+        try:
+            result = self.dispatch_command(command, on_output, on_message or on_output)
+            result['trace'] = trace
+            return result
+        finally:
+            self.tracer.record('command', time.perf_counter() - started, query=command,
+                               type=result and result['type'], status=result and result['status'])
+            self.tracer.finish()
+
+    def dispatch_command(self, command, on_output, on_message):
+        """run_command without the tracing"""
+        with self.tracer.span('classify'):
+            command_type = self.detect_command_type(command)
+        result = {'query': command, 'type': command_type, 'command': command,
+                  'status': None, 'cwd': self.current_directory, 'error': None, 'limit': None}
+        
+        # jobs, fg, bg and kill %n act on the job table
+        handled, status = self.run_job_command(command, on_output)
+        if handled:
+            result['status'] = status
+            return result
+        
+        if command_type == 'natural':
+            # Try to translate natural language to bash
+            on_message(f"Translating: {command}\n")
+            try:
+                translated_command = self.translate_command(command)
+            except CancelledError:
+                raise
+            except Exception as e:
+                result['error'] = f"Error processing command: {str(e)}"
+                on_message(f"{result['error']}\n")
+                return result
+                
+            # Check for errors in translation
+            if translated_command.startswith("ERROR:"):
+                result['error'] = translated_command
+                on_message(f"{translated_command}\n")
+                return result
+            # Check if it's already a valid command (no need for translation)
+            if translated_command == "VALID_COMMAND":
+                on_message(f"Executing as-is: {command}\n")
+            else:
+                result['command'] = translated_command
+                on_message(f"Executing: {translated_command}\n")
+        
+        # Commands ending in '&' become jobs instead of blocking the session
+        background_command, background = split_background(result['command'])
+        if background:
+            env, cwd, definitions = self.session_state()
+            job = self.jobs.start(background_command, cwd, env, definitions)
+            on_output(f"[{job.number}] {job.process.pid}\n")
+            result['status'] = 0
+            return result
+            
+        limits = self.limits['translated' if result['command'] != command else 'typed']
+        if self.use_pty and needs_tty(result['command']):
+            result['status'] = self.run_in_pty(result['command'], on_output, limits)
+        else:
+            result['status'], result['limit'] = self.run_limited(result['command'], on_output, limits)
+        result['cwd'] = self.current_directory
+        return result
+
+    def session_state(self):
+        """
+        The bash session's exported environment, directory and alias and
+        function definitions, for commands that run in a shell of their own
+        (see BashSession.export_state for what doesn't carry over)
+        Returns: (environment dict or None for ours, cwd, definitions)
+        """
+        if self.shell_session is not None:
+            try:
+                return self.shell_session.export_state()
+            except Exception:
+                pass
+        return None, self.current_directory, ""
+
+    def run_in_pty(self, command, on_output, limits=None):
+        """
+        Run a command that needs a terminal on a pseudo-terminal, with the
+        session's environment, aliases and functions in its directory. A cd or
+        export it makes doesn't reach the session. Only the rlimits of limits
+        apply - an interactive program is expected to run for as long as the
+        user keeps it open.
+        Returns: the exit status
+        """
+        ulimit = limits.ulimit_command() if limits is not None else ""
+        started = time.perf_counter()
+        try:
+            with self.tracer.span('spawn', pty=True):
+                env, cwd, definitions = self.session_state()
+                script = with_definitions(f"{ulimit}; {command}" if ulimit else command, definitions)
+                process = PtyProcess(script, cwd, self.pty_size, env=env)
+        except Exception as e:
+            on_output(f"Error executing command: {str(e)}\n")
+            return None
+        self.pty_process = process
+        if self.on_pty is not None:
+            self.on_pty(True)
+        status = None
+        try:
+            status = process.run(self.tracer.watch_output(on_output, started))
+            return status
+        finally:
+            self.pty_process = None
+            if self.on_pty is not None:
+                self.on_pty(False)
+            self.tracer.record('exit', time.perf_counter() - started, status=status)
+
+    def send_input(self, text):
+        """Pass keystrokes to the command running on the pseudo-terminal, if any"""
+        process = self.pty_process
+        if process is None:
+            return False
+        process.write(text)
+        return True
+
+    def resize_pty(self, rows, cols):
+        """The frontend's terminal is now rows x cols"""
+        self.pty_size = (rows, cols)
+        process = self.pty_process
+        if process is not None:
+            process.resize(rows, cols)
+
+    def set_limit(self, kind, name, value):
+        """Change one limit - kind is 'typed' or 'translated', value a number or 'off'"""
+        if kind not in self.limits:
+            raise ValueError(f"unknown command kind '{kind}' - use typed or translated")
+        self.limits[kind].set(name, value)
+
+    def describe_limits(self):
+        """The current limits, one line per kind of command"""
+        return "".join(f"{kind}: {limits.describe()}\n" for kind, limits in self.limits.items())
+
+    def run_job_command(self, command, on_output):
+        """
+        Handle jobs, fg, bg and kill with %job arguments
+        Returns: (handled, exit status)
+        """
+        words = command.split()
+        if not words or words[0] not in ('jobs', 'fg', 'bg', 'kill'):
+            return False, None
+        name, args = words[0], words[1:]
+        
+        if name == 'jobs':
+            for job in self.jobs.list():
+                on_output(format_job(job, self.jobs.current) + "\n")
+                # Finished jobs are listed once, like bash does
+                if job.state == 'Done':
+                    self.jobs.remove(job)
+            return True, 0
+            
+        if name == 'kill':
+            specs = [arg for arg in args if arg.startswith('%')]
+            if not specs:
+                return False, None
+            signum = signal.SIGTERM
+            options = [arg for arg in args if not arg.startswith('%')]
+            if options:
+                option = options[-1].lstrip('-')
+                option = option[3:] if option.upper().startswith('SIG') else option
+                signum = int(option) if option.isdigit() else SIGNALS.get(option.upper())
+                if signum is None:
+                    on_output(f"kill: {options[-1]}: invalid signal specification\n")
+                    return True, 1
+            status = 0
+            for spec in specs:
+                job = self.jobs.get(spec)
+                if job is None:
+                    on_output(f"kill: {spec}: no such job\n")
+                    status = 1
+                    continue
+                job.send(signum)
+                # A stopped job only acts on the signal once it runs again
+                if job.state == 'Stopped' and signum != getattr(signal, 'SIGSTOP', None):
+                    job.send(signal.SIGCONT)
+            return True, status
+            
+        job = self.jobs.get(args[0] if args else '')
+        if job is None or (name == 'bg' and job.state == 'Done'):
+            on_output(f"{name}: {args[0] if args else 'current'}: no such job\n")
+            return True, 1
+        if name == 'bg':
+            job.send(signal.SIGCONT)
+            on_output(f"[{job.number}]+ {job.command} &\n")
+            return True, 0
+        on_output(f"{job.command}\n")
+        return True, self.foreground(job, on_output)
+
+    def foreground(self, job, on_output):
+        """
+        Show a job's output and wait for it, until it ends or stop_foreground() is called
+        Returns: its exit status, or None if it was sent back to the background
+        """
+        self.foreground_job = job
+        if job.state == 'Stopped':
+            job.send(signal.SIGCONT)
+        job.attach(on_output)
+        while self.foreground_job is job and not job.finished.wait(0.05):
+            pass
+        job.detach()
+        
+        if job.finished.is_set():
+            self.jobs.remove(job)
+            self.foreground_job = None
+            return job.status
+        on_output(f"\n{format_job(job, job.number)}\n")
+        return None
+
+    def stop_foreground(self):
+        """Ctrl+Z: stop the foreground job and give the prompt back"""
+        job = self.foreground_job
+        if job is None:
+            return False
+        job.send(getattr(signal, 'SIGSTOP', signal.SIGTERM))
+        self.foreground_job = None
+        return True
+
+    def interrupt(self):
+        """
+        Ctrl+C: stop what is running in the foreground - a job brought back with
+        fg, a command in the shell session, on a pseudo-terminal or in a one-off
+        shell - escalating from SIGINT to SIGKILL on a background thread
+        Returns: True if something was running; its command then returns as usual
+        """
+        job = self.foreground_job
+        process = self.foreground_process
+        if self.pty_process is not None:
+            process = self.pty_process.process
+        if job is not None:
+            target = job.interrupt
+        elif process is not None:
+            target = lambda: interrupt_process(process)
+        elif self.shell_session is not None and self.shell_session.busy():
+            target = self.shell_session.interrupt
+        else:
+            return False
+        threading.Thread(target=target, daemon=True).start()
+        return True
+
+    def job_finished(self, job):
+        """Called from a job's reader thread when it ends"""
+        # A job in the foreground is reported by foreground() itself
+        if job is not self.foreground_job and self.on_job_done is not None:
+            self.on_job_done(job)
+
+    def translate_only(self, command):
+        """Classify and translate a line of input without running it - same result shape as run_command"""
+        command_type = self.detect_command_type(command)
+        result = {'query': command, 'type': command_type, 'command': command,
+                  'status': None, 'cwd': self.current_directory, 'error': None}
+        if command_type == 'natural':
+            try:
+                translated_command = self.translate_command(command)
+            except Exception as e:
+                result['error'] = f"Error processing command: {str(e)}"
+                return result
+            if translated_command.startswith("ERROR:"):
+                result['error'] = translated_command
+            elif translated_command != "VALID_COMMAND":
+                result['command'] = translated_command
+        return result
+
+    def run_script(self, path, on_output):
+        """Translate every step of a script in batches, then run them in order"""
+        steps = read_steps(path)
+        calls = self.batch_translator.calls
+        on_output(f"Translating {len(steps)} steps from {path}\n")
+        commands = self.batch_translator.translate(steps, self.current_directory)
+        on_output(f"Translated with {self.batch_translator.calls - calls} LLM calls\n")
+        ran = run_steps(steps, commands,
+                        lambda step: self.run_limited(step, on_output, self.limits['translated'])[0],
+                        on_output)
+        on_output(f"Ran {ran} of {len(steps)} steps\n")
+        return ran
+
+    def start_translation(self, command):
+        """
+        Start translating command in the background (e.g. while it is still
+        being typed) - cheap enough for the UI thread, since classifying the
+        input happens on the LLM client's executor. Stale translations for
+        other input are cancelled. Returns False for input that is never sent
+        to the LLM.
+        """
+        if not command or command.startswith(':'):
+            return False
+        key = (command, self.current_directory)
+        with self.speculation_lock:
+            if self.speculation is not None:
+                if self.speculation[:2] == key:
+                    return True
+                # The input changed - the old translation is stale
+                self.speculation[2].cancel()
+                self.speculation = None
+            future = self.llm_client.submit(lambda: self.speculate(*key))
+            self.speculation = key + (future,)
+        return True
+
+    def needs_llm(self, command):
+        """True if command is natural language the local rules can't translate"""
+        return self.detect_command_type(command) == 'natural' and self.fast_path.translate(command) is None
+
+    async def speculate(self, command, current_dir):
+        """
+        Translate input that is still being typed if it needs the LLM - runs on
+        the LLM client's loop, with the classification (which may list PATH)
+        on its executor
+        Returns: the translation, or None if the input doesn't need one
+        """
+        if not await asyncio.get_running_loop().run_in_executor(None, self.needs_llm, command):
+            return None
+        return await self.fetch_translation(command, current_dir)
+
+    def take_speculation(self, command):
+        """
+        Claim the speculative translation for command
+        Returns: its future, or None if nothing usable was started for it
+        """
+        with self.speculation_lock:
+            speculation, self.speculation = self.speculation, None
+        if speculation is None:
+            return None
+        if speculation[:2] != (command, self.current_directory) or speculation[2].cancelled():
+            speculation[2].cancel()
+            return None
+        return speculation[2]
+
+    def cancel(self):
+        """Cancel every translation still waiting on the LLM"""
+        with self.speculation_lock:
+            self.speculation = None
+        return self.llm_client.cancel_all()
+
+    def translate_command(self, command):
+        """
+        Translate natural language to bash - local rules first, then a translation
+        started while the user was typing, then the cache, then the LLM
+        """
+        translated_command = self.fast_path.translate(command)
+        if translated_command is not None:
+            return translated_command
+
+        speculation = self.take_speculation(command)
+        if speculation is not None:
+            try:
+                translated_command = speculation.result()
+            except Exception:
+                # A failed speculative request is retried like a cache miss
+                translated_command = None
+            if translated_command is not None:
+                return translated_command
+
+        current_dir = self.current_directory
+        trace = self.tracer.current()
+        return self.llm_client.request(lambda: self.fetch_translation(command, current_dir, trace))
+
+    async def fetch_translation(self, command, current_dir, trace=None):
+        """
+        Look up the cache and fall back to the LLM - runs on the LLM client's loop
+        trace is the command's trace id (None while speculating)
+        """
+        translated_command = self.translation_cache.get(command, 'bash', current_dir)
+        if translated_command is not None:
+            return translated_command
+            
+        await self.wait_for_llm()
+        with self.tracer.span('llm', trace, speculative=trace is None):
+            response = await self.provider.agenerate(
+                TRANSLATION_TEMPLATE.format(query=command, current_dir=current_dir))
+        
+        translated_command = response.strip()
+        
+        # Clean up response - remove any markdown or extra text that might appear
+        with self.tracer.span('clean', trace):
+            translated_command = self.clean_llm_response(translated_command)
+        
+        # Errors are not cached so that they can be retried
+        if not translated_command.startswith("ERROR:"):
+            self.translation_cache.put(command, 'bash', current_dir, translated_command)
+        return translated_command
+
+    def generate(self, prompt):
+        """Send a raw prompt to the LLM and return the response text"""
+        return self.llm_client.request(lambda: self.invoke_llm(prompt))
+
+    async def invoke_llm(self, prompt):
+        """Send a raw prompt once the LLM is ready - runs on the LLM client's loop"""
+        await self.wait_for_llm()
+        with self.tracer.span('llm', batch=True):
+            return await self.provider.agenerate(prompt)
+
+    async def wait_for_llm(self):
+        """Wait for the background LLM setup - only queries that arrive early ever wait"""
+        # Shielded so that cancelling a request doesn't cancel the setup itself
+        await asyncio.shield(asyncio.wrap_future(self.llm_ready))
+        if self.provider is None:
+            raise RuntimeError(self.setup_error)
+
+    def clean_llm_response(self, response):
+        """Clean LLM response from markdown, code blocks, or extra text"""
+        # If it's already an error message, return it as is
+        if response.startswith("ERROR:"):
+            return response
+            
+        if response == "VALID_COMMAND":
+            return response
+            
+        # Remove markdown code blocks if present
+        response = re.sub(r'```(?:bash|shell)?\s*(.*?)\s*```', r'\1', response, flags=re.DOTALL)
+        
+        # If multiple lines, get only the first non-empty line that doesn't start with #
+        lines = [line.strip() for line in response.split('\n') if line.strip() and not line.strip().startswith('#')]
+        if lines:
+            return lines[0]
+            
+        return response
+
+    def execute_bash_command(self, bash_command):
+        """
+        Execute a bash command and return the output - output too big to keep
+        in memory is left in a temporary file and only its ends are returned
+        """
+        try:
+            # Run the command in the persistent bash session so that cd, export,
+            # aliases and functions carry over between commands
+            if self.shell_session is not None:
+                output = SpillBuffer(keeper=self.spill_keeper)
+                _, status, cwd = self.shell_session.run(bash_command, on_output=output)
+                self.current_directory = cwd
+                if status == 0 and (bash_command.strip().startswith("cd ") or bash_command.strip() == "cd"):
+                    return f"Changed directory to {self.current_directory}\n"
+                return output.text()
+            
+            # Without bash, fall back to a one-off shell per command
+            # Handle built-in commands like cd that affect the process state
+            if bash_command.strip().startswith("cd ") or bash_command.strip() == "cd":
+                dir_part = bash_command.strip()[3:].strip() if bash_command.strip() != "cd" else ""
+                
+                # Handle special case for home directory
+                if dir_part == "~" or dir_part == "":
+                    target_dir = os.path.expanduser("~")
+                # Handle parent directory
+                elif dir_part == "..":
+                    target_dir = os.path.dirname(self.current_directory)
+                # Handle absolute paths
+                elif os.path.isabs(dir_part):
+                    target_dir = dir_part
+                # Handle relative paths
+                else:
+                    target_dir = os.path.join(self.current_directory, dir_part)
+                    
+                if os.path.exists(target_dir) and os.path.isdir(target_dir):
+                    self.current_directory = os.path.abspath(target_dir)
+                    return f"Changed directory to {self.current_directory}\n"
+                else:
+                    return f"bash: cd: {dir_part}: No such file or directory\n"
+            
+            # For all other commands - read as a stream, since communicate()
+            # would hold all of it in memory
+            process = subprocess.Popen(
+                bash_command,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=self.current_directory,
+                **new_group_options()
+            )
+            output = SpillBuffer(keeper=self.spill_keeper)
+            self.foreground_process = process
+            try:
+                stream_process(process, output)
+            finally:
+                self.foreground_process = None
+            return output.text()
+                
+        except Exception as e:
+            return f"Error executing command: {str(e)}\n"
+
+    def run_limited(self, bash_command, on_output, limits):
+        """
+        Stream a bash command under limits, stopping it when it runs too long
+        or prints too much, and saying so when a limit ended it
+        Returns: (exit status, message naming the limit hit or None)
+        """
+        if not limits.active():
+            return self.stream_bash_command(bash_command, on_output), None
+        guard = LimitGuard(limits, self.interrupt)
+        guard.start()
+        status = self.stream_bash_command(bash_command, guard.wrap(on_output), limits)
+        message = guard.finish(status)
+        if message:
+            on_output(f"{message}\n")
+        return status, message
+
+    def stream_bash_command(self, bash_command, on_output, limits=None):
+        """
+        Execute a bash command, pushing its output to on_output as it arrives
+        limits (a CommandLimits) sets its CPU, memory and open files rlimits
+        Returns: the exit status, or None if it isn't known
+        """
+        started = time.perf_counter()
+        status = None
+        try:
+            status = self.run_bash_command(bash_command, self.tracer.watch_output(on_output, started),
+                                           limits, started)
+            return status
+        finally:
+            self.tracer.record('exit', time.perf_counter() - started, status=status)
+
+    def run_bash_command(self, bash_command, on_output, limits, started):
+        """stream_bash_command without the tracing - started is when it was asked to run"""
+        def spawned():
+            self.tracer.record('spawn', time.perf_counter() - started)
+            
+        try:
+            if self.shell_session is not None:
+                output, status, cwd = self.shell_session.run(bash_command, on_output=on_output, limits=limits,
+                                                             on_started=spawned)
+                self.current_directory = cwd
+                if status == 0 and (bash_command.strip().startswith("cd ") or bash_command.strip() == "cd"):
+                    on_output(f"Changed directory to {self.current_directory}\n")
+                if SHELL_STATE_PATTERN.search(bash_command):
+                    self.sync_command_index()
+                return status
+            
+            # Built-ins like cd have nothing to stream
+            if bash_command.strip().startswith("cd ") or bash_command.strip() == "cd":
+                on_output(self.execute_bash_command(bash_command))
+                return
+            
+            ulimit = limits.ulimit_command() if limits is not None else ""
+            process = subprocess.Popen(
+                f"{ulimit}; {bash_command}" if ulimit else bash_command,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=self.current_directory,
+                **new_group_options()
+            )
+            spawned()
+            self.foreground_process = process
+            try:
+                return stream_process(process, on_output)
+            finally:
+                self.foreground_process = None
+                
+        except Exception as e:
+            on_output(f"Error executing command: {str(e)}\n")
+
+    def sync_command_index(self):
+        """Pick up the session's current PATH, aliases and functions"""
+        try:
+            path, status, cwd = self.shell_session.run('printf "%s" "$PATH"')
+            names, status, cwd = self.shell_session.run("compgen -a -A function")
+            self.command_index.set_path(path.strip())
+            self.command_index.set_shell_names(names.split())
+        except Exception:
+            # Classification falls back to what the index already knows
+            pass
+
+    def close(self):
+        """Stop the LLM client, background jobs and the bash session and close the cache"""
+        self.llm_client.close()
+        if self.provider is not None:
+            self.provider.close()
+        self.jobs.close()
+        if self.shell_session is not None:
+            self.shell_session.close()
+        self.translation_cache.close()
+        self.tracer.close()
+        self.spill_keeper.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Natural language terminal without the GUI - type bash commands or plain English")
+    parser.add_argument("-c", dest="query", help="run a single query and exit")
+    parser.add_argument("-f", dest="file", help="run every line of a file as a query, in order")
+    parser.add_argument("--json", action="store_true",
+                        help="print one JSON object per query instead of streaming output")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="only translate - print the commands without running them")
+    parser.add_argument("--limit", action="append", default=[], metavar="KIND.NAME=VALUE",
+                        help="set a resource limit, e.g. translated.cpu=60 or typed.wall=off "
+                             f"(names: {', '.join(LIMIT_NAMES)})")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long each startup phase took to stderr")
+    parser.add_argument("--stats", action="store_true",
+                        help="print latency percentiles per stage to stderr")
+    parser.add_argument("--llm", metavar="SPEC",
+                        help="LLM backend: gemini, replay:FILE, record:FILE or the URL of a "
+                             "Gemini-compatible server such as llm_standin.py (default $EASY_TERMINAL_LLM or gemini)")
+    args = parser.parse_args()
+
+    if args.query is not None:
+        queries = [args.query]
+    elif args.file is not None:
+        queries = read_steps(args.file)
+    else:
+        queries = (line.strip() for line in sys.stdin)
+
+    timer = StartupTimer()
+    timer.mark("imports")
+    engine = TerminalEngine(timer=timer, llm=args.llm)
+    timer.mark("engine")
+    # There is nothing to forward keystrokes from
+    engine.use_pty = False
+    for limit in args.limit:
+        try:
+            setting, value = limit.split("=", 1)
+            kind, name = setting.split(".", 1)
+            engine.set_limit(kind, name, value)
+        except ValueError as e:
+            engine.close()
+            parser.error(f"--limit {limit}: {str(e)}")
+    status = 0
+    try:
+        # Translate a whole file up front so that it costs as few LLM calls as possible
+        if args.file is not None:
+            natural = [query for query in queries if engine.detect_command_type(query) == 'natural']
+            if natural:
+                try:
+                    engine.batch_translator.translate(natural, engine.current_directory)
+                except Exception:
+                    # Each query reports the error when it is translated on its own
+                    pass
+
+        for query in queries:
+            if not query:
+                continue
+            started = time.perf_counter()
+            output = SpillBuffer()
+            if args.dry_run:
+                result = engine.translate_only(query)
+            elif args.json:
+                result = engine.run_command(query, output, lambda text: None)
+            else:
+                result = engine.run_command(query, sys.stdout.write, sys.stderr.write)
+                sys.stdout.flush()
+
+            if result['error']:
+                status = 1
+            elif result['status']:
+                status = result['status']
+            if args.json:
+                # Huge output stays in its temporary file, left for the caller to
+                # delete; the JSON gets its ends and the path
+                result['output'] = output.text()
+                result['output_file'] = output.detach()
+                result['duration'] = round(time.perf_counter() - started, 6)
+                print(json.dumps(result), flush=True)
+            elif args.dry_run:
+                print(result['error'] or result['command'], flush=True)
+    except KeyboardInterrupt:
+        engine.cancel()
+        status = 130
+    finally:
+        engine.close()
+        if args.startup_report:
+            sys.stderr.write(timer.report())
+        if args.stats:
+            sys.stderr.write(engine.tracer.report())
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
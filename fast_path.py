@@ -0,0 +1,252 @@
+import re
+import shlex
+
+# Polite prefixes/suffixes that don't change what the user is asking for
+FILLER_PATTERN = re.compile(
+    r'^(?:(?:please|can you|could you|would you|will you|kindly|i want to|i need to|'
+    r"i'd like to|let's|lets)\s+)+|\s+(?:please|for me|now)$",
+    re.IGNORECASE
+)
+
+# Friendly names for file types in "find all <type> files"
+FILE_TYPES = {
+    'text': 'txt', 'python': 'py', 'javascript': 'js', 'java': 'java', 'markdown': 'md',
+    'image': 'png', 'png': 'png', 'jpg': 'jpg', 'jpeg': 'jpeg', 'pdf': 'pdf', 'log': 'log',
+    'json': 'json', 'csv': 'csv', 'shell': 'sh', 'html': 'html', 'css': 'css', 'c': 'c',
+}
+
+# What a {slot} may match - any run of words without shell metacharacters,
+# except for slots that have a narrower pattern here
+SLOT_PATTERN = r"[^\s|&;<>`$]+(?: [^\s|&;<>`$]+)*?"
+SLOT_PATTERNS = {
+    'ext': r"(?:" + "|".join(FILE_TYPES) + r"|\*?\.\w+)",
+}
+
+# Building blocks shared by the rules
+FILES = r"(?:show|list|display|give)(?: me)?(?: all)?(?: the)? files"
+HERE = r"(?: (?:in|of) (?:this|the current|current|my current) (?:folder|directory|dir))?"
+FOLDER = r"(?:folder|directory|dir)"
+NAMED = r"(?:named|called)"
+
+
+def quote_bash(value):
+    """Quote a slot value for bash, leaving a leading ~ expandable"""
+    if value == '~':
+        return value
+    if value.startswith('~/'):
+        return '~/' + shlex.quote(value[2:])
+    return shlex.quote(value)
+
+
+def quote_cmd(value):
+    """Quote a slot value for CMD"""
+    return f'"{value}"' if re.search(r'[\s&|<>^()]', value) else value
+
+
+def quote_powershell(value):
+    """Quote a slot value for PowerShell"""
+    if re.fullmatch(r'[\w./\\:~-]+', value):
+        return value
+    return "'" + value.replace("'", "''") + "'"
+
+
+def file_extension(value):
+    """Map 'python' / '.py' / 'py' to an extension without the dot"""
+    value = value.lower().lstrip('.*')
+    return FILE_TYPES.get(value, value)
+
+
+def text_file_name(value):
+    """'notes' -> 'notes.txt', 'notes.md' stays as it is"""
+    return value if '.' in value else f"{value}.txt"
+
+
+# Rules per backend: (pattern, template). Patterns are matched against the whole
+# query, case-insensitively, and may contain {slot} placeholders. Templates are
+# format strings over the (quoted) slots, or functions taking the slot dict.
+RULES = {
+    'bash': [
+        (FILES + HERE, "ls -la"),
+        (r"(?:show|list|display)(?: me)?(?: all)?(?: the)? hidden files" + HERE, "ls -la"),
+        (r"what(?:'s| is) my (?:ip|ip address)|(?:show|get)(?: me)?(?: my)? ip(?: address)?",
+         "hostname -I"),
+        (r"what(?:'s| is) my public ip(?: address)?", "curl -s https://ifconfig.me"),
+        (r"(?:show|list|display)(?: me)?(?: all)?(?: the)? (?:running )?processes|what(?:'s| is) running",
+         "ps aux"),
+        (r"(?:show|display|get)(?: me)?(?: the)? system (?:information|info)|system (?:information|info)",
+         "uname -a"),
+        (r"(?:check|show|display)(?: the)? (?:free )?disk (?:space|usage)|how much disk space(?: is left| do i have)?",
+         "df -h"),
+        (r"(?:check|show|display)(?: the)? (?:free )?memory(?: usage)?|how much (?:free )?memory(?: is free| do i have)?",
+         "free -h"),
+        (r"(?:create|make)(?: a)?(?: new)? " + FOLDER + r" " + NAMED + r" {name}", "mkdir {name}"),
+        (r"(?:create|make)(?: a)?(?: new)? text file " + NAMED + r" {name}",
+         lambda slots: f"touch {quote_bash(text_file_name(slots['name']))}"),
+        (r"(?:create|make)(?: a)?(?: new)?(?: empty)? file " + NAMED + r" {name}", "touch {name}"),
+        (r"(?:show|find|list)(?: me)?(?: the)? (?:biggest|largest) files" + HERE,
+         "du -ah . | sort -rh | head -n 10"),
+        (r"(?:find|list|show)(?: me)?(?: all)?(?: the)? {ext} files" + HERE,
+         lambda slots: f"find . -type f -name {quote_bash('*.' + file_extension(slots['ext']))}"),
+        (r"where am i|(?:show|print|what(?:'s| is))(?: me)?(?: the)? current (?:folder|directory|path)",
+         "pwd"),
+        (r"who am i|what(?:'s| is) my (?:user ?name|user)", "whoami"),
+        (r"what time is it|(?:show|what(?:'s| is))(?: me)?(?: the)?(?: current)? (?:date|time|date and time)",
+         "date"),
+        (r"how long has the (?:system|computer|machine) been (?:up|running)|(?:show )?(?:the )?(?:system )?uptime",
+         "uptime"),
+        (r"go (?:back|up)(?: one (?:level|folder|directory))?|go to(?: the)? parent " + FOLDER, "cd .."),
+        (r"go (?:to )?home|go to(?: my)? home " + FOLDER, "cd ~"),
+        (r"(?:go to|change " + FOLDER + r" to|open(?: the)? " + FOLDER + r"|enter(?: the)? " + FOLDER + r") {dir}",
+         "cd {dir}"),
+        (r"(?:show|print|display|read)(?: me)?(?: the)? contents of {name}|(?:show|print|display|read)(?: me)?(?: the)? file {name}",
+         "cat {name}"),
+        (r"(?:show|list|display)(?: me)?(?: the)? (?:open ports|network connections|listening ports)",
+         "ss -tuln"),
+        (r"(?:check )?(?:if )?{host} is (?:up|reachable|online)|(?:check|test) (?:the )?connection to {host}",
+         "ping -c 4 {host}"),
+        (r"count(?: the)?(?: number of)? files" + HERE + r"|how many files are (?:here|in (?:this|the current) " + FOLDER + r")",
+         "ls -1 | wc -l"),
+    ],
+    'cmd': [
+        (FILES + HERE, "dir"),
+        (r"(?:show|list|display)(?: me)?(?: all)?(?: the)? hidden files" + HERE, "dir /a"),
+        (r"what(?:'s| is) my (?:ip|ip address)|(?:show|get)(?: me)?(?: my)? ip(?: address)?", "ipconfig"),
+        (r"(?:show|list|display)(?: me)?(?: all)?(?: the)? (?:running )?processes|what(?:'s| is) running",
+         "tasklist"),
+        (r"(?:show|display|get)(?: me)?(?: the)? system (?:information|info)|system (?:information|info)",
+         "systeminfo"),
+        (r"(?:check|show|display)(?: the)? (?:free )?disk (?:space|usage)|how much disk space(?: is left| do i have)?",
+         "wmic logicaldisk get size,freespace,caption"),
+        (r"(?:create|make)(?: a)?(?: new)? " + FOLDER + r" " + NAMED + r" {name}", "mkdir {name}"),
+        (r"(?:create|make)(?: a)?(?: new)? text file " + NAMED + r" {name}",
+         lambda slots: f"echo. > {quote_cmd(text_file_name(slots['name']))}"),
+        (r"(?:create|make)(?: a)?(?: new)?(?: empty)? file " + NAMED + r" {name}", "type nul > {name}"),
+        (r"(?:find|list|show)(?: me)?(?: all)?(?: the)? {ext} files" + HERE,
+         lambda slots: f"dir *.{file_extension(slots['ext'])}"),
+        (r"where am i|(?:show|print|what(?:'s| is))(?: me)?(?: the)? current (?:folder|directory|path)", "cd"),
+        (r"who am i|what(?:'s| is) my (?:user ?name|user)", "whoami"),
+        (r"what time is it|(?:show|what(?:'s| is))(?: me)?(?: the)?(?: current)? (?:date|time|date and time)",
+         "echo %date% %time%"),
+        (r"go (?:back|up)(?: one (?:level|folder|directory))?|go to(?: the)? parent " + FOLDER, "cd .."),
+        (r"go (?:to )?home|go to(?: my)? home " + FOLDER, "cd %USERPROFILE%"),
+        (r"(?:go to|change " + FOLDER + r" to|open(?: the)? " + FOLDER + r"|enter(?: the)? " + FOLDER + r") {dir}",
+         "cd {dir}"),
+        (r"(?:show|print|display|read)(?: me)?(?: the)? contents of {name}|(?:show|print|display|read)(?: me)?(?: the)? file {name}",
+         "type {name}"),
+        (r"(?:show|list|display)(?: me)?(?: the)? (?:open ports|network connections|listening ports)",
+         "netstat -an"),
+        (r"(?:check )?(?:if )?{host} is (?:up|reachable|online)|(?:check|test) (?:the )?connection to {host}",
+         "ping {host}"),
+    ],
+    'powershell': [
+        (FILES + HERE, "Get-ChildItem"),
+        (r"(?:show|list|display)(?: me)?(?: all)?(?: the)? hidden files" + HERE, "Get-ChildItem -Force"),
+        (r"what(?:'s| is) my (?:ip|ip address)|(?:show|get)(?: me)?(?: my)? ip(?: address)?",
+         "Get-NetIPAddress -AddressFamily IPv4"),
+        (r"(?:show|list|display)(?: me)?(?: all)?(?: the)? (?:running )?processes|what(?:'s| is) running",
+         "Get-Process"),
+        (r"(?:show|display|get)(?: me)?(?: the)? system (?:information|info)|system (?:information|info)",
+         "Get-ComputerInfo"),
+        (r"(?:check|show|display)(?: the)? (?:free )?disk (?:space|usage)|how much disk space(?: is left| do i have)?",
+         "Get-PSDrive -PSProvider FileSystem"),
+        (r"(?:create|make)(?: a)?(?: new)? " + FOLDER + r" " + NAMED + r" {name}",
+         "New-Item -ItemType Directory -Name {name}"),
+        (r"(?:create|make)(?: a)?(?: new)? text file " + NAMED + r" {name}",
+         lambda slots: f"New-Item -ItemType File -Name {quote_powershell(text_file_name(slots['name']))}"),
+        (r"(?:create|make)(?: a)?(?: new)?(?: empty)? file " + NAMED + r" {name}",
+         "New-Item -ItemType File -Name {name}"),
+        (r"(?:show|find|list)(?: me)?(?: the)? (?:biggest|largest) files" + HERE,
+         "Get-ChildItem -Recurse -File | Sort-Object Length -Descending | Select-Object -First 10 FullName, Length"),
+        (r"(?:find|list|show)(?: me)?(?: all)?(?: the)? {ext} files" + HERE,
+         lambda slots: f"Get-ChildItem -Recurse -Filter *.{file_extension(slots['ext'])}"),
+        (r"where am i|(?:show|print|what(?:'s| is))(?: me)?(?: the)? current (?:folder|directory|path)",
+         "Get-Location"),
+        (r"who am i|what(?:'s| is) my (?:user ?name|user)", "whoami"),
+        (r"what time is it|(?:show|what(?:'s| is))(?: me)?(?: the)?(?: current)? (?:date|time|date and time)",
+         "Get-Date"),
+        (r"go (?:back|up)(?: one (?:level|folder|directory))?|go to(?: the)? parent " + FOLDER, "Set-Location .."),
+        (r"go (?:to )?home|go to(?: my)? home " + FOLDER, "Set-Location ~"),
+        (r"(?:go to|change " + FOLDER + r" to|open(?: the)? " + FOLDER + r"|enter(?: the)? " + FOLDER + r") {dir}",
+         "Set-Location {dir}"),
+        (r"(?:show|print|display|read)(?: me)?(?: the)? contents of {name}|(?:show|print|display|read)(?: me)?(?: the)? file {name}",
+         "Get-Content {name}"),
+        (r"(?:show|list|display)(?: me)?(?: the)? (?:open ports|network connections|listening ports)",
+         "Get-NetTCPConnection"),
+        (r"(?:check )?(?:if )?{host} is (?:up|reachable|online)|(?:check|test) (?:the )?connection to {host}",
+         "Test-Connection {host}"),
+        (r"count(?: the)?(?: number of)? files" + HERE + r"|how many files are (?:here|in (?:this|the current) " + FOLDER + r")",
+         "(Get-ChildItem -File).Count"),
+    ],
+}
+
+QUOTERS = {'bash': quote_bash, 'cmd': quote_cmd, 'powershell': quote_powershell}
+
+
+class FastPathTranslator:
+    """
+    Resolves common natural language queries locally, without the LLM.
+    All rules for a backend are compiled into one alternation, so a query is
+    matched in a single regex pass.
+    """
+
+    def __init__(self, shell):
+        self.shell = shell
+        self.quote = QUOTERS[shell]
+        self.templates = []
+        alternatives = []
+
+        for index, (pattern, template) in enumerate(RULES[shell]):
+            # Group names must be unique across the combined pattern, and a slot
+            # may appear in more than one alternative of the same rule
+            seen = {}
+
+            def slot(match):
+                name = match.group(1)
+                seen[name] = seen.get(name, 0) + 1
+                suffix = f"__{seen[name]}" if seen[name] > 1 else ""
+                return f"(?P<r{index}_{name}{suffix}>{SLOT_PATTERNS.get(name, SLOT_PATTERN)})"
+
+            body = re.sub(r'\{(\w+)\}', slot, pattern)
+            alternatives.append(f"(?P<r{index}>{body})")
+            self.templates.append(template)
+
+        self.pattern = re.compile(r'^(?:' + '|'.join(alternatives) + r')$', re.IGNORECASE)
+
+    @staticmethod
+    def clean_query(query):
+        """Strip whitespace, filler words and trailing punctuation from a query"""
+        query = re.sub(r'\s+', ' ', query.strip()).rstrip('?.! ')
+        previous = None
+        while previous != query:
+            previous = query
+            query = FILLER_PATTERN.sub('', query).strip()
+        return query
+
+    def translate(self, query):
+        """Return the command for a query, or None if no rule matches"""
+        match = self.pattern.match(self.clean_query(query))
+        if match is None:
+            return None
+
+        index = int(match.lastgroup[1:])
+        values = {}
+        for group, value in match.groupdict().items():
+            if value is None or not group.startswith(f"r{index}_"):
+                continue
+            name = group[len(f"r{index}_"):].split('__')[0]
+            values[name] = value
+
+        template = self.templates[index]
+        if callable(template):
+            return template(values)
+        return template.format(**{name: self.quote(value) for name, value in values.items()})
+
+
+translators = {}
+
+
+def get_translator(shell):
+    """Shared, lazily compiled translator for a backend"""
+    if shell not in translators:
+        translators[shell] = FastPathTranslator(shell)
+    return translators[shell]
@@ -0,0 +1,206 @@
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    # Windows - appends of a single line are still done with one write
+    fcntl = None
+
+from translation_cache import DATA_DIR
+
+# Searches shorter than this scan recent entries instead of using the trigram index
+TRIGRAM = 3
+
+# Patterns shorter than TRIGRAM only look at this many recent entries
+SHORT_SCAN_LIMIT = 20000
+
+# Lines indexed per lock acquisition while loading
+LOAD_BATCH = 1024
+
+
+def trigrams(text):
+    """The set of 3-character substrings of text"""
+    return {text[i:i + TRIGRAM] for i in range(len(text) - TRIGRAM + 1)}
+
+
+class HistoryStore:
+    """
+    Append-only command history shared by every terminal session. Each entry
+    is one JSON line holding what was typed, the command that ran, the working
+    directory, exit status and duration. Distinct entries are indexed by
+    trigram, so substring search stays fast with millions of lines on disk.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DATA_DIR, "history.jsonl")
+        self.lock = threading.Lock()
+        self.texts = []              # distinct typed inputs, by id
+        self.commands = []           # last command each input ran as
+        self.ids = {}                # typed input -> id
+        self.recent = OrderedDict()  # ids, least recently used first
+        self.last_used = array("Q")  # id -> entry number of its latest use
+        self.uses = array("I")       # id -> how many times it was run
+        self.postings = {}           # trigram -> array of ids
+        self.entries = 0
+        self.loaded = threading.Event()
+
+    def load(self):
+        """Index the history file - slow for big files, so call it off the UI thread"""
+        try:
+            with open(self.path, encoding="utf-8", errors="replace") as history_file:
+                batch = []
+                for line in history_file:
+                    try:
+                        batch.append(json.loads(line))
+                    except ValueError:
+                        # A line cut short by a crash - skip it
+                        continue
+                    if len(batch) >= LOAD_BATCH:
+                        self.index_batch(batch)
+                        batch = []
+                self.index_batch(batch)
+        except OSError:
+            pass
+        self.loaded.set()
+
+    def index_batch(self, entries):
+        """Index entries read from disk, holding the lock once for all of them"""
+        with self.lock:
+            for entry in entries:
+                if isinstance(entry, dict):
+                    self.index(entry)
+
+    def index(self, entry):
+        """Add one entry to the in-memory index - callers hold the lock"""
+        query = entry.get('query') or entry.get('command')
+        if not query:
+            return
+        self.entries += 1
+        command = entry.get('command') or query
+        entry_id = self.ids.get(query)
+        if entry_id is None:
+            entry_id = len(self.texts)
+            self.ids[query] = entry_id
+            self.texts.append(query)
+            self.commands.append(command)
+            self.last_used.append(0)
+            self.uses.append(0)
+            for trigram in trigrams(self.search_text(query, command)):
+                posting = self.postings.get(trigram)
+                if posting is None:
+                    posting = self.postings[trigram] = array("I")
+                posting.append(entry_id)
+        elif command != self.commands[entry_id]:
+            # Make the new translation findable too
+            self.commands[entry_id] = command
+            for trigram in trigrams(self.search_text(query, command)):
+                posting = self.postings.setdefault(trigram, array("I"))
+                if not posting or posting[-1] != entry_id:
+                    posting.append(entry_id)
+        self.last_used[entry_id] = self.entries
+        self.uses[entry_id] += 1
+        self.recent[entry_id] = None
+        self.recent.move_to_end(entry_id)
+
+    @staticmethod
+    def search_text(query, command):
+        """What a search matches against - the typed input and, if different, the command"""
+        text = query if command == query else f"{query}\n{command}"
+        return text.lower()
+
+    def append(self, query, command=None, cwd=None, status=None, duration=None, kind=None):
+        """Record a command and add it to the index - it stays searchable even if saving fails"""
+        entry = {
+            'time': round(time.time(), 3),
+            'query': query,
+            'command': command or query,
+            'type': kind,
+            'cwd': cwd,
+            'status': status,
+            'duration': None if duration is None else round(duration, 6),
+        }
+        try:
+            line = (json.dumps(entry) + "\n").encode("utf-8")
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # O_APPEND plus a single write keeps lines from concurrent sessions whole
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        except (OSError, TypeError, ValueError) as e:
+            # A history that can't be saved must never fail the command itself
+            sys.stderr.write(f"Error saving history to {self.path}: {str(e)}\n")
+        with self.lock:
+            self.index(entry)
+        return entry
+
+    def search(self, pattern, limit=None):
+        """
+        Distinct typed inputs containing pattern (case-insensitive), most recent first
+        """
+        pattern = pattern.lower()
+        with self.lock:
+            if len(pattern) < TRIGRAM:
+                matches = []
+                for scanned, entry_id in enumerate(reversed(self.recent)):
+                    if scanned >= SHORT_SCAN_LIMIT or (limit and len(matches) >= limit):
+                        break
+                    if pattern in self.search_text(self.texts[entry_id], self.commands[entry_id]):
+                        matches.append(entry_id)
+                return [self.texts[entry_id] for entry_id in matches]
+
+            # Candidates come from the rarest trigram, narrowed by the next rarest
+            postings = sorted((self.postings.get(trigram, ()) for trigram in trigrams(pattern)), key=len)
+            if not postings[0]:
+                return []
+            candidates = set(postings[0])
+            if len(postings) > 1:
+                candidates.intersection_update(postings[1])
+
+            # With many candidates and few results wanted, walking back through
+            # the most recent entries finds them sooner than sorting them all
+            if limit and len(candidates) > limit * 64:
+                matches = []
+                for entry_id in reversed(self.recent):
+                    if entry_id in candidates and pattern in self.search_text(
+                            self.texts[entry_id], self.commands[entry_id]):
+                        matches.append(self.texts[entry_id])
+                        if len(matches) >= limit:
+                            break
+                return matches
+
+            matches = [entry_id for entry_id in candidates
+                       if pattern in self.search_text(self.texts[entry_id], self.commands[entry_id])]
+            matches.sort(key=self.last_used.__getitem__, reverse=True)
+            matches = [self.texts[entry_id] for entry_id in matches]
+            return matches[:limit] if limit else matches
+
+    def recent_ids(self, count):
+        """Ids of the last count distinct typed inputs, oldest first - callers hold the lock"""
+        ids = []
+        for entry_id in reversed(self.recent):
+            if len(ids) >= count:
+                break
+            ids.append(entry_id)
+        ids.reverse()
+        return ids
+
+    def recent_queries(self, count):
+        """The last count distinct typed inputs, oldest first"""
+        with self.lock:
+            return [self.texts[entry_id] for entry_id in self.recent_ids(count)]
+
+    def recent_usage(self, count):
+        """(query, uses, last use) for the last count distinct typed inputs, oldest first"""
+        with self.lock:
+            return [(self.texts[entry_id], self.uses[entry_id], self.last_used[entry_id])
+                    for entry_id in self.recent_ids(count)]
@@ -0,0 +1,213 @@
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+
+from output_stream import make_decoder, read_chunks
+from process_group import INTERRUPT_GRACE_SECONDS, escalate, new_group_options
+from shell_session import with_definitions
+
+# Output kept per job for 'fg' - older output is dropped
+JOB_BUFFER_CHARS = 1024 * 1024
+
+# A trailing '&' that isn't part of '&&', '>&' or '|&'
+BACKGROUND_PATTERN = re.compile(r'(?<![&>|])&\s*$')
+
+# Signal names accepted by 'kill -NAME %n'
+SIGNALS = {name[3:]: getattr(signal, name) for name in dir(signal)
+           if name.startswith("SIG") and not name.startswith("SIG_")}
+
+# How 'jobs' describes a job killed by a signal
+SIGNAL_DESCRIPTIONS = {'SIGTERM': 'Terminated', 'SIGKILL': 'Killed', 'SIGINT': 'Interrupt',
+                       'SIGHUP': 'Hangup', 'SIGQUIT': 'Quit', 'SIGSEGV': 'Segmentation fault'}
+
+
+def split_background(command):
+    """
+    Split a trailing '&' off a command
+    Returns: (command, True) for background commands, (command, False) otherwise
+    """
+    if BACKGROUND_PATTERN.search(command):
+        return BACKGROUND_PATTERN.sub('', command).rstrip(), True
+    return command, False
+
+
+class Job:
+    """One background command: its process, state and recent output"""
+
+    def __init__(self, number, command, process):
+        self.number = number
+        self.command = command
+        self.process = process
+        self.state = 'Running'   # Running, Stopped or Done
+        self.status = None       # exit status once Done (negative for signals)
+        self.started = time.time()
+        self.chunks = deque()
+        self.size = 0
+        self.listener = None     # receives output while the job is in the foreground
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def write(self, text):
+        """Buffer a piece of output and pass it to the foreground listener, if any"""
+        with self.lock:
+            self.chunks.append(text)
+            self.size += len(text)
+            while self.size > JOB_BUFFER_CHARS and len(self.chunks) > 1:
+                self.size -= len(self.chunks.popleft())
+            if self.listener is not None:
+                self.listener(text)
+
+    def attach(self, listener):
+        """Replay the buffered output to listener and send it everything that follows"""
+        with self.lock:
+            if self.chunks:
+                listener("".join(self.chunks))
+            self.listener = listener
+
+    def detach(self):
+        """Stop passing output on - the job keeps running in the background"""
+        with self.lock:
+            self.listener = None
+
+    def send(self, signum):
+        """Signal the job's whole process group"""
+        if self.finished.is_set():
+            return
+        try:
+            os.killpg(self.process.pid, signum)
+        except (AttributeError, OSError):
+            # No process groups (Windows) or the group is already gone
+            self.process.send_signal(signum)
+        if signum == getattr(signal, 'SIGSTOP', None):
+            self.state = 'Stopped'
+        elif signum == getattr(signal, 'SIGCONT', None):
+            self.state = 'Running'
+
+    def interrupt(self, grace=INTERRUPT_GRACE_SECONDS):
+        """Ctrl+C: signal the job's group, escalating from SIGINT to SIGKILL"""
+        return escalate(self.send, self.finished.wait, grace)
+
+    def describe(self):
+        """State column for 'jobs' and completion notices"""
+        if self.state != 'Done':
+            return self.state
+        if self.status == 0:
+            return 'Done'
+        if self.status < 0:
+            try:
+                name = signal.Signals(-self.status).name
+                return SIGNAL_DESCRIPTIONS.get(name, name)
+            except ValueError:
+                return f"Signal {-self.status}"
+        return f"Exit {self.status}"
+
+
+class JobTable:
+    """
+    Background jobs started with '&'. Each job runs in its own process group,
+    its output is buffered until it is brought to the foreground, and
+    on_done(job) is called from the job's reader thread when it finishes.
+    """
+
+    def __init__(self, on_done=None, shell=None):
+        self.on_done = on_done
+        self.shell = shell or shutil.which("bash") or "/bin/bash"
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.current = None   # number of the most recent job - %+ / %%
+
+    def start(self, command, cwd, env=None, definitions=""):
+        """
+        Start command in the background; returns its Job
+        env and definitions (bash source for aliases and functions) give it
+        the state of the shell session, see BashSession.export_state
+        """
+        process = subprocess.Popen(
+            [self.shell, "-c", with_definitions(command, definitions)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,
+            env=env,
+            **new_group_options()
+        )
+        with self.lock:
+            number = 1
+            while number in self.jobs:
+                number += 1
+            job = Job(number, command, process)
+            self.jobs[number] = job
+            self.current = number
+        threading.Thread(target=self.collect, args=(job,), daemon=True).start()
+        return job
+
+    def collect(self, job):
+        """Reader thread: buffer a job's output, then record how it ended"""
+        decoder = make_decoder()
+        for chunk in read_chunks(job.process.stdout):
+            text = decoder.decode(chunk)
+            if text:
+                job.write(text)
+        text = decoder.decode(b"", final=True)
+        if text:
+            job.write(text)
+        job.status = job.process.wait()
+        job.state = 'Done'
+        job.finished.set()
+        if self.on_done is not None:
+            self.on_done(job)
+
+    def get(self, spec):
+        """
+        Look up a job by spec: %n, n, %+, %% or %- (the empty spec means the current job)
+        Returns: the Job, or None if there is no such job
+        """
+        with self.lock:
+            spec = spec.strip()
+            if spec in ('', '%', '%+', '%%'):
+                return self.jobs.get(self.current)
+            if spec == '%-':
+                numbers = sorted(number for number in self.jobs if number != self.current)
+                return self.jobs.get(numbers[-1]) if numbers else None
+            if spec.lstrip('%').isdigit():
+                return self.jobs.get(int(spec.lstrip('%')))
+            # %string - the job whose command starts with string
+            for job in self.jobs.values():
+                if job.command.startswith(spec.lstrip('%')):
+                    return job
+            return None
+
+    def list(self):
+        """All jobs, oldest first"""
+        with self.lock:
+            return [self.jobs[number] for number in sorted(self.jobs)]
+
+    def remove(self, job):
+        """Forget a job (once it finished and was reported)"""
+        with self.lock:
+            if self.jobs.get(job.number) is job:
+                del self.jobs[job.number]
+            if self.current == job.number:
+                self.current = max(self.jobs) if self.jobs else None
+
+    def running(self):
+        """Jobs that haven't finished yet"""
+        return [job for job in self.list() if job.state != 'Done']
+
+    def close(self):
+        """Hang up every job that is still running"""
+        for job in self.running():
+            job.send(getattr(signal, 'SIGHUP', signal.SIGTERM))
+            if job.state == 'Stopped':
+                job.send(signal.SIGCONT)
+
+
+def format_job(job, current=None):
+    """One line of 'jobs' output, bash style"""
+    marker = '+' if job.number == current else ' '
+    return f"[{job.number}]{marker}  {job.describe():<22}{job.command}"
@@ -0,0 +1,191 @@
+import os
+import signal
+import subprocess
+import threading
+
+try:
+    import resource
+except ImportError:
+    # Windows - only the wall-clock and output limits apply
+    resource = None
+
+MIB = 1024 * 1024
+
+# What each limit is called in ':limits' and the units it is given in
+LIMIT_NAMES = {
+    'wall': 'wall-clock seconds',
+    'cpu': 'CPU seconds',
+    'memory': 'address space, MiB',
+    'files': 'open files',
+    'output': 'output, MiB',
+}
+
+# Output that suggests a command ran into the memory or open files limit
+MEMORY_ERRORS = ('cannot allocate memory', 'memoryerror', 'out of memory', 'bad_alloc')
+FILES_ERRORS = ('too many open files',)
+
+
+class CommandLimits:
+    """
+    Resource limits for one kind of command; None means unlimited.
+    cpu, memory and files are set with setrlimit in the command's shell;
+    wall and output are watched from here while it runs.
+    """
+
+    def __init__(self, wall=None, cpu=None, memory=None, files=None, output=None):
+        self.wall = wall      # seconds
+        self.cpu = cpu        # seconds
+        self.memory = memory  # MiB of address space
+        self.files = files    # open file descriptors
+        self.output = output  # MiB of output
+
+    def set(self, name, value):
+        """Change one limit from ':limits' text - a number, or 'off'"""
+        if name not in LIMIT_NAMES:
+            raise ValueError(f"unknown limit '{name}' - use one of {', '.join(LIMIT_NAMES)}")
+        if value in ('off', 'none', 'unlimited'):
+            setattr(self, name, None)
+            return
+        number = float(value)
+        if number <= 0:
+            raise ValueError(f"{name} limit must be positive")
+        setattr(self, name, int(number) if name == 'files' else number)
+
+    def active(self):
+        """True if any limit is set"""
+        return any(getattr(self, name) is not None for name in LIMIT_NAMES)
+
+    def describe(self):
+        """One line listing every limit"""
+        return ", ".join(f"{name} {'off' if getattr(self, name) is None else format_number(getattr(self, name))}"
+                         for name in LIMIT_NAMES)
+
+    def ulimit_command(self, cpu_used=0.0):
+        """
+        bash commands setting the soft rlimits, or "" if there are none
+        cpu_used is CPU time the shell has already spent - RLIMIT_CPU counts it too
+        """
+        if resource is None:
+            return ""
+        options = []
+        if self.cpu is not None:
+            options.append(f"-t {clamp(resource.RLIMIT_CPU, int(cpu_used + self.cpu + 0.999))}")
+        if self.memory is not None:
+            options.append(f"-v {clamp(resource.RLIMIT_AS, int(self.memory * MIB)) // 1024}")
+        if self.files is not None:
+            options.append(f"-n {clamp(resource.RLIMIT_NOFILE, self.files)}")
+        return f"ulimit -S {' '.join(options)}" if options else ""
+
+
+def clamp(which, value):
+    """A soft limit can't go above the hard one"""
+    hard = resource.getrlimit(which)[1]
+    return value if hard == resource.RLIM_INFINITY else min(value, hard)
+
+
+def restore_command():
+    """bash command putting back the soft limits the terminal itself runs with"""
+    if resource is None:
+        return ""
+    values = []
+    for option, which, scale in (('-t', resource.RLIMIT_CPU, 1), ('-v', resource.RLIMIT_AS, 1024),
+                                 ('-n', resource.RLIMIT_NOFILE, 1)):
+        soft = resource.getrlimit(which)[0]
+        values.append(f"{option} {'unlimited' if soft == resource.RLIM_INFINITY else soft // scale}")
+    return f"ulimit -S {' '.join(values)}"
+
+
+def format_number(value):
+    """3.0 -> '3', 2.5 -> '2.5'"""
+    return f"{value:g}"
+
+
+def process_cpu_seconds(pid):
+    """CPU time (user + system) a process has used so far, or 0.0 if it can't be read"""
+    try:
+        with open(f"/proc/{pid}/stat") as stat_file:
+            # Fields after the command name, which may itself contain spaces
+            fields = stat_file.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        result = subprocess.run(["ps", "-o", "time=", "-p", str(pid)], capture_output=True, text=True)
+        seconds = 0.0
+        days, _, clock = result.stdout.strip().rpartition("-")
+        for part in clock.split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds + (int(days) * 86400 if days else 0)
+    except (OSError, ValueError):
+        return 0.0
+
+
+class LimitGuard:
+    """
+    Watches one running command: stops it through interrupt() when it runs
+    past the wall-clock limit or prints more than the output limit, and
+    explains afterwards which limit (if any) ended it.
+    """
+
+    def __init__(self, limits, interrupt):
+        self.limits = limits
+        self.interrupt = interrupt
+        self.hit = None
+        self.written = 0
+        self.tail = ""
+        self.timer = None
+
+    def start(self):
+        """Start the wall-clock timer"""
+        if self.limits.wall is not None:
+            self.timer = threading.Timer(self.limits.wall, self.stop, args=('wall',))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def wrap(self, on_output):
+        """on_output, cut off once the output limit is reached"""
+        limit = None if self.limits.output is None else int(self.limits.output * MIB)
+
+        def write(text):
+            if self.hit == 'output':
+                return
+            self.tail = (self.tail + text)[-512:]
+            if limit is not None:
+                self.written += len(text.encode("utf-8", "replace"))
+                if self.written > limit:
+                    on_output(text[:max(0, len(text) - (self.written - limit))])
+                    self.stop('output')
+                    return
+            on_output(text)
+
+        return write
+
+    def stop(self, reason):
+        """Stop the command for breaking a limit - interrupt() must not block"""
+        if self.hit is None:
+            self.hit = reason
+            self.interrupt()
+
+    def finish(self, status):
+        """
+        Cancel the timer once the command has ended
+        Returns: a message naming the limit that ended it, or None
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+        limits = self.limits
+        if self.hit == 'wall':
+            return f"Command stopped: ran longer than {format_number(limits.wall)}s"
+        if self.hit == 'output':
+            return f"Command stopped: printed more than {format_number(limits.output)} MiB"
+        if not status:
+            return None
+        signum = status - 128 if status > 128 else -status
+        tail = self.tail.lower()
+        if limits.cpu is not None and signum == getattr(signal, 'SIGXCPU', None):
+            return f"Command stopped: used more than {format_number(limits.cpu)}s of CPU time"
+        if limits.memory is not None and any(error in tail for error in MEMORY_ERRORS):
+            return f"Command failed: memory is limited to {format_number(limits.memory)} MiB"
+        if limits.files is not None and any(error in tail for error in FILES_ERRORS):
+            return f"Command failed: open files are limited to {limits.files}"
+        return None
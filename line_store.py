@@ -0,0 +1,166 @@
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+
+# The line index records one newline count per block of this many bytes
+BLOCK_SIZE = 64 * 1024
+
+# grep reads lines in pieces of at most this many bytes, so a huge line can't fill memory
+GREP_READ_BYTES = 1024 * 1024
+
+
+class LineStore:
+    """
+    Append-only, file-backed text store with random access by line number.
+    Reads go through an mmap of the backing file and the index is sparse (one
+    entry per block), so a store can hold far more text than we'd want in memory.
+    """
+
+    def __init__(self, path=None):
+        self.lock = threading.Lock()
+        self.owned = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="easy_terminal_", suffix=".out")
+            os.close(fd)
+        self.path = path
+        self.file = open(path, "ab" if self.owned else "rb")
+        self.map = None
+        self.size = 0
+        self.newlines = 0
+        self.last_byte = b"\n"
+        self.blocks = array("Q", [0])
+
+        if not self.owned:
+            with open(path, "rb") as existing:
+                for chunk in iter(lambda: existing.read(BLOCK_SIZE), b""):
+                    self.index(chunk)
+
+    def index(self, data):
+        """Extend the block index with data appended at the end of the store"""
+        start = self.size
+        end = start + len(data)
+        consumed = 0
+        boundary = len(self.blocks) * BLOCK_SIZE
+        while boundary <= end:
+            self.newlines += data.count(b"\n", consumed, boundary - start)
+            consumed = boundary - start
+            self.blocks.append(self.newlines)
+            boundary += BLOCK_SIZE
+        self.newlines += data.count(b"\n", consumed)
+        self.size = end
+        if data:
+            self.last_byte = data[-1:]
+
+    def append(self, text):
+        """Append text (str or bytes) to the store - safe from any thread"""
+        data = text.encode("utf-8", errors="replace") if isinstance(text, str) else text
+        if not data:
+            return
+        with self.lock:
+            # The viewer may have closed the store while a command still writes to it
+            if self.file.closed:
+                return
+            self.file.write(data)
+            self.file.flush()
+            self.index(data)
+
+    def line_count(self):
+        """Number of lines in the store, counting an unterminated last line"""
+        return self.newlines + (0 if self.last_byte == b"\n" else 1)
+
+    def mapped(self):
+        """mmap covering everything written so far"""
+        if self.map is None or len(self.map) < self.size:
+            if self.map is not None:
+                self.map.close()
+            with open(self.path, "rb") as source:
+                self.map = mmap.mmap(source.fileno(), self.size, access=mmap.ACCESS_READ)
+        return self.map
+
+    def line_offset(self, line):
+        """Byte offset where the given (0-based) line starts"""
+        if line <= 0:
+            return 0
+        # Last block that starts before the newline ending line - 1
+        block = bisect_left(self.blocks, line) - 1
+        data = self.mapped()
+        offset = block * BLOCK_SIZE
+        for _ in range(line - self.blocks[block]):
+            offset = data.find(b"\n", offset) + 1
+        return offset
+
+    def get_lines(self, start, count, max_chars=None):
+        """
+        Return up to count lines starting at line start, without newlines
+        Lines longer than max_chars bytes are cut short
+        """
+        with self.lock:
+            if self.size == 0 or count <= 0 or self.file.closed:
+                return []
+            start = max(0, min(start, self.line_count() - 1))
+            data = self.mapped()
+            offset = self.line_offset(start)
+            lines = []
+            while len(lines) < count and offset < self.size:
+                end = data.find(b"\n", offset, self.size)
+                if end == -1:
+                    end = self.size
+                stop = end if max_chars is None else min(end, offset + max_chars)
+                lines.append(data[offset:stop].decode("utf-8", errors="replace"))
+                offset = end + 1
+            return lines
+
+    def grep(self, pattern, limit=None, ignore_case=False):
+        """
+        Lines matching a regular expression, read from the backing file
+        Returns: [(line number, line)] - 1-based, at most limit of them
+        """
+        regex = re.compile(pattern.encode("utf-8"), re.IGNORECASE if ignore_case else 0)
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+            size = self.size
+        matches = []
+        number = 1
+        with open(self.path, "rb") as source:
+            while source.tell() < size:
+                piece = source.readline(GREP_READ_BYTES)
+                if not piece:
+                    break
+                if regex.search(piece):
+                    matches.append((number, piece.rstrip(b"\n").decode("utf-8", errors="replace")))
+                    if limit and len(matches) >= limit:
+                        break
+                    # Report a long line once, not once per piece
+                    while not piece.endswith(b"\n"):
+                        piece = source.readline(GREP_READ_BYTES)
+                        if not piece:
+                            break
+                if piece.endswith(b"\n"):
+                    number += 1
+        return matches
+
+    def save(self, path):
+        """Copy the whole store to path"""
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+            shutil.copyfile(self.path, path)
+
+    def close(self):
+        """Release the mapping and delete the backing file if we created it"""
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            self.file.close()
+            if self.owned:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+# Defaults for LLM requests
+TIMEOUT_SECONDS = 30
+MAX_CONCURRENCY = 4
+
+
+class AsyncLLMClient:
+    """
+    Runs LLM requests on a private asyncio event loop. Each request gets a
+    deadline, at most max_concurrency requests are in flight at once, and
+    pending requests can be cancelled from any thread (e.g. on Ctrl+C).
+    """
+
+    def __init__(self, timeout=TIMEOUT_SECONDS, max_concurrency=MAX_CONCURRENCY):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = None
+        self.futures = set()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def guarded(self, make_coroutine, timeout):
+        """Run one request under the concurrency cap and its deadline"""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self.semaphore:
+            try:
+                return await asyncio.wait_for(make_coroutine(), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"LLM request timed out after {timeout}s") from None
+
+    def submit(self, make_coroutine, timeout=None):
+        """
+        Schedule make_coroutine() on the loop
+        Returns: a concurrent.futures.Future - cancelling it cancels the request
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.guarded(make_coroutine, timeout or self.timeout), self.loop
+        )
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self.forget)
+        return future
+
+    def forget(self, future):
+        with self.lock:
+            self.futures.discard(future)
+
+    def request(self, make_coroutine, timeout=None):
+        """
+        Submit a request and wait for its result
+        Raises concurrent.futures.CancelledError if it was cancelled and
+        TimeoutError if it missed its deadline
+        """
+        return self.submit(make_coroutine, timeout).result()
+
+    def cancel_all(self):
+        """Cancel every pending request; returns how many were cancelled"""
+        with self.lock:
+            futures = list(self.futures)
+        return sum(1 for future in futures if future.cancel())
+
+    def close(self):
+        """Cancel pending requests and stop the loop"""
+        self.cancel_all()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
@@ -0,0 +1,294 @@
+import abc
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Model and sampling settings every terminal uses
+DEFAULT_MODEL = "gemini-1.5-flash"
+DEFAULT_TEMPERATURE = 0.1
+HTTP_TIMEOUT_SECONDS = 30
+
+# Environment variables that pick the backend and the replay latency, so any
+# of the terminals can run offline or against a stand-in without code changes:
+#   EASY_TERMINAL_LLM=gemini | replay:FILE | record:FILE | http://host:port
+#   EASY_TERMINAL_LLM_LATENCY=recorded | fixed:S | uniform:LOW,HIGH | normal:MEAN,SD | lognormal:MEDIAN,SIGMA
+PROVIDER_VARIABLE = "EASY_TERMINAL_LLM"
+LATENCY_VARIABLE = "EASY_TERMINAL_LLM_LATENCY"
+
+
+class LLMProvider(abc.ABC):
+    """
+    What the terminals need from an LLM: generate(prompt) returns the
+    response text. agenerate() is the same for code on an asyncio loop; by
+    default it runs generate() on the loop's executor.
+    """
+
+    name = "provider"
+
+    @abc.abstractmethod
+    def generate(self, prompt):
+        """The response text for prompt"""
+
+    async def agenerate(self, prompt):
+        return await asyncio.get_running_loop().run_in_executor(None, self.generate, prompt)
+
+    def close(self):
+        """Release whatever the backend holds open"""
+
+
+class LangChainGeminiProvider(LLMProvider):
+    """Gemini through langchain_google_genai - what the bash terminals used directly"""
+
+    name = "gemini"
+
+    def __init__(self, api_key, model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE):
+        from langchain_google_genai import GoogleGenerativeAI
+
+        self.llm = GoogleGenerativeAI(model=model, google_api_key=api_key, temperature=temperature)
+
+    def generate(self, prompt):
+        return self.llm.invoke(prompt)
+
+    async def agenerate(self, prompt):
+        return await self.llm.ainvoke(prompt)
+
+
+class GenAIProvider(LLMProvider):
+    """Gemini through google.generativeai - what the CMD and PowerShell terminals used directly"""
+
+    name = "gemini"
+
+    def __init__(self, api_key, model=DEFAULT_MODEL):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model)
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+    async def agenerate(self, prompt):
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+
+class HttpGeminiProvider(LLMProvider):
+    """
+    The Gemini REST API (generateContent) spoken with the standard library -
+    for llm_standin.py, or any server that answers the same way
+    """
+
+    name = "http"
+
+    def __init__(self, base_url, api_key="", model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE,
+                 timeout=HTTP_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.temperature = temperature
+        self.timeout = timeout
+
+    def generate(self, prompt):
+        body = json.dumps({
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": self.temperature},
+        }).encode("utf-8")
+        url = f"{self.base_url}/v1beta/models/{self.model}:generateContent"
+        request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json",
+                                                                  "x-goog-api-key": self.api_key})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response_text(json.load(response))
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.load(e)["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                message = e.reason
+            raise RuntimeError(f"LLM request failed with HTTP {e.code}: {message}") from None
+
+
+def response_text(data):
+    """The text of a generateContent response, or RuntimeError if it has none"""
+    try:
+        parts = data["candidates"][0]["content"]["parts"]
+        return "".join(part.get("text", "") for part in parts)
+    except (KeyError, IndexError, TypeError):
+        reason = data.get("promptFeedback", {}).get("blockReason") if isinstance(data, dict) else None
+        raise RuntimeError(f"LLM returned no text{f' (blocked: {reason})' if reason else ''}") from None
+
+
+class LatencyDistribution:
+    """
+    Delays for replayed responses, from a spec string:
+    'recorded' (the latency captured with each response), 'fixed:S',
+    'uniform:LOW,HIGH', 'normal:MEAN,SD' or 'lognormal:MEDIAN,SIGMA' -
+    all in seconds; a lognormal with a median and a shape gives the long tail
+    real LLM APIs have
+    """
+
+    KINDS = ('recorded', 'fixed', 'uniform', 'normal', 'lognormal')
+
+    def __init__(self, spec="recorded", seed=None):
+        kind, _, values = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown latency '{spec}' - use one of {', '.join(self.KINDS)}")
+        try:
+            self.values = [float(value) for value in values.split(",")] if values else []
+        except ValueError:
+            raise ValueError(f"bad latency numbers in '{spec}'") from None
+        wanted = {'recorded': 0, 'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2}[kind]
+        if len(self.values) != wanted:
+            raise ValueError(f"latency '{kind}' takes {wanted} number(s)")
+        self.kind = kind
+        self.spec = spec
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self, recorded=0.0):
+        """One delay in seconds"""
+        with self.lock:
+            if self.kind == 'recorded':
+                delay = recorded or 0.0
+            elif self.kind == 'fixed':
+                delay = self.values[0]
+            elif self.kind == 'uniform':
+                delay = self.random.uniform(*self.values)
+            elif self.kind == 'normal':
+                delay = self.random.gauss(*self.values)
+            else:
+                median, sigma = self.values
+                delay = self.random.lognormvariate(math.log(median), sigma)
+        return max(delay, 0.0)
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Answers from responses captured by RecordingProvider - a JSONL file of
+    {"prompt", "response", "latency"} - after a delay drawn from latency.
+    A prompt that was never recorded gets the recorded responses in turn,
+    or RuntimeError when strict. Waiting is an asyncio sleep, so many
+    concurrent requests cost no threads.
+    """
+
+    name = "replay"
+
+    def __init__(self, path, latency="recorded", strict=False, seed=None):
+        self.path = path
+        self.latency = latency if isinstance(latency, LatencyDistribution) else LatencyDistribution(latency, seed)
+        self.strict = strict
+        self.responses = {}
+        self.exchanges = []
+        with open(path, encoding="utf-8") as replay_file:
+            for line in replay_file:
+                try:
+                    exchange = json.loads(line)
+                    prompt, response = exchange["prompt"], exchange["response"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self.responses.setdefault(prompt, []).append(len(self.exchanges))
+                self.exchanges.append((response, exchange.get("latency", 0.0)))
+        if not self.exchanges:
+            raise ValueError(f"no recorded responses in {path}")
+        self.turns = {}
+        self.fallback = itertools.cycle(range(len(self.exchanges)))
+        self.lock = threading.Lock()
+
+    def answer(self, prompt):
+        """
+        The response for prompt and how long to wait before giving it
+        Returns: (response, delay in seconds)
+        """
+        with self.lock:
+            indexes = self.responses.get(prompt)
+            if indexes is not None:
+                # Prompts recorded several times replay their responses in order
+                turn = self.turns.get(prompt, 0)
+                self.turns[prompt] = turn + 1
+                index = indexes[turn % len(indexes)]
+            elif self.strict:
+                raise RuntimeError("no recorded response for this prompt")
+            else:
+                index = next(self.fallback)
+        response, recorded = self.exchanges[index]
+        return response, self.latency.sample(recorded)
+
+    def generate(self, prompt):
+        response, delay = self.answer(prompt)
+        time.sleep(delay)
+        return response
+
+    async def agenerate(self, prompt):
+        response, delay = self.answer(prompt)
+        await asyncio.sleep(delay)
+        return response
+
+
+class RecordingProvider(LLMProvider):
+    """Passes prompts to another provider and appends every exchange, with its latency, to a JSONL file"""
+
+    name = "record"
+
+    def __init__(self, provider, path):
+        self.provider = provider
+        self.path = path
+        self.lock = threading.Lock()
+
+    def save(self, prompt, response, latency):
+        line = json.dumps({"prompt": prompt, "response": response, "latency": round(latency, 6),
+                           "time": round(time.time(), 3)})
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as record_file:
+                record_file.write(line + "\n")
+
+    def generate(self, prompt):
+        started = time.perf_counter()
+        response = self.provider.generate(prompt)
+        self.save(prompt, response, time.perf_counter() - started)
+        return response
+
+    async def agenerate(self, prompt):
+        started = time.perf_counter()
+        response = await self.provider.agenerate(prompt)
+        self.save(prompt, response, time.perf_counter() - started)
+        return response
+
+    def close(self):
+        self.provider.close()
+
+
+def make_provider(spec, api_key, flavor="langchain", latency=None):
+    """
+    Build the provider a spec names: 'gemini' (or empty) for the real API -
+    through LangChain or google.generativeai, as flavor says - 'replay:FILE',
+    'record:FILE' (the real API, captured to FILE) or an http(s):// URL of a
+    Gemini-compatible server such as llm_standin.py
+    """
+    spec = (spec or "gemini").strip()
+    if spec == "gemini":
+        if flavor == "genai":
+            return GenAIProvider(api_key)
+        return LangChainGeminiProvider(api_key)
+    if spec.startswith("replay:"):
+        return ReplayProvider(spec[len("replay:"):], latency or "recorded")
+    if spec.startswith("record:"):
+        return RecordingProvider(make_provider("gemini", api_key, flavor), spec[len("record:"):])
+    if spec.startswith(("http://", "https://")):
+        return HttpGeminiProvider(spec, api_key)
+    raise ValueError(f"unknown LLM provider '{spec}' - use gemini, replay:FILE, record:FILE or a URL")
+
+
+def provider_from_environment(api_key, flavor="langchain", spec=None):
+    """make_provider() for spec, or for EASY_TERMINAL_LLM and EASY_TERMINAL_LLM_LATENCY when it is None"""
+    if spec is None:
+        spec = os.environ.get(PROVIDER_VARIABLE)
+    return make_provider(spec, api_key, flavor, os.environ.get(LATENCY_VARIABLE))
@@ -0,0 +1,195 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch_translate import SHELL_NAMES
+from fast_path import get_translator
+from llm_provider import DEFAULT_MODEL, LatencyDistribution, LLMProvider, ReplayProvider
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# What the real API says when a request can't be served
+UNAVAILABLE_MESSAGE = "The model is overloaded. Please try again later."
+
+# Translation prompts name the query on a line of its own; batch prompts number them
+QUERY_PATTERN = re.compile(r"^\s*User query:\s*(.*?)\s*$", re.MULTILINE)
+NUMBERED_PATTERN = re.compile(r"^(\d+)\. (.*)$", re.MULTILINE)
+UNTRANSLATED = "ERROR: Unable to translate."
+UNKNOWN_PROMPT = "ERROR: The stand-in only answers translation prompts."
+
+
+class StandInResponder(LLMProvider):
+    """
+    Answers translation prompts without a model: each query goes through the
+    fast path translator of the shell the prompt is for, and batch prompts get
+    the JSON object they ask for. Anything the rules don't cover is an ERROR
+    reply, the same as a query the real model can't translate.
+    """
+
+    name = "standin"
+
+    def __init__(self):
+        self.translators = {}
+
+    def translate(self, query, shell):
+        translator = self.translators.get(shell)
+        if translator is None:
+            translator = self.translators[shell] = get_translator(shell)
+        return translator.translate(query) or UNTRANSLATED
+
+    def generate(self, prompt):
+        if "PowerShell" in prompt:
+            shell = 'powershell'
+        elif "CMD" in prompt or SHELL_NAMES['cmd'] in prompt:
+            shell = 'cmd'
+        else:
+            shell = 'bash'
+        match = QUERY_PATTERN.search(prompt)
+        if match is not None:
+            return self.translate(match.group(1), shell)
+        if "JSON object mapping each query number" in prompt:
+            return json.dumps({number: self.translate(query, shell)
+                               for number, query in NUMBERED_PATTERN.findall(prompt)})
+        return UNKNOWN_PROMPT
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    A local server that answers like the Gemini REST API - for load tests and
+    offline runs without an API key or quota. Replies come from responder
+    after a delay drawn from latency; error_rate of the requests fail with
+    503 UNAVAILABLE, as an overloaded API does.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, responder=None, latency=None, error_rate=0.0, seed=None):
+        super().__init__(address, StandInHandler)
+        self.responder = responder or StandInResponder()
+        self.latency = latency or LatencyDistribution("fixed:0")
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def failing(self):
+        """Whether this request should fail, counting it"""
+        with self.lock:
+            self.requests += 1
+            return self.random.random() < self.error_rate
+
+    def reply(self, prompt):
+        """
+        The response text for prompt and the delay before sending it
+        Returns: (text, seconds)
+        """
+        if isinstance(self.responder, ReplayProvider):
+            # Replay draws its own delay, so 'recorded' can use each exchange's latency
+            return self.responder.answer(prompt)
+        return self.responder.generate(prompt), self.latency.sample()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Handles generateContent, streamGenerateContent and the model list"""
+
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, state, message):
+        self.send_json(status, {"error": {"code": status, "message": message, "status": state}})
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.rstrip("/") == "/v1beta/models":
+            self.send_json(200, {"models": [{"name": f"models/{DEFAULT_MODEL}",
+                                             "supportedGenerationMethods": ["generateContent"]}]})
+        else:
+            self.send_error_json(404, "NOT_FOUND", f"{path} not found")
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        model, _, method = path.rpartition(":")
+        if not model.startswith("/v1beta/models/") or method not in ("generateContent", "streamGenerateContent"):
+            self.send_error_json(404, "NOT_FOUND", f"{path} not found")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            prompt = "".join(part.get("text", "") for content in request["contents"]
+                             for part in content.get("parts", []))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_error_json(400, "INVALID_ARGUMENT", "Invalid JSON payload received.")
+            return
+
+        if self.server.failing():
+            self.send_error_json(503, "UNAVAILABLE", UNAVAILABLE_MESSAGE)
+            return
+        try:
+            text, delay = self.server.reply(prompt)
+        except Exception as e:
+            self.send_error_json(500, "INTERNAL", str(e))
+            return
+        time.sleep(delay)
+
+        words = len(prompt.split())
+        response = {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                            "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": words, "candidatesTokenCount": len(text.split()),
+                              "totalTokenCount": words + len(text.split())},
+            "modelVersion": model[len("/v1beta/models/"):],
+        }
+        # A stream of one chunk is still a stream
+        self.send_json(200, [response] if method == "streamGenerateContent" else response)
+
+    def log_message(self, format, *args):
+        """Quiet - a load test sends thousands of requests"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the Gemini API. Point a terminal at it with "
+                    "EASY_TERMINAL_LLM=http://HOST:PORT (or engine.py --llm http://HOST:PORT).")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--replay", metavar="FILE",
+                        help="answer with responses recorded by record:FILE instead of the fast path rules")
+    parser.add_argument("--latency", default=None,
+                        help="delay per response: fixed:S, uniform:LOW,HIGH, normal:MEAN,SD, "
+                             "lognormal:MEDIAN,SIGMA or recorded (default: recorded with --replay, else none)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests that fail with 503 UNAVAILABLE")
+    parser.add_argument("--seed", type=int, help="seed the latency and error draws for repeatable runs")
+    args = parser.parse_args()
+
+    try:
+        latency = LatencyDistribution(args.latency or ("recorded" if args.replay else "fixed:0"), args.seed)
+        responder = ReplayProvider(args.replay, latency) if args.replay else StandInResponder()
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    server = StandInServer((args.host, args.port), responder, latency, args.error_rate, args.seed)
+    print(f"Gemini stand-in listening on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,11 @@ import os
 import subprocess
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
-from langchain_google_genai import GoogleGenerativeAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
 import threading
+from llm_provider import provider_from_environment
+from process_group import interrupt_process, new_group_options
+from output_stream import stream_process
+from spill import SpillBuffer, SpillKeeper
 
 # Configure the Gemini API key
 GOOGLE_API_KEY = "Replace with your actual API key"  # Replace with your actual API key
@@ -28,6 +29,12 @@ class NaturalLanguageTerminal:
         # Current working directory
         self.current_directory = os.getcwd()
         
+        # Shell running the current command, for Ctrl+C
+        self.foreground_process = None
+        
+        # Output too big to keep in memory stays in temporary files for a while
+        self.spill_keeper = SpillKeeper('bash')
+        
         # Create the terminal text area
         self.terminal = scrolledtext.ScrolledText(
             root, 
@@ -41,8 +48,8 @@ class NaturalLanguageTerminal:
         # Setup prompt for the command entry
         self.display_prompt()
         
-        # Set up LangChain with Gemini
-        self.setup_langchain()
+        # Set up the LLM provider - Gemini unless EASY_TERMINAL_LLM names another
+        self.setup_llm()
         
         # Bind events
         self.terminal.bind('<Return>', self.process_command)
@@ -58,18 +65,14 @@ class NaturalLanguageTerminal:
         
         self.display_prompt()
 
-    def setup_langchain(self):
-        """Set up LangChain with Gemini Flash 1.5"""
+    def setup_llm(self):
+        """Set up the LLM provider with the translation prompt"""
         try:
-            # Initialize the Gemini model through LangChain
-            self.llm = GoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=GOOGLE_API_KEY,
-                temperature=0.1
-            )
+            # Gemini Flash 1.5 through LangChain by default
+            self.provider = provider_from_environment(GOOGLE_API_KEY, 'langchain')
             
             # Create the prompt template
-            template = """
+            self.prompt = """
             You are an expert in translating natural language queries into bash commands.
             
             Current working directory: {current_dir}
@@ -83,15 +86,8 @@ class NaturalLanguageTerminal:
             If the query is asking for something that could be harmful or destructive, respond with 'ERROR: This command could be potentially harmful.'
             """
             
-            self.prompt = PromptTemplate(
-                input_variables=["query", "current_dir"],
-                template=template
-            )
-            
-            self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
-            
         except Exception as e:
-            self.append_text(f"Error initializing LangChain: {str(e)}\n")
+            self.append_text(f"Error initializing the LLM provider: {str(e)}\n")
 
     def display_prompt(self):
         """Display the terminal prompt with current directory"""
@@ -113,11 +109,11 @@ class NaturalLanguageTerminal:
     def translate_to_bash(self, nl_command):
         """Translate natural language to bash command using Gemini"""
         try:
-            response = self.chain.invoke({
-                "query": nl_command,
-                "current_dir": self.current_directory
-            })
-            return response['text'].strip()
+            response = self.provider.generate(self.prompt.format(
+                query=nl_command,
+                current_dir=self.current_directory
+            ))
+            return response.strip()
         except Exception as e:
             return f"ERROR: Failed to translate command: {str(e)}"
 
@@ -140,20 +136,23 @@ class NaturalLanguageTerminal:
                 else:
                     return f"Error: Directory '{directory}' does not exist"
             
-            # For all other commands
+            # For all other commands - output is read as a stream and anything
+            # too big to keep in memory is left in a temporary file
             process = subprocess.Popen(
                 bash_command,
                 shell=True,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=self.current_directory
+                stderr=subprocess.STDOUT,
+                cwd=self.current_directory,
+                **new_group_options()
             )
-            stdout, stderr = process.communicate()
-            
-            if stderr:
-                return stderr
-            return stdout
+            output = SpillBuffer(keeper=self.spill_keeper)
+            self.foreground_process = process
+            try:
+                stream_process(process, output)
+            finally:
+                self.foreground_process = None
+            return output.text()
         except Exception as e:
             return f"Error executing command: {str(e)}"
 
@@ -236,6 +235,13 @@ class NaturalLanguageTerminal:
 
     def handle_interrupt(self, event=None):
         """Handle Ctrl+C interrupt"""
+        # A running command is signalled (SIGINT, then SIGTERM and SIGKILL);
+        # the prompt comes back once it has ended
+        process = self.foreground_process
+        if process is not None:
+            threading.Thread(target=interrupt_process, args=(process,), daemon=True).start()
+            self.append_text("^C\n")
+            return "break"
         self.append_text("\n^C\n")
         self.display_prompt()
         return "break"
@@ -245,6 +251,7 @@ def main():
     root.geometry("800x600")
     app = NaturalLanguageTerminal(root)
     root.mainloop()
+    app.spill_keeper.close()
 
 if __name__ == "__main__":
     main()
@@ -1,19 +1,46 @@
+from startup import StartupTimer, run_in_background
+import asyncio
 import os
 import re
+import shutil
 import sys
 import subprocess
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
-from langchain_google_genai import GoogleGenerativeAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
 import threading
+from concurrent.futures import CancelledError
+from shell_session import BashSession
+from output_stream import stream_process
+from process_group import interrupt_process, new_group_options
+from spill import SpillBuffer, SpillKeeper
+from render_pump import RenderPump
+from translation_cache import TranslationCache
+from fast_path import get_translator
+from llm_client import AsyncLLMClient
+from llm_provider import provider_from_environment
 
 # Configure the Google API key
 GOOGLE_API_KEY = "Replace with your actual API key"  # Replace with your actual API key
 
+# Prompt for translating one query
+TRANSLATION_TEMPLATE = """
+            You are an expert in translating natural language queries into bash commands.
+            
+            Current working directory: {current_dir}
+            
+            User query: {query}
+            
+            Determine if this query is already a valid bash command. If it is, return "VALID_COMMAND".
+            
+            If it's natural language, translate it into a valid bash command that would run in a Linux terminal.
+            Provide ONLY the bash command without any explanations, prefixes, or comments.
+            Do not include markdown formatting or code blocks in your response.
+            If the query cannot be translated to a valid bash command, respond with "ERROR: Unable to translate to a valid bash command."
+            If the query is asking for something that could be harmful or destructive, respond with "ERROR: This command could be potentially harmful."
+            """
+
 class NaturalLanguageTerminal:
-    def __init__(self, root):
+    def __init__(self, root, timer=None):
         self.root = root
         self.root.title("Natural Language Terminal")
         self.root.configure(bg='black')
@@ -30,6 +57,15 @@ class NaturalLanguageTerminal:
         # Current working directory
         self.current_directory = os.getcwd()
         
+        # Persistent bash session - started lazily on the first command
+        self.shell_session = BashSession(self.current_directory) if shutil.which("bash") else None
+        
+        # One-off shell running the current command when there is no bash session
+        self.foreground_process = None
+        
+        # Output too big to keep in memory stays in temporary files for a while
+        self.spill_keeper = SpillKeeper('bash')
+        
         # Create the terminal text area
         self.terminal = scrolledtext.ScrolledText(
             root, 
@@ -40,13 +76,29 @@ class NaturalLanguageTerminal:
         )
         self.terminal.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
+        # Output from worker threads is batched onto the Tk thread
+        self.pump = RenderPump(self.root, self.write_output, self.scroll_to_end)
+        
         # Terminal state tracking
         self.input_start = "1.0"
         self.input_active = False
         self.current_command = ""
         
-        # Setup LangChain with Gemini
-        self.setup_langchain()
+        # Set up the LLM provider on a background thread - importing LangChain
+        # takes seconds, and only natural language queries need it
+        self.timer = timer or StartupTimer()
+        self.provider = None
+        self.setup_error = None
+        self.llm_ready = run_in_background(self.timer.timed, "LLM setup", self.setup_llm)
+        
+        # Translations are cached in memory and on disk
+        self.translation_cache = TranslationCache()
+        
+        # Common queries are translated locally without calling the LLM
+        self.fast_path = get_translator('bash')
+        
+        # LLM requests run on an asyncio loop with deadlines and can be cancelled
+        self.llm_client = AsyncLLMClient()
         
         # Bind events
         self.terminal.bind('<Key>', self.handle_keypress)
@@ -79,42 +131,25 @@ class NaturalLanguageTerminal:
         # Set focus on terminal
         self.terminal.focus_set()
 
-    def setup_langchain(self):
-        """Set up LangChain with Gemini"""
+    def setup_llm(self):
+        """Set up the LLM provider - Gemini through LangChain unless EASY_TERMINAL_LLM names another"""
         try:
-            # Initialize the Gemini model through LangChain
-            self.llm = GoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=GOOGLE_API_KEY,
-                temperature=0.1
-            )
-            
-            # Create the prompt template
-            template = """
-            You are an expert in translating natural language queries into bash commands.
-            
-            Current working directory: {current_dir}
-            
-            User query: {query}
-            
-            Determine if this query is already a valid bash command. If it is, return "VALID_COMMAND".
-            
-            If it's natural language, translate it into a valid bash command that would run in a Linux terminal.
-            Provide ONLY the bash command without any explanations, prefixes, or comments.
-            Do not include markdown formatting or code blocks in your response.
-            If the query cannot be translated to a valid bash command, respond with "ERROR: Unable to translate to a valid bash command."
-            If the query is asking for something that could be harmful or destructive, respond with "ERROR: This command could be potentially harmful."
-            """
-            
-            self.prompt = PromptTemplate(
-                input_variables=["query", "current_dir"],
-                template=template
-            )
-            
-            self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
-            
+            self.provider = provider_from_environment(GOOGLE_API_KEY, 'langchain')
         except Exception as e:
-            self.append_output(f"Error initializing LangChain: {str(e)}\n")
+            self.provider = None
+            self.setup_error = f"Error initializing the LLM provider: {str(e)}"
+
+    async def wait_for_llm(self):
+        """Wait for the background LLM setup - only queries that arrive early ever wait"""
+        # Shielded so that cancelling a request doesn't cancel the setup itself
+        await asyncio.shield(asyncio.wrap_future(self.llm_ready))
+        if self.provider is None:
+            raise RuntimeError(self.setup_error)
+
+    async def ask_llm(self, inputs):
+        """Send the translation prompt once the LLM is ready - runs on the LLM client's loop"""
+        await self.wait_for_llm()
+        return await self.provider.agenerate(TRANSLATION_TEMPLATE.format(**inputs))
 
     def disable_text_widget(self):
         """Disable user editing in areas they shouldn't edit"""
@@ -126,6 +161,10 @@ class NaturalLanguageTerminal:
 
     def display_prompt(self):
         """Display the terminal prompt with current directory"""
+        self.pump.call(self.draw_prompt)
+
+    def draw_prompt(self):
+        """Draw the prompt - runs on the Tk thread"""
         self.enable_text_widget()
         prompt = f"{self.current_directory}$ "
         self.terminal.insert(tk.END, prompt)
@@ -134,9 +173,16 @@ class NaturalLanguageTerminal:
         self.input_active = True
 
     def append_output(self, text):
-        """Append output text to the terminal"""
+        """Append output text to the terminal (safe to call from any thread)"""
+        self.pump.put(text)
+
+    def write_output(self, text):
+        """Insert output text into the terminal - runs on the Tk thread"""
         self.enable_text_widget()
         self.terminal.insert(tk.END, text)
+
+    def scroll_to_end(self):
+        """Scroll the terminal to the latest output"""
         self.terminal.see(tk.END)
 
     def get_current_command(self):
@@ -177,6 +223,12 @@ class NaturalLanguageTerminal:
                 self.root.quit()
                 return "break"
                 
+            # Startup time per phase
+            if command.lower() == ':startup':
+                self.append_output(self.timer.report())
+                self.display_prompt()
+                return "break"
+                
             # Clear command handling
             if command.lower() in ['clear', 'cls']:
                 self.clear_terminal()
@@ -246,10 +298,33 @@ class NaturalLanguageTerminal:
 
     def handle_interrupt(self, event):
         """Handle Ctrl+C interrupt"""
+        # A running command is signalled (SIGINT, then SIGTERM and SIGKILL);
+        # the prompt comes back once it has ended
+        if self.interrupt_command():
+            self.append_output("^C\n")
+            return "break"
+        # Cancel translations that are still waiting on the LLM
+        self.llm_client.cancel_all()
         self.append_output("\n^C\n")
         self.display_prompt()
         return "break"
         
+    def interrupt_command(self):
+        """
+        Stop the running command - in the shell session or a one-off shell -
+        escalating from SIGINT to SIGKILL on a background thread
+        Returns: True if a command was running
+        """
+        process = self.foreground_process
+        if process is not None:
+            target = lambda: interrupt_process(process)
+        elif self.shell_session is not None and self.shell_session.busy():
+            target = self.shell_session.interrupt
+        else:
+            return False
+        threading.Thread(target=target, daemon=True).start()
+        return True
+
     def handle_clear(self, event):
         """Handle Ctrl+L (clear)"""
         self.clear_terminal()
@@ -326,25 +401,19 @@ class NaturalLanguageTerminal:
         command_type = self.detect_command_type(command)
         
         if command_type == 'bash':
-            # Try to execute directly
-            output = self.execute_bash_command(command)
-            self.append_output(output)
+            # Try to execute directly, streaming output as it arrives
+            self.stream_bash_command(command, self.append_output)
         else:
             # Try to translate natural language to bash
             self.append_output(f"Translating: {command}\n")
             
             try:
-                response = self.chain.invoke({
-                    "query": command,
-                    "current_dir": self.current_directory
-                })
-                
-                translated_command = response['text'].strip()
+                translated_command = self.translate_command(command)
                 
                 # Check if it's already a valid command (no need for translation)
                 if translated_command == "VALID_COMMAND":
                     self.append_output(f"Executing as-is: {command}\n")
-                    output = self.execute_bash_command(command)
+                    self.stream_bash_command(command, self.append_output)
                 # Check for errors in translation
                 elif translated_command.startswith("ERROR:"):
                     self.append_output(f"{translated_command}\n")
@@ -353,18 +422,55 @@ class NaturalLanguageTerminal:
                 # Execute the translated command
                 else:
                     self.append_output(f"Executing: {translated_command}\n")
-                    output = self.execute_bash_command(translated_command)
-                    
-                self.append_output(output)
+                    self.stream_bash_command(translated_command, self.append_output)
                 
+            except CancelledError:
+                # Ctrl+C cancelled the translation and already drew a new prompt
+                return
             except Exception as e:
                 self.append_output(f"Error translating command: {str(e)}\n")
                 
         self.display_prompt()
 
+    def translate_command(self, command):
+        """Translate natural language to bash - local rules first, then the cache, then the LLM"""
+        translated_command = self.fast_path.translate(command)
+        if translated_command is not None:
+            return translated_command
+        
+        translated_command = self.translation_cache.get(command, 'bash', self.current_directory)
+        if translated_command is not None:
+            return translated_command
+            
+        response = self.llm_client.request(lambda: self.ask_llm({
+            "query": command,
+            "current_dir": self.current_directory
+        }))
+        
+        translated_command = response.strip()
+        
+        # Errors are not cached so that they can be retried
+        if not translated_command.startswith("ERROR:"):
+            self.translation_cache.put(command, 'bash', self.current_directory, translated_command)
+        return translated_command
+
     def execute_bash_command(self, bash_command):
-        """Execute a bash command and return the output"""
+        """
+        Execute a bash command and return the output - output too big to keep
+        in memory is left in a temporary file and only its ends are returned
+        """
         try:
+            # Run the command in the persistent bash session so that cd, export,
+            # aliases and functions carry over between commands
+            if self.shell_session is not None:
+                output = SpillBuffer(keeper=self.spill_keeper)
+                _, status, cwd = self.shell_session.run(bash_command, on_output=output)
+                self.current_directory = cwd
+                if status == 0 and (bash_command.strip().startswith("cd ") or bash_command.strip() == "cd"):
+                    return f"Changed directory to {self.current_directory}\n"
+                return output.text()
+            
+            # Without bash, fall back to a one-off shell per command
             # Handle built-in commands like cd that affect the process state
             if bash_command.strip().startswith("cd ") or bash_command.strip() == "cd":
                 dir_part = bash_command.strip()[3:].strip() if bash_command.strip() != "cd" else ""
@@ -388,32 +494,73 @@ class NaturalLanguageTerminal:
                 else:
                     return f"bash: cd: {dir_part}: No such file or directory\n"
             
-            # For all other commands
+            # For all other commands - read as a stream, since communicate()
+            # would hold all of it in memory
             process = subprocess.Popen(
                 bash_command,
                 shell=True,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=self.current_directory
+                stderr=subprocess.STDOUT,
+                cwd=self.current_directory,
+                **new_group_options()
             )
-            stdout, stderr = process.communicate()
-            
-            if stderr:
-                return stderr
-            elif stdout:
-                return stdout
-            else:
-                return ""
+            output = SpillBuffer(keeper=self.spill_keeper)
+            self.foreground_process = process
+            try:
+                stream_process(process, output)
+            finally:
+                self.foreground_process = None
+            return output.text()
                 
         except Exception as e:
             return f"Error executing command: {str(e)}\n"
 
+    def stream_bash_command(self, bash_command, on_output):
+        """Execute a bash command, pushing its output to on_output as it arrives"""
+        try:
+            if self.shell_session is not None:
+                output, status, cwd = self.shell_session.run(bash_command, on_output=on_output)
+                self.current_directory = cwd
+                if status == 0 and (bash_command.strip().startswith("cd ") or bash_command.strip() == "cd"):
+                    on_output(f"Changed directory to {self.current_directory}\n")
+                return
+            
+            # Built-ins like cd have nothing to stream
+            if bash_command.strip().startswith("cd ") or bash_command.strip() == "cd":
+                on_output(self.execute_bash_command(bash_command))
+                return
+            
+            process = subprocess.Popen(
+                bash_command,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=self.current_directory,
+                **new_group_options()
+            )
+            self.foreground_process = process
+            try:
+                stream_process(process, on_output)
+            finally:
+                self.foreground_process = None
+                
+        except Exception as e:
+            on_output(f"Error executing command: {str(e)}\n")
+
 def main():
+    timer = StartupTimer()
+    timer.mark("imports")
     root = tk.Tk()
     root.geometry("800x600")
-    app = NaturalLanguageTerminal(root)
+    timer.mark("Tk window")
+    app = NaturalLanguageTerminal(root, timer)
+    timer.mark("terminal and first prompt")
+    root.after_idle(timer.mark, "first frame")
     root.mainloop()
+    app.llm_client.close()
+    app.spill_keeper.close()
+    if app.shell_session is not None:
+        app.shell_session.close()
 
 if __name__ == "__main__":
     main()
@@ -1,19 +1,73 @@
+from startup import StartupTimer
 import os
-import re
 import sys
-import subprocess
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
-from langchain_google_genai import GoogleGenerativeAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+from tkinter import font as tkfont
 import threading
+import time
+from concurrent.futures import CancelledError
+from engine import TerminalEngine
+from history_store import HistoryStore
+from suggestions import SuggestionIndex
+from jobs import format_job
+from startup import run_in_background
+from render_pump import RenderPump
+from scrollback import Scrollback
+from line_store import LineStore
+from output_view import VirtualOutputView, LargeOutputRouter
+from spill import PREVIEW_LINES, PREVIEW_LINE_CHARS
+from pty_session import DEFAULT_SIZE
+from vt_screen import LINE_MODE_COLUMNS, Screen
+from screen_view import ScreenView
 
-# Configure the Google API key
-GOOGLE_API_KEY = "Replace with your actual API key"  # Replace with your actual API key
+# Scrollback limits - older output is moved to a compressed spool file
+SCROLLBACK_MAX_LINES = 5000
+SCROLLBACK_MAX_BYTES = 2 * 1024 * 1024
+
+# Command output beyond this many characters is shown in a separate viewer
+# window that only renders the visible lines
+LARGE_OUTPUT_CHARS = 1024 * 1024
+
+# Large outputs kept on disk for ':output', and matching lines shown per ':output grep'
+KEPT_OUTPUTS = 5
+GREP_RESULTS = 200
+
+# Tab completion lists at most this many options
+MAX_COMPLETIONS_SHOWN = 100
+
+# Entries from earlier sessions available to Up/Down, and matches kept per Ctrl+R search
+HISTORY_NAVIGATION = 1000
+SEARCH_RESULTS = 200
+
+# Inline suggestions are drawn from this many recent history entries and cached translations
+SUGGESTION_ENTRIES = 20000
+SUGGESTION_TRANSLATIONS = 2000
+
+# Keys without a character of their own, as the bytes a terminal sends for them
+PTY_KEYS = {
+    'Return': '\r', 'KP_Enter': '\r', 'BackSpace': '\x7f', 'Tab': '\t', 'Escape': '\x1b',
+    'Up': '\x1b[A', 'Down': '\x1b[B', 'Right': '\x1b[C', 'Left': '\x1b[D',
+    'Home': '\x1b[H', 'End': '\x1b[F', 'Insert': '\x1b[2~', 'Delete': '\x1b[3~',
+    'Prior': '\x1b[5~', 'Next': '\x1b[6~',
+    'F1': '\x1bOP', 'F2': '\x1bOQ', 'F3': '\x1bOR', 'F4': '\x1bOS', 'F5': '\x1b[15~',
+    'F6': '\x1b[17~', 'F7': '\x1b[18~', 'F8': '\x1b[19~', 'F9': '\x1b[20~', 'F10': '\x1b[21~',
+    'F11': '\x1b[23~', 'F12': '\x1b[24~',
+}
+
+# What the arrow keys send once a program asks for application cursor keys
+APPLICATION_CURSOR_KEYS = {
+    'Up': '\x1bOA', 'Down': '\x1bOB', 'Right': '\x1bOC', 'Left': '\x1bOD',
+    'Home': '\x1bOH', 'End': '\x1bOF',
+}
+
+# Speculative translation - natural language input is translated in the
+# background once the user stops typing for this long
+SPECULATIVE_TRANSLATION = True
+SPECULATION_DELAY_MS = 400
 
 class NaturalLanguageTerminal:
-    def __init__(self, root):
+    def __init__(self, root, timer=None):
         self.root = root
         self.root.title("Easy Terminal")
         self.root.configure(bg='black')
@@ -23,12 +77,31 @@ class NaturalLanguageTerminal:
         self.text_color = '#00FF00'  # Green text
         self.bg_color = 'black'
         
-        # Command history
+        # Command history - recorded on disk and loaded from earlier sessions in the background
         self.command_history = []
         self.history_index = 0
+        self.history = HistoryStore()
+        self.search = None  # Ctrl+R state while a reverse search is active
+        
+        # Inline (ghost text) suggestions from history and cached translations
+        self.suggestions = SuggestionIndex()
+        self.suggestion = None  # the suggested text currently shown after the input
         
-        # Current working directory
-        self.current_directory = os.getcwd()
+        # Classification, translation and execution live in the headless engine.
+        # It sets up the LLM in the background, so shell commands work right away
+        self.timer = timer or StartupTimer()
+        self.engine = TerminalEngine(timer=self.timer)
+        self.timer.mark("engine")
+        
+        # Background job notices are shown above the prompt; ones that arrive
+        # while a command is running wait for the next prompt
+        self.engine.on_job_done = lambda job: self.pump.call(self.show_job_notice, job)
+        self.pending_notices = []
+        
+        # Outputs too large for the terminal, by number - each is a LineStore
+        # in a temporary file that ':output' can page through, grep or save
+        self.outputs = {}
+        self.output_count = 0
         
         # Create the terminal text area
         self.terminal = scrolledtext.ScrolledText(
@@ -40,13 +113,37 @@ class NaturalLanguageTerminal:
         )
         self.terminal.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
+        self.terminal.tag_config('suggestion', foreground='#007700')
+        
+        # Status line for Ctrl+R - only packed while a search is active
+        self.search_label = tk.Label(root, bg=self.bg_color, fg=self.text_color,
+                                     font=self.terminal_font, anchor='w')
+        
+        # Keep the widget bounded; trimmed output can be paged back with :scrollback
+        self.scrollback = Scrollback(self.terminal, SCROLLBACK_MAX_LINES, SCROLLBACK_MAX_BYTES)
+        
+        # Output goes through a VT100 screen, so colors, '\r' progress bars and
+        # full-screen programs are drawn the way a terminal would draw them.
+        # Pipe output uses a wide screen; commands on a pseudo-terminal get one
+        # the size of the widget
+        self.screen_size = DEFAULT_SIZE
+        self.screen = ScreenView(self.terminal, Screen(DEFAULT_SIZE[0], LINE_MODE_COLUMNS),
+                                 fg=self.text_color, bg=self.bg_color, font=self.terminal_font)
+        self.engine.on_pty = lambda active: self.pump.call(self.set_screen_mode, active)
+        
+        # Output from worker threads is batched onto the Tk thread; the time
+        # spent drawing a command's output is traced as its 'render' span
+        self.pump = RenderPump(self.root, self.write_output, self.scroll_to_end)
+        self.render_seconds = 0.0
+        
         # Terminal state tracking
         self.input_start = "1.0"
         self.input_active = False
         self.current_command = ""
         
-        # Setup LangChain with Gemini
-        self.setup_langchain()
+        # Speculative translation state - the pending debounce timer
+        self.speculative = SPECULATIVE_TRANSLATION
+        self.speculation_timer = None
         
         # Bind events
         self.terminal.bind('<Key>', self.handle_keypress)
@@ -60,8 +157,28 @@ class NaturalLanguageTerminal:
         self.terminal.bind('<Home>', self.handle_home)
         self.terminal.bind('<End>', self.handle_end)
         self.terminal.bind('<Control-c>', self.handle_interrupt)
+        self.terminal.bind('<Control-z>', self.handle_suspend)
         self.terminal.bind('<Control-l>', self.handle_clear)
         self.terminal.bind("<Tab>", self.handle_tab)
+        self.terminal.bind('<Control-r>', self.handle_reverse_search)
+        self.terminal.bind('<Escape>', self.handle_search_cancel)
+        self.terminal.bind('<Control-g>', self.handle_search_cancel)
+        self.terminal.bind('<KeyRelease>', self.schedule_speculation)
+        self.terminal.bind('<KeyRelease>', self.update_suggestion, add='+')
+        
+        # Suggestions are removed (or accepted) before any other key binding runs,
+        # so the handlers never see the ghost text
+        self.terminal.bind_class('Suggestion', '<Key>', self.handle_suggestion_key)
+        self.terminal.bindtags(('Suggestion',) + self.terminal.bindtags())
+        
+        # While a command runs on a pseudo-terminal every key goes to it instead
+        self.terminal.bind_class('Pty', '<Key>', self.handle_pty_key)
+        self.terminal.bindtags(('Pty',) + self.terminal.bindtags())
+        font = tkfont.Font(font=self.terminal_font)
+        self.char_size = (max(font.measure("0"), 1), max(font.metrics("linespace"), 1))
+        self.inset = 2 * sum(int(self.terminal.cget(option))
+                             for option in ('borderwidth', 'padx', 'highlightthickness'))
+        self.terminal.bind('<Configure>', self.update_pty_size)
         
         # Welcome message
         welcome_msg = "Welcome to Natural Language Terminal\n"
@@ -74,54 +191,19 @@ class NaturalLanguageTerminal:
         # Initial prompt
         self.display_prompt()
         
+        # Index the history file off the UI thread - it can hold millions of entries
+        run_in_background(self.load_history)
+        
         # Disable text widget configuration for proper terminal behavior
         self.terminal.config(state=tk.NORMAL)
         
         # Set focus on terminal
         self.terminal.focus_set()
 
-    def setup_langchain(self):
-        """Set up LangChain with Gemini"""
-        try:
-            # Initialize the Gemini model through LangChain
-            self.llm = GoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=GOOGLE_API_KEY,
-                temperature=0.1
-            )
-            
-            # Create the prompt template - Updated to address translation issues
-            template = """
-            You are an expert in translating natural language queries into bash commands.
-            
-            Current working directory: {current_dir}
-            
-            User query: {query}
-            
-            Determine if this query is already a valid bash command. If it is, return "VALID_COMMAND".
-            
-            If it's natural language, translate it into a valid bash command that would run in a Linux terminal.
-            Provide ONLY the bash command without any explanations, prefixes, or comments.
-            Do not include ANY extra text, markdown formatting, or code blocks in your response.
-            Your response must contain exactly one line with just the bash command.
-            
-            Be lenient with natural language queries and try to find the most reasonable bash equivalent.
-            Only respond with "ERROR: Unable to translate to a valid bash command." if you're absolutely certain 
-            there is no reasonable bash command that can satisfy the request.
-            
-            If the query is asking for something that could be harmful or destructive, respond with 
-            "ERROR: This command could be potentially harmful."
-            """
-            
-            self.prompt = PromptTemplate(
-                input_variables=["query", "current_dir"],
-                template=template
-            )
-            
-            self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
-            
-        except Exception as e:
-            self.append_output(f"Error initializing LangChain: {str(e)}\n")
+    @property
+    def current_directory(self):
+        """Working directory of the engine's shell"""
+        return self.engine.current_directory
 
     def disable_text_widget(self):
         """Disable user editing in areas they shouldn't edit"""
@@ -133,33 +215,103 @@ class NaturalLanguageTerminal:
 
     def display_prompt(self):
         """Display the terminal prompt with current directory"""
+        self.pump.call(self.draw_prompt)
+
+    def draw_prompt(self):
+        """Draw the prompt - runs on the Tk thread"""
         self.enable_text_widget()
+        self.screen.finish()
+        for notice in self.pending_notices:
+            self.terminal.insert(tk.END, notice)
+        self.pending_notices = []
+        self.terminal.mark_set('prompt_start', "end-1c")
+        self.terminal.mark_gravity('prompt_start', tk.LEFT)
         prompt = f"{self.current_directory}$ "
         self.terminal.insert(tk.END, prompt)
+        # A full-screen program may have left the cursor anywhere
+        self.terminal.mark_set(tk.INSERT, "end-1c")
         self.terminal.see(tk.END)
         self.input_start = self.terminal.index(tk.INSERT)
         self.input_active = True
 
+    def show_job_notice(self, job):
+        """Report a finished background job - runs on the Tk thread"""
+        self.engine.jobs.remove(job)
+        notice = format_job(job, job.number) + "\n"
+        if not self.input_active:
+            self.pending_notices.append(notice)
+            return
+        # Redraw the prompt below the notice, keeping what was typed
+        self.end_search()
+        typed = self.input_text()
+        self.clear_suggestion()
+        self.terminal.delete('prompt_start', tk.END)
+        self.terminal.insert(tk.END, notice)
+        self.draw_prompt()
+        self.terminal.insert(tk.END, typed)
+        self.terminal.see(tk.END)
+
     def append_output(self, text):
-        """Append output text to the terminal"""
+        """Append output text to the terminal (safe to call from any thread)"""
+        self.pump.put(text)
+
+    def write_output(self, text):
+        """Feed output text to the screen - runs on the Tk thread, scroll_to_end() draws it"""
+        started = time.perf_counter()
         self.enable_text_widget()
-        self.terminal.insert(tk.END, text)
+        self.screen.screen.feed(text)
+        # Answers to cursor position and device queries
+        responses = self.screen.screen.take_responses()
+        if responses:
+            self.engine.send_input(responses)
+        self.render_seconds += time.perf_counter() - started
+
+    def set_screen_mode(self, pty):
+        """A command started or ended on a pseudo-terminal - runs on the Tk thread"""
+        rows, cols = self.screen_size
+        self.screen.configure(rows, cols if pty else LINE_MODE_COLUMNS, newline_mode=not pty)
+
+    def scroll_to_end(self):
+        """Draw the screen, trim the scrollback and scroll the terminal to the latest output"""
+        started = time.perf_counter()
+        self.screen.render()
+        removed = self.scrollback.trim(self.input_start if self.input_active else None)
+        if removed:
+            line, column = self.input_start.split(".")
+            self.input_start = f"{max(int(line) - removed, 1)}.{column}"
         self.terminal.see(tk.END)
+        self.render_seconds += time.perf_counter() - started
+
+    def record_render(self, trace):
+        """Trace the time spent drawing a finished command's output - runs on the Tk thread"""
+        self.engine.tracer.record('render', self.render_seconds, trace)
+        self.render_seconds = 0.0
 
     def get_current_command(self):
         """Get the current command from the terminal"""
         try:
-            command = self.terminal.get(self.input_start, tk.END)
-            return command.strip()
+            return self.input_text().strip()
         except:
             return ""
 
+    def input_text(self):
+        """Text typed after the prompt, without the suggestion"""
+        return self.terminal.get(self.input_start, 'ghost' if self.suggestion is not None else "end-1c")
+
     def handle_keypress(self, event):
         """Handle key press events"""
         # Ignore events like Shift, Control, etc.
         if len(event.char) == 0 or event.char == '\r' or event.char == '\t':
             return
             
+        # Typing during Ctrl+R extends the search pattern
+        if self.search is not None:
+            if event.char.isprintable():
+                self.search['pattern'] += event.char
+                self.search['position'] = 0
+                self.update_search()
+            return "break"
+            
         # Ignore if cursor is before input_start
         if self.terminal.compare(tk.INSERT, '<', self.input_start):
             self.terminal.mark_set(tk.INSERT, tk.END)
@@ -171,6 +323,10 @@ class NaturalLanguageTerminal:
 
     def handle_return(self, event):
         """Handle Return key - process the command"""
+        # Keys typed while a command runs are not a new command
+        if not self.input_active:
+            return "break"
+        self.end_search()
         self.terminal.config(state=tk.NORMAL)
         command = self.get_current_command()
         self.terminal.insert(tk.END, "\n")
@@ -178,6 +334,7 @@ class NaturalLanguageTerminal:
         if command:
             self.command_history.append(command)
             self.history_index = len(self.command_history)
+            self.engine.completer.add_history(command)
             
             # Exit command handling
             if command.lower() in ['exit', 'quit']:
@@ -189,7 +346,61 @@ class NaturalLanguageTerminal:
                 self.clear_terminal()
                 return "break"
                 
+            # Open a file in the large output viewer
+            if command.split()[0] == ':view':
+                self.view_file(command.split(None, 1)[1:])
+                return "break"
+                
+            # Scrollback handling - page back through or export trimmed output
+            if command.split()[0] == ':scrollback':
+                self.show_scrollback(command.split()[1:])
+                return "break"
+                
+            # Translation cache statistics and invalidation
+            if command.split()[0] == ':cache':
+                self.manage_cache(command.split(None, 1)[1:])
+                return "break"
+                
+            # Resource limits for typed and translated commands
+            if command.split()[0] == ':limits':
+                self.manage_limits(command.split()[1:])
+                return "break"
+                
+            # Latency percentiles per stage for this session
+            if command.split()[0] == ':stats':
+                self.append_output(self.engine.tracer.report())
+                self.display_prompt()
+                return "break"
+                
+            # Startup time per phase
+            if command.split()[0] == ':startup':
+                self.append_output(self.timer.report())
+                self.display_prompt()
+                return "break"
+                
+            # Toggle speculative translation
+            if command.split()[0] == ':speculate':
+                self.toggle_speculation(command.split()[1:])
+                return "break"
+                
             # Process command in a separate thread
+            self.input_active = False
+            if self.speculation_timer is not None:
+                self.root.after_cancel(self.speculation_timer)
+                self.speculation_timer = None
+            
+            # Page through, search or save a large output
+            if command.split()[0] == ':output':
+                threading.Thread(target=self.manage_output, args=(command.split(None, 1)[1:],),
+                                 daemon=True).start()
+                return "break"
+                
+            # Run a file of natural language steps
+            if command.split()[0] == ':run':
+                threading.Thread(target=self.run_script, args=(command.split(None, 1)[1:],),
+                                 daemon=True).start()
+                return "break"
+                
             threading.Thread(target=self.process_command, args=(command,), daemon=True).start()
         else:
             self.display_prompt()
@@ -198,38 +409,49 @@ class NaturalLanguageTerminal:
 
     def handle_backspace(self, event):
         """Handle backspace key"""
+        if self.search is not None:
+            self.search['pattern'] = self.search['pattern'][:-1]
+            self.search['position'] = 0
+            self.update_search()
+            return "break"
         if self.terminal.compare(tk.INSERT, '<=', self.input_start):
             return "break"
         return
 
     def handle_delete(self, event):
         """Handle delete key"""
+        self.end_search()
         if self.terminal.compare(tk.INSERT, '<', self.input_start):
             return "break"
         return
         
     def handle_left(self, event):
         """Handle left arrow key"""
+        self.end_search()
         if self.terminal.compare(tk.INSERT, '<=', self.input_start):
             return "break"
         return
 
     def handle_home(self, event):
         """Handle home key"""
+        self.end_search()
         self.terminal.mark_set(tk.INSERT, self.input_start)
         return "break"
 
     def handle_end(self, event):
         """Handle end key"""
+        self.end_search()
         self.terminal.mark_set(tk.INSERT, tk.END)
         return "break"
 
     def handle_right(self, event):
         """Handle right arrow key"""
+        self.end_search()
         return
 
     def handle_up(self, event):
         """Handle up arrow key - navigate command history"""
+        self.end_search()
         if not self.command_history or self.history_index <= 0:
             return "break"
             
@@ -240,6 +462,7 @@ class NaturalLanguageTerminal:
 
     def handle_down(self, event):
         """Handle down arrow key - navigate command history"""
+        self.end_search()
         if not self.command_history:
             return "break"
             
@@ -253,202 +476,424 @@ class NaturalLanguageTerminal:
 
     def handle_interrupt(self, event):
         """Handle Ctrl+C interrupt"""
+        self.end_search()
+        # A running command is signalled (SIGINT, then SIGTERM and SIGKILL);
+        # the prompt comes back once it has ended
+        if self.engine.interrupt():
+            self.append_output("^C\n")
+            return "break"
+        # Cancel translations that are still waiting on the LLM
+        self.engine.cancel()
         self.append_output("\n^C\n")
         self.display_prompt()
         return "break"
         
+    def handle_suspend(self, event):
+        """Handle Ctrl+Z - stop the job in the foreground and return to the prompt"""
+        self.engine.stop_foreground()
+        return "break"
+        
     def handle_clear(self, event):
         """Handle Ctrl+L (clear)"""
         self.clear_terminal()
         return "break"
         
-    def handle_tab(self, event):
-        """Handle tab completion"""
-        command = self.get_current_command()
+    def handle_reverse_search(self, event):
+        """Handle Ctrl+R - start a reverse history search, or step to the next older match"""
+        if not self.input_active:
+            return "break"
+        if self.search is None:
+            self.search = {'pattern': '', 'matches': [], 'searched': None, 'position': 0,
+                           'saved': self.get_current_command()}
+            self.search_label.pack(side=tk.BOTTOM, fill=tk.X, padx=5, before=self.terminal)
+        else:
+            self.search['position'] += 1
+        self.update_search()
+        return "break"
+
+    def handle_search_cancel(self, event):
+        """Handle Escape / Ctrl+G - leave the search and restore the input"""
+        if self.search is not None:
+            self.end_search(restore=True)
+        return "break"
+
+    def update_search(self):
+        """Show the current match of the reverse search in the input line"""
+        search = self.search
+        if search['pattern'] != search['searched']:
+            search['matches'] = self.history.search(search['pattern'], SEARCH_RESULTS) if search['pattern'] else []
+            search['searched'] = search['pattern']
+        matches = search['matches']
+        search['position'] = min(search['position'], max(len(matches) - 1, 0))
         
-        # Basic implementation of tab completion for files in current directory
-        if " " in command:
-            parts = command.split(" ")
-            prefix = parts[-1]
-            
-            try:
-                files = os.listdir(self.current_directory)
-                matches = [f for f in files if f.startswith(prefix)]
-                
-                if len(matches) == 1:
-                    self.terminal.delete(f"{self.input_start}+{len(command) - len(prefix)}", tk.END)
-                    self.terminal.insert(tk.INSERT, matches[0])
-                elif len(matches) > 1:
-                    # Show options
-                    self.terminal.insert(tk.END, "\n" + "  ".join(matches) + "\n")
-                    self.display_prompt()
-                    self.terminal.insert(tk.INSERT, command)
-            except Exception as e:
-                # Silently handle tab completion errors
-                pass
-                
+        if matches:
+            self.replace_input(matches[search['position']])
+            status = "reverse-i-search"
+        else:
+            status = "failing reverse-i-search" if search['pattern'] else "reverse-i-search"
+        self.search_label.config(text=f"({status})`{search['pattern']}'")
+
+    def end_search(self, restore=False):
+        """Leave Ctrl+R mode, keeping the match in the input line unless restore is set"""
+        if self.search is None:
+            return
+        if restore:
+            self.replace_input(self.search['saved'])
+        self.search = None
+        self.search_label.pack_forget()
+
+    def replace_input(self, text):
+        """Replace the text after the prompt"""
+        self.terminal.delete(self.input_start, tk.END)
+        self.terminal.insert(self.input_start, text)
+        self.terminal.mark_set(tk.INSERT, tk.END)
+
+    def handle_pty_key(self, event):
+        """Runs before every key binding: send the key to the command on the pseudo-terminal, if any"""
+        if self.engine.pty_process is None:
+            return
+        data = PTY_KEYS.get(event.keysym, event.char)
+        if self.screen.screen.app_cursor_keys:
+            data = APPLICATION_CURSOR_KEYS.get(event.keysym, data)
+        # Ctrl+Z would stop the command with nothing left to continue it
+        if not data or data == '\x1a':
+            return "break"
+        if event.state & 0x8 and event.keysym not in PTY_KEYS:
+            # Alt sends an escape prefix
+            data = '\x1b' + data
+        self.engine.send_input(data)
         return "break"
 
-    def clear_terminal(self):
-        """Clear the terminal screen"""
-        self.terminal.delete("1.0", tk.END)
-        self.display_prompt()
+    def update_pty_size(self, event):
+        """Report the widget's size in characters to commands on a pseudo-terminal"""
+        width, height = self.char_size
+        self.screen_size = (max((event.height - self.inset) // height, 1),
+                            max((event.width - self.inset) // width, 1))
+        if not self.screen.screen.newline_mode:
+            self.screen.screen.resize(*self.screen_size)
+            self.screen.render()
+        self.engine.resize_pty(*self.screen_size)
 
-    def detect_command_type(self, command):
-        """
-        Detect if the command is a bash command or natural language
-        Returns: 'bash' or 'natural'
-        """
-        # Common bash commands regex pattern - expanded to include more commands
-        bash_pattern = r'^(cd|ls|mkdir|rmdir|rm|cp|mv|grep|cat|echo|pwd|sudo|apt|git|touch|chmod|chown|man|find|ps|kill|top|df|du|zip|unzip|tar|ssh|scp|ping|ifconfig|ip|curl|wget|history|nano|vim|vi|less|more|tail|head|sort|sed|awk|cut|tr|wc|who|w|whoami|date|cal|clear|cls|exit|quit|reboot|shutdown|uname|which|whereis|locate|ln|mount|umount|free|netstat|traceroute|source|xargs|env|export|chroot|fg|bg)( .*)?$'
+    def handle_suggestion_key(self, event):
+        """Runs before every key binding: Right/End at the end of the input accept the suggestion, anything else drops it"""
+        if self.suggestion is None:
+            return
+        if event.keysym in ('Right', 'End') and self.terminal.compare(tk.INSERT, '==', 'ghost'):
+            self.terminal.tag_remove('suggestion', 'ghost', "end-1c")
+            self.suggestion = None
+            self.terminal.mark_set(tk.INSERT, "end-1c")
+            return "break"
+        self.clear_suggestion()
+
+    def update_suggestion(self, event):
+        """After a keystroke, show the best history match for the input as ghost text"""
+        if not self.input_active or self.search is not None:
+            return
+        self.clear_suggestion()
+        if self.terminal.compare(tk.INSERT, '!=', "end-1c"):
+            return
+        text = self.input_text()
+        best = self.suggestions.suggest(text)
+        if best is not None:
+            self.terminal.mark_set('ghost', "end-1c")
+            self.terminal.mark_gravity('ghost', tk.LEFT)
+            self.terminal.insert("end-1c", best[len(text):], 'suggestion')
+            self.terminal.mark_set(tk.INSERT, 'ghost')
+            self.suggestion = best
+
+    def clear_suggestion(self):
+        """Remove the ghost text, if any"""
+        if self.suggestion is not None:
+            self.terminal.delete('ghost', "end-1c")
+            self.suggestion = None
+
+    def load_history(self):
+        """Worker thread: index the history file, then make recent entries available to Up/Down"""
+        self.history.load()
         
-        # Check if it's a recognized bash command
-        if re.match(bash_pattern, command) or '|' in command or ';' in command or '>' in command or '&' in command:
-            return 'bash'
-            
-        # Check if it contains flags or options (-a, --help)
-        if ' -' in command or ' --' in command:
-            return 'bash'
-            
-        # Check if it seems to be a path or has quotes
-        if ('/' in command or '~' in command or 
-            ('"' in command and '"' in command[command.index('"')+1:]) or
-            ("'" in command and "'" in command[command.index("'")+1:])):
-            return 'bash'
-            
-        # Check if it's a common shorthand command
-        if command in ['..', '.', '!!', '!$']:
-            return 'bash'
-            
-        # By default, try to interpret as natural language if it's more than one word
-        # or contains certain natural language indicators
-        natural_indicators = ['show', 'list', 'display', 'find', 'get', 'what', 'how', 'create', 
-                              'make', 'write', 'search', 'tell', 'give', 'count', 'calculate', 
-                              'please', 'help', 'can', 'could', 'would', 'do', 'does']
+        # Cached translations rank below anything that was actually run
+        for query in self.engine.translation_cache.recent_queries('bash', SUGGESTION_TRANSLATIONS):
+            self.suggestions.add(query, last_used=0)
+        for query, uses, last_used in self.history.recent_usage(SUGGESTION_ENTRIES):
+            self.suggestions.add(query, uses, last_used)
         
-        command_words = command.lower().split()
-        if len(command_words) > 1 or any(word in natural_indicators for word in command_words):
-            return 'natural'
-            
-        # Default to bash if we're not sure
-        return 'bash'
+        queries = self.history.recent_queries(HISTORY_NAVIGATION)
+        for query in queries:
+            self.engine.completer.add_history(query)
+        self.pump.call(self.merge_history, queries)
 
-    def process_command(self, command):
-        """Process the command entered by the user"""
-        # Detect if it's a bash command or natural language
-        command_type = self.detect_command_type(command)
+    def merge_history(self, queries):
+        """Put entries from earlier sessions in front of this session's - runs on the Tk thread"""
+        at_end = self.history_index == len(self.command_history)
+        self.command_history[:0] = queries
+        self.history_index = len(self.command_history) if at_end else self.history_index + len(queries)
+
+    def handle_tab(self, event):
+        """Handle tab completion - answered from the cache when possible, otherwise off the UI thread"""
+        self.end_search()
+        line = self.input_text()
+        result = self.engine.completer.complete(line, self.current_directory, allow_io=False)
+        if result is None:
+            # The directory listing isn't cached (or may be stale) - read it on a worker thread
+            threading.Thread(target=self.complete_in_background,
+                             args=(line, self.current_directory), daemon=True).start()
+        else:
+            self.apply_completion(line, result)
+        return "break"
+
+    def complete_in_background(self, line, cwd):
+        """Worker thread: complete with filesystem access, then apply on the Tk thread"""
+        try:
+            result = self.engine.completer.complete(line, cwd)
+        except Exception:
+            # Silently handle tab completion errors
+            return
+        self.pump.call(self.apply_completion, line, result)
+
+    def apply_completion(self, line, result):
+        """Insert a completion or list the options - runs on the Tk thread"""
+        # Drop results for input that changed while they were being computed
+        if not self.input_active or self.input_text() != line:
+            return
+        self.clear_suggestion()
+        start, matches, prefix = result
+        word = line[start:]
         
-        if command_type == 'bash':
-            # Try to execute directly
-            output = self.execute_bash_command(command)
-            self.append_output(output)
+        if len(matches) == 1:
+            # Complete a lone file name with a space, but keep going into directories
+            replacement = matches[0] if matches[0].endswith("/") else matches[0] + " "
+        elif len(prefix) > len(word):
+            replacement = prefix
+        elif matches:
+            # Show options
+            shown = matches[:MAX_COMPLETIONS_SHOWN]
+            options = "  ".join(shown)
+            if len(matches) > len(shown):
+                options += f"  ... and {len(matches) - len(shown)} more"
+            self.terminal.insert(tk.END, "\n" + options + "\n")
+            self.display_prompt()
+            self.terminal.insert(tk.INSERT, line)
+            return
         else:
-            # Try to translate natural language to bash
-            self.append_output(f"Translating: {command}\n")
-            
+            return
+        self.terminal.delete(f"{self.input_start}+{start}c", "end-1c")
+        self.terminal.insert(tk.END, replacement)
+        self.terminal.mark_set(tk.INSERT, "end-1c")
+
+    def schedule_speculation(self, event):
+        """Restart the debounce timer for speculative translation after a keystroke"""
+        if not self.speculative or not self.input_active:
+            return
+        if self.speculation_timer is not None:
+            self.root.after_cancel(self.speculation_timer)
+        self.speculation_timer = self.root.after(SPECULATION_DELAY_MS, self.speculate)
+
+    def speculate(self):
+        """Start translating the current input in the background if it looks like natural language"""
+        self.speculation_timer = None
+        if self.input_active:
+            self.engine.start_translation(self.get_current_command())
+
+    def toggle_speculation(self, args):
+        """Handle ':speculate [on|off]'"""
+        if args and args[0] in ['on', 'off']:
+            self.speculative = args[0] == 'on'
+        elif args:
+            self.append_output("usage: :speculate [on|off]\n")
+        self.append_output(f"Speculative translation is {'on' if self.speculative else 'off'}\n")
+        self.display_prompt()
+
+    def view_file(self, args):
+        """Handle ':view <file>' - open a (possibly huge) file in the viewer"""
+        if not args:
+            self.append_output("usage: :view <file>\n")
+        else:
+            path = os.path.join(self.current_directory, os.path.expanduser(args[0].strip()))
             try:
-                response = self.chain.invoke({
-                    "query": command,
-                    "current_dir": self.current_directory
-                })
-                
-                translated_command = response['text'].strip()
-                
-                # Clean up response - remove any markdown or extra text that might appear
-                translated_command = self.clean_llm_response(translated_command)
-                
-                # Check if it's already a valid command (no need for translation)
-                if translated_command == "VALID_COMMAND":
-                    self.append_output(f"Executing as-is: {command}\n")
-                    output = self.execute_bash_command(command)
-                # Check for errors in translation
-                elif translated_command.startswith("ERROR:"):
-                    self.append_output(f"{translated_command}\n")
-                    self.display_prompt()
-                    return
-                # Execute the translated command
-                else:
-                    self.append_output(f"Executing: {translated_command}\n")
-                    output = self.execute_bash_command(translated_command)
-                    
-                self.append_output(output)
-                
+                self.open_output_view(LineStore(path), path)
             except Exception as e:
-                self.append_output(f"Error processing command: {str(e)}\n")
-                
+                self.append_output(f"view: {str(e)}\n")
         self.display_prompt()
-    
-    def clean_llm_response(self, response):
-        """Clean LLM response from markdown, code blocks, or extra text"""
-        # If it's already an error message, return it as is
-        if response.startswith("ERROR:"):
-            return response
-            
-        if response == "VALID_COMMAND":
-            return response
-            
-        # Remove markdown code blocks if present
-        response = re.sub(r'```(?:bash|shell)?\s*(.*?)\s*```', r'\1', response, flags=re.DOTALL)
-        
-        # If multiple lines, get only the first non-empty line that doesn't start with #
-        lines = [line.strip() for line in response.split('\n') if line.strip() and not line.strip().startswith('#')]
-        if lines:
-            return lines[0]
-            
-        return response
 
-    def execute_bash_command(self, bash_command):
-        """Execute a bash command and return the output"""
+    def show_large_output(self, store, command):
+        """Called from a worker thread when a command's output gets too big for the terminal"""
+        self.append_output(f"\n[Output is larger than {LARGE_OUTPUT_CHARS} characters - "
+                           f"the full result is shown in a viewer window]\n")
+        self.pump.call(self.open_output_view, store, command, False)
+
+    def open_output_view(self, store, title, close_store=True):
+        """Open a viewer window for a LineStore - runs on the Tk thread"""
+        VirtualOutputView(self.root, store, title=title, bg=self.bg_color,
+                          fg=self.text_color, font=self.terminal_font, close_store=close_store)
+
+    def keep_output(self, store, command):
+        """Remember a finished large output for ':output' and show how it ended"""
+        self.output_count += 1
+        self.outputs[self.output_count] = (command, store)
+        # Older outputs are deleted; a viewer still showing one goes blank
+        for number in sorted(self.outputs)[:-KEPT_OUTPUTS]:
+            self.outputs.pop(number)[1].close()
+        total = store.line_count()
+        tail = store.get_lines(max(total - PREVIEW_LINES, 0), PREVIEW_LINES, PREVIEW_LINE_CHARS)
+        self.append_output(f"[... last {len(tail)} lines:]\n" + "\n".join(tail) + "\n" +
+                           f"[Output {self.output_count}: {total} lines, "
+                           f"{store.size / (1024 * 1024):.1f} MiB - "
+                           f":output view | grep <pattern> | save <file>]\n")
+
+    def manage_output(self, args):
+        """
+        Handle ':output' (list), ':output [n] view', ':output [n] grep <pattern>'
+        and ':output [n] save <file>' - n defaults to the latest output
+        """
+        words = args[0].split(None, 1) if args else []
         try:
-            # Handle built-in commands like cd that affect the process state
-            if bash_command.strip().startswith("cd ") or bash_command.strip() == "cd":
-                dir_part = bash_command.strip()[3:].strip() if bash_command.strip() != "cd" else ""
-                
-                # Handle special case for home directory
-                if dir_part == "~" or dir_part == "":
-                    target_dir = os.path.expanduser("~")
-                # Handle parent directory
-                elif dir_part == "..":
-                    target_dir = os.path.dirname(self.current_directory)
-                # Handle absolute paths
-                elif os.path.isabs(dir_part):
-                    target_dir = dir_part
-                # Handle relative paths
-                else:
-                    target_dir = os.path.join(self.current_directory, dir_part)
-                    
-                if os.path.exists(target_dir) and os.path.isdir(target_dir):
-                    self.current_directory = os.path.abspath(target_dir)
-                    return f"Changed directory to {self.current_directory}\n"
-                else:
-                    return f"bash: cd: {dir_part}: No such file or directory\n"
-            
-            # For all other commands
-            process = subprocess.Popen(
-                bash_command,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=self.current_directory
+            number = self.output_count
+            if words and words[0].isdigit():
+                number = int(words[0])
+                words = words[1].split(None, 1) if len(words) > 1 else []
+            if not words:
+                for number, (command, store) in sorted(self.outputs.items()):
+                    self.append_output(f"{number}: {store.line_count()} lines, "
+                                       f"{store.size / (1024 * 1024):.1f} MiB  {command}\n")
+                if not self.outputs:
+                    self.append_output("No large outputs kept\n")
+            elif number not in self.outputs:
+                self.append_output(f"output: no output {number}\n")
+            elif words[0] == 'view':
+                command, store = self.outputs[number]
+                self.pump.call(self.open_output_view, store, command, False)
+            elif words[0] == 'grep' and len(words) > 1:
+                command, store = self.outputs[number]
+                matches = store.grep(words[1], GREP_RESULTS)
+                for line, text in matches:
+                    self.append_output(f"{line}: {text[:PREVIEW_LINE_CHARS]}\n")
+                if len(matches) >= GREP_RESULTS:
+                    self.append_output(f"[first {GREP_RESULTS} matches shown]\n")
+            elif words[0] == 'save' and len(words) > 1:
+                command, store = self.outputs[number]
+                path = os.path.join(self.current_directory, os.path.expanduser(words[1].strip()))
+                store.save(path)
+                self.append_output(f"Saved {store.line_count()} lines to {path}\n")
+            else:
+                self.append_output("usage: :output [n] [view | grep <pattern> | save <file>]\n")
+        except Exception as e:
+            self.append_output(f"output: {str(e)}\n")
+        self.display_prompt()
+
+    def manage_cache(self, args):
+        """Handle ':cache', ':cache clear' and ':cache forget <query>'"""
+        action = args[0].split(None, 1) if args else []
+        if not action:
+            stats = self.engine.translation_cache.stats()
+            self.append_output(
+                f"Translation cache: {stats['hits']} hits ({stats['disk_hits']} from disk), "
+                f"{stats['misses']} misses, hit rate {stats['hit_rate']:.0%}\n"
+                f"Entries: {stats['memory_entries']} in memory, {stats['disk_entries']} on disk\n"
             )
-            stdout, stderr = process.communicate()
-            
-            if stderr:
-                return stderr
-            elif stdout:
-                return stdout
+        elif action[0] == 'clear':
+            removed = self.engine.translation_cache.invalidate()
+            self.append_output(f"Removed {removed} cached translations\n")
+        elif action[0] == 'forget' and len(action) > 1:
+            removed = self.engine.translation_cache.invalidate(action[1], 'bash', self.current_directory)
+            self.append_output(f"Removed {removed} cached translations\n")
+        else:
+            self.append_output("usage: :cache [clear | forget <query>]\n")
+        self.display_prompt()
+
+    def manage_limits(self, args):
+        """Handle ':limits' and ':limits <typed|translated> <name> <value|off>'"""
+        if not args:
+            self.append_output(self.engine.describe_limits())
+        elif len(args) == 3:
+            try:
+                self.engine.set_limit(*args)
+                self.append_output(self.engine.describe_limits())
+            except ValueError as e:
+                self.append_output(f"limits: {str(e)}\n")
+        else:
+            self.append_output("usage: :limits [typed|translated <wall|cpu|memory|files|output> <value|off>]\n")
+        self.display_prompt()
+
+    def show_scrollback(self, args):
+        """Handle ':scrollback [lines]' and ':scrollback export <file>'"""
+        try:
+            if args and args[0] == 'export':
+                if len(args) < 2:
+                    self.append_output("usage: :scrollback export <file>\n")
+                else:
+                    path = os.path.join(self.current_directory, os.path.expanduser(args[1]))
+                    self.scrollback.export(path)
+                    self.append_output(f"Scrollback saved to {path}\n")
             else:
-                return ""
+                count = int(args[0]) if args else 200
+                lines = self.scrollback.tail(count)
+                if lines:
+                    self.append_output("".join(lines))
+                else:
+                    self.append_output("Nothing has been trimmed from the scrollback yet\n")
+        except Exception as e:
+            self.append_output(f"scrollback: {str(e)}\n")
+        self.display_prompt()
+
+    def clear_terminal(self):
+        """Clear the terminal screen"""
+        self.terminal.delete("1.0", tk.END)
+        self.screen.clear()
+        self.display_prompt()
+
+    def process_command(self, command):
+        """Process the command entered by the user"""
+        # Very large results are moved out of the terminal into a viewer
+        output = LargeOutputRouter(self.append_output,
+                                   lambda store: self.show_large_output(store, command),
+                                   LARGE_OUTPUT_CHARS)
+        cwd = self.current_directory
+        started = time.perf_counter()
+        try:
+            self.render_seconds = 0.0
+            result = self.engine.run_command(command, output, self.append_output)
+            self.pump.call(self.record_render, result['trace'])
+            if output.store is not None:
+                self.keep_output(output.store, command)
+            self.history.append(command, result['command'], cwd, result['status'],
+                                time.perf_counter() - started, result['type'])
+            self.suggestions.add(command)
+        except CancelledError:
+            # Ctrl+C cancelled the translation and already drew a new prompt
+            return
+        except Exception as e:
+            self.append_output(f"Error processing command: {str(e)}\n")
                 
+        self.display_prompt()
+    
+    def run_script(self, args):
+        """Handle ':run <file>' - translate every step of a script in batches, then run them in order"""
+        try:
+            if not args:
+                self.append_output("usage: :run <file>\n")
+            else:
+                path = os.path.join(self.current_directory, os.path.expanduser(args[0].strip()))
+                self.engine.run_script(path, self.append_output)
+        except CancelledError:
+            return
         except Exception as e:
-            return f"Error executing command: {str(e)}\n"
+            self.append_output(f"Error running script: {str(e)}\n")
+        self.display_prompt()
 
 def main():
+    timer = StartupTimer()
+    timer.mark("imports")
     root = tk.Tk()
     root.geometry("800x600")
-    app = NaturalLanguageTerminal(root)
+    timer.mark("Tk window")
+    app = NaturalLanguageTerminal(root, timer)
+    timer.mark("terminal and first prompt")
+    root.after_idle(timer.mark, "first frame")
     root.mainloop()
+    app.engine.close()
+    app.scrollback.close()
+    for command, store in app.outputs.values():
+        store.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,57 @@
+import codecs
+import locale
+import os
+
+# Largest piece of output read from a child process in one go
+CHUNK_SIZE = 4096
+
+
+def make_decoder(encoding="utf-8"):
+    """Incremental decoder (UTF-8 by default) that copes with characters split across chunks"""
+    return codecs.getincrementaldecoder(encoding)(errors="replace")
+
+
+def console_encoding():
+    """
+    Encoding Windows console programs such as cmd.exe and PowerShell write
+    to a pipe in: the console's code page, or the OEM code page when there is
+    no console (pythonw). The locale's encoding on other platforms.
+    """
+    if os.name == 'nt':
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            encoding = f"cp{kernel32.GetConsoleOutputCP() or kernel32.GetOEMCP()}"
+            codecs.lookup(encoding)
+            return encoding
+        except (AttributeError, OSError, LookupError):
+            pass
+    return locale.getpreferredencoding(False)
+
+
+def read_chunks(stream, chunk_size=CHUNK_SIZE):
+    """Yield raw chunks from a pipe as soon as they are available"""
+    fd = stream.fileno()
+    while True:
+        chunk = os.read(fd, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_process(process, on_output, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+    """
+    Push a running process's stdout to on_output in bounded chunks, decoded
+    from encoding
+    Returns: the process exit status
+    """
+    decoder = make_decoder(encoding)
+    for chunk in read_chunks(process.stdout, chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            on_output(text)
+
+    text = decoder.decode(b"", final=True)
+    if text:
+        on_output(text)
+    return process.wait()
@@ -0,0 +1,160 @@
+import tkinter as tk
+from tkinter import font as tkfont
+
+from line_store import LineStore
+
+# Extra lines rendered above and below the visible area
+MARGIN_LINES = 50
+
+# How often an open view checks its store for new output
+REFRESH_MS = 100
+
+
+class VirtualOutputView:
+    """
+    Toplevel window that shows a LineStore. Only the lines in the viewport
+    (plus a small margin) live in the Text widget; the scrollbar maps onto
+    the whole store, so huge outputs never have to be loaded into Tcl.
+    """
+
+    def __init__(self, root, store, title="Output", bg='black', fg='#00FF00',
+                 font=('Courier', 10), close_store=True):
+        self.store = store
+        self.close_store = close_store
+        self.window = tk.Toplevel(root)
+        self.window.title(title)
+        self.window.geometry("800x600")
+        self.window.configure(bg=bg)
+
+        self.scrollbar = tk.Scrollbar(self.window, command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text = tk.Text(self.window, bg=bg, fg=fg, font=font, wrap=tk.NONE,
+                            insertbackground=fg)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.line_height = max(tkfont.Font(font=font).metrics("linespace"), 1)
+
+        # View state
+        self.top = 0            # first store line in the viewport
+        self.follow = True      # keep showing the end while output is arriving
+        self.rendered = (0, 0)  # store lines currently held by the Text widget
+        self.known_lines = -1
+        self.closed = False
+
+        self.text.bind('<Configure>', lambda event: self.render())
+        self.text.bind('<MouseWheel>', self.handle_wheel)
+        self.text.bind('<Button-4>', lambda event: self.scroll_lines(-3))
+        self.text.bind('<Button-5>', lambda event: self.scroll_lines(3))
+        self.text.bind('<Prior>', lambda event: self.scroll_lines(-self.visible_lines()))
+        self.text.bind('<Next>', lambda event: self.scroll_lines(self.visible_lines()))
+        self.text.bind('<Up>', lambda event: self.scroll_lines(-1))
+        self.text.bind('<Down>', lambda event: self.scroll_lines(1))
+        self.text.bind('<Control-Home>', lambda event: self.jump_to(0))
+        self.text.bind('<Control-End>', lambda event: self.jump_to(self.store.line_count()))
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.text.focus_set()
+        self.poll()
+
+    def visible_lines(self):
+        """Number of lines that fit in the viewport"""
+        return max(self.text.winfo_height() // self.line_height, 1)
+
+    def render(self):
+        """Show the lines at self.top, refetching from the store only when needed"""
+        total = self.store.line_count()
+        visible = self.visible_lines()
+        last_top = max(total - visible, 0)
+        if self.follow:
+            self.top = last_top
+        self.top = max(0, min(self.top, last_top))
+
+        first, last = self.rendered
+        grown = total != self.known_lines and last >= self.known_lines
+        if self.top < first or self.top + visible > last or grown:
+            first = max(self.top - MARGIN_LINES, 0)
+            lines = self.store.get_lines(first, self.top - first + visible + MARGIN_LINES)
+            self.text.config(state=tk.NORMAL)
+            self.text.delete("1.0", tk.END)
+            self.text.insert("1.0", "\n".join(lines))
+            self.text.config(state=tk.DISABLED)
+            self.rendered = (first, first + len(lines))
+            first = self.rendered[0]
+        self.known_lines = total
+
+        self.text.yview(f"{self.top - first + 1}.0")
+        if total:
+            self.scrollbar.set(self.top / total, min((self.top + visible) / total, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def on_scroll(self, action, amount, unit=None):
+        """Scrollbar callback - maps scrollbar positions onto store lines"""
+        if action == "moveto":
+            self.jump_to(int(float(amount) * self.store.line_count()))
+        elif unit == "pages":
+            self.scroll_lines(int(amount) * self.visible_lines())
+        else:
+            self.scroll_lines(int(amount))
+
+    def handle_wheel(self, event):
+        """Mouse wheel on Windows/macOS"""
+        return self.scroll_lines(-3 if event.delta > 0 else 3)
+
+    def scroll_lines(self, count):
+        """Move the viewport by count lines"""
+        return self.jump_to(self.top + count)
+
+    def jump_to(self, line):
+        """Put the given store line at the top of the viewport"""
+        self.top = max(line, 0)
+        self.follow = self.top >= self.store.line_count() - self.visible_lines()
+        self.render()
+        return "break"
+
+    def poll(self):
+        """Pick up output that was appended to the store since the last check"""
+        if self.closed:
+            return
+        if self.store.line_count() != self.known_lines:
+            self.render()
+        self.window.after(REFRESH_MS, self.poll)
+
+    def close(self):
+        """Close the window and release the store"""
+        self.closed = True
+        self.window.destroy()
+        if self.close_store:
+            self.store.close()
+
+
+class LargeOutputRouter:
+    """
+    Output callback for a single command. Output goes to on_output until it
+    passes threshold characters; from then on the whole result is kept in a
+    LineStore, which is handed to on_overflow so it can be shown in a viewer.
+    """
+
+    def __init__(self, on_output, on_overflow, threshold):
+        self.on_output = on_output
+        self.on_overflow = on_overflow
+        self.threshold = threshold
+        self.seen = 0
+        self.chunks = []
+        self.store = None
+
+    def __call__(self, text):
+        if self.store is not None:
+            self.store.append(text)
+            return
+
+        self.seen += len(text)
+        if self.seen <= self.threshold:
+            self.chunks.append(text)
+            self.on_output(text)
+            return
+
+        self.store = LineStore()
+        self.store.append("".join(self.chunks))
+        self.store.append(text)
+        self.chunks = []
+        self.on_overflow(self.store)
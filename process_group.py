@@ -0,0 +1,106 @@
+import os
+import signal
+import subprocess
+
+# Seconds to wait after each signal before escalating to the next one
+INTERRUPT_GRACE_SECONDS = 2.0
+
+# What Ctrl+C sends, in order, until the command is gone
+ESCALATION = [signal.SIGINT, signal.SIGTERM, getattr(signal, 'SIGKILL', signal.SIGTERM)]
+
+
+def new_group_options():
+    """Popen keyword arguments that start the child in a process group of its own"""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def signal_group(process, signum):
+    """Send signum to the process group of a child started with new_group_options()"""
+    try:
+        if os.name == 'nt':
+            # A console process group only receives Ctrl+Break; after that the
+            # whole process tree is killed
+            if signum == signal.SIGINT:
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signum)
+    except OSError:
+        # Already gone
+        pass
+
+
+def escalate(send, wait, grace=INTERRUPT_GRACE_SECONDS):
+    """
+    Call send(signum) for each signal in ESCALATION until wait(grace) reports
+    that the target has ended
+    Returns: the signal that ended it, or None if it outlived them all
+    """
+    for signum in ESCALATION:
+        send(signum)
+        if wait(grace):
+            return signum
+    return None
+
+
+def interrupt_process(process, grace=INTERRUPT_GRACE_SECONDS):
+    """
+    Ctrl+C for a child started with new_group_options(): signal its group,
+    escalating from SIGINT to SIGKILL, and reap it
+    Returns: the signal that ended it, or None
+    """
+    def wait(timeout):
+        try:
+            process.wait(timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+
+    return escalate(lambda signum: signal_group(process, signum), wait, grace)
+
+
+def child_pids(pid):
+    """Pids of the direct children of pid"""
+    # Linux lists them per thread in /proc
+    try:
+        children = []
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as children_file:
+                children.extend(int(child) for child in children_file.read().split())
+        return children
+    except (OSError, ValueError):
+        pass
+    try:
+        result = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True)
+        return [int(child) for child in result.stdout.split()]
+    except (OSError, ValueError):
+        return []
+
+
+def signal_children(pid, signum):
+    """
+    Send signum to every child of pid: to the whole group of children that
+    lead their own process group, to just the child otherwise
+    Returns: how many children were signalled
+    """
+    try:
+        own_group = os.getpgid(pid)
+    except OSError:
+        return 0
+    groups = set()
+    count = 0
+    for child in child_pids(pid):
+        try:
+            group = os.getpgid(child)
+            if group == own_group:
+                os.kill(child, signum)
+            elif group not in groups:
+                groups.add(group)
+                os.killpg(group, signum)
+            count += 1
+        except OSError:
+            continue
+    return count
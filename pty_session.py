@@ -0,0 +1,229 @@
+import collections
+import os
+import re
+import selectors
+import shlex
+import shutil
+import struct
+import subprocess
+import threading
+
+try:
+    import fcntl
+    import pty
+    import termios
+except ImportError:
+    # Windows - commands always run on pipes
+    pty = None
+
+from output_stream import CHUNK_SIZE, make_decoder
+
+# Terminal type and size a command sees until the widget reports its own
+PTY_TERM = "xterm-256color"
+DEFAULT_SIZE = (24, 80)
+
+# How long the selector waits before checking whether the command has exited
+POLL_SECONDS = 0.1
+
+# Interactive programs that need a terminal whatever their arguments
+TTY_COMMANDS = frozenset(['top', 'htop', 'btop', 'atop', 'less', 'more', 'most', 'man', 'vi', 'vim',
+                          'nvim', 'view', 'nano', 'pico', 'emacs', 'joe', 'mc', 'ssh', 'telnet', 'ftp',
+                          'sftp', 'tmux', 'screen', 'watch', 'tig', 'ncdu', 'iftop', 'nmtui', 'passwd',
+                          'su', 'sudo', 'fzf', 'mutt', 'lynx', 'w3m', 'crontab'])
+
+# Interpreters and clients that need a terminal when started without a script or command
+REPL_COMMANDS = frozenset(['python', 'python2', 'python3', 'ipython', 'node', 'irb', 'ruby', 'php',
+                           'lua', 'ghci', 'R', 'julia', 'scala', 'sqlite3', 'mysql', 'psql',
+                           'redis-cli', 'mongo', 'mongosh', 'bash', 'sh', 'zsh', 'fish', 'dash', 'bc'])
+
+# Options that give an interpreter something to run, so it won't read from the terminal
+SCRIPT_OPTIONS = frozenset(['-c', '-m', '-e', '-f', '--command', '--eval', '--file', '-r'])
+
+# Words that run the command after them
+WRAPPER_COMMANDS = frozenset(['env', 'nice', 'nohup', 'time', 'exec', 'command', 'builtin'])
+
+# Separators between the simple commands of a command line
+SEGMENT_PATTERN = re.compile(r'\|\|?|&&|;|\n|&')
+
+# Environment assignments in front of a command
+ASSIGNMENT_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+
+
+def pty_supported():
+    """True if commands can be given a pseudo-terminal on this platform"""
+    return pty is not None
+
+
+def needs_tty(command):
+    """Guess whether a command line runs something interactive that needs a terminal"""
+    for segment in SEGMENT_PATTERN.split(command):
+        try:
+            words = shlex.split(segment)
+        except ValueError:
+            words = segment.split()
+        while words and (ASSIGNMENT_PATTERN.match(words[0]) or words[0] in WRAPPER_COMMANDS):
+            words = words[1:]
+        if not words:
+            continue
+
+        name = os.path.basename(words[0])
+        args = words[1:]
+        if name in TTY_COMMANDS:
+            return True
+        if name in REPL_COMMANDS or re.match(r'python[\d.]+$', name):
+            if not SCRIPT_OPTIONS.intersection(args) and not any(not arg.startswith('-') for arg in args):
+                return True
+        if name == 'git' and args:
+            # Subcommands that open an editor or ask what to do
+            if args[0] == 'commit' and not any(arg.startswith(('-m', '--message', '-F', '--file', '--no-edit',
+                                                                '-C', '--reuse-message')) for arg in args):
+                return True
+            if args[0] in ('rebase', 'add', 'checkout', 'reset', 'stash') and \
+                    any(arg in ('-i', '--interactive', '-p', '--patch') for arg in args):
+                return True
+    return False
+
+
+def take_controlling_terminal():
+    """Runs in the child between fork and exec: make the pty on stdin its controlling terminal"""
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+
+class PtyProcess:
+    """
+    A command running on a pseudo-terminal, in a session of its own. run()
+    is a selector loop that copies the command's output to on_output and
+    feeds it the keystrokes queued with write(); resize() passes window size
+    changes on, and the kernel sends the command SIGWINCH.
+    """
+
+    def __init__(self, command, cwd, size=DEFAULT_SIZE, shell=None, env=None):
+        shell = shell or shutil.which("bash") or "/bin/sh"
+        master, slave = pty.openpty()
+        self.master = master
+        self.closed = False
+        self.resize(*size)
+        # env is the environment to run in, by default our own
+        env = dict(os.environ if env is None else env, TERM=PTY_TERM)
+        # LINES and COLUMNS would override the window size we report
+        env.pop("LINES", None)
+        env.pop("COLUMNS", None)
+        try:
+            self.process = subprocess.Popen(
+                [shell, "-c", command],
+                stdin=slave,
+                stdout=slave,
+                stderr=slave,
+                cwd=cwd,
+                env=env,
+                start_new_session=True,
+                preexec_fn=take_controlling_terminal
+            )
+        except Exception:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+
+        # Keystrokes waiting for the pty, and a pipe that wakes the selector for them
+        self.pending = collections.deque()
+        self.lock = threading.Lock()
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+        os.set_blocking(self.wake_write, False)
+
+    def write(self, data):
+        """Queue input for the command - safe from any thread"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self.lock:
+            if self.closed:
+                return
+            self.pending.append(data)
+            try:
+                os.write(self.wake_write, b"\0")
+            except BlockingIOError:
+                # Already woken
+                pass
+
+    def resize(self, rows, cols):
+        """Tell the command its terminal is now rows x cols"""
+        if self.closed:
+            return
+        try:
+            fcntl.ioctl(self.master, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+        except OSError:
+            pass
+
+    def flush_input(self):
+        """Write as much queued input as the pty takes without blocking"""
+        with self.lock:
+            while self.pending:
+                data = self.pending.popleft()
+                try:
+                    written = os.write(self.master, data)
+                except BlockingIOError:
+                    written = 0
+                if written < len(data):
+                    self.pending.appendleft(data[written:])
+                    return
+
+    def run(self, on_output):
+        """
+        Copy output to on_output and queued input to the command until it exits
+        Returns: the exit status
+        """
+        decoder = make_decoder()
+        selector = selectors.DefaultSelector()
+        selector.register(self.master, selectors.EVENT_READ)
+        selector.register(self.wake_read, selectors.EVENT_READ)
+        try:
+            while True:
+                events = selector.select(POLL_SECONDS)
+                for key, mask in events:
+                    if key.fd == self.wake_read:
+                        try:
+                            os.read(self.wake_read, CHUNK_SIZE)
+                        except BlockingIOError:
+                            pass
+                        continue
+                    if mask & selectors.EVENT_WRITE:
+                        self.flush_input()
+                    if mask & selectors.EVENT_READ:
+                        try:
+                            data = os.read(self.master, CHUNK_SIZE)
+                        except BlockingIOError:
+                            continue
+                        except OSError:
+                            # EIO - every copy of the slave side is closed
+                            data = b""
+                        if not data:
+                            return self.finish(decoder, on_output)
+                        text = decoder.decode(data)
+                        if text:
+                            on_output(text)
+
+                # A background child may keep the pty open - stop once the
+                # command is gone and its output has been read
+                if not events and self.process.poll() is not None:
+                    return self.finish(decoder, on_output)
+                with self.lock:
+                    wanted = selectors.EVENT_READ | (selectors.EVENT_WRITE if self.pending else 0)
+                selector.modify(self.master, wanted)
+        finally:
+            selector.close()
+
+    def finish(self, decoder, on_output):
+        """Flush the decoder, close the pty and reap the command"""
+        text = decoder.decode(b"", final=True)
+        if text:
+            on_output(text)
+        with self.lock:
+            self.closed = True
+            for fd in (self.master, self.wake_read, self.wake_write):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        return self.process.wait()
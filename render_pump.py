@@ -0,0 +1,84 @@
+import collections
+import threading
+
+# Delay between two UI updates (~60 frames per second)
+FRAME_MS = 16
+
+# Maximum number of queued fragments before producers have to wait
+MAX_PENDING = 256
+
+
+class RenderPump:
+    """
+    Moves output produced on worker threads into a Tk widget from the Tk thread.
+    Queued text fragments are joined and written once per frame, and producers
+    block while the queue is full so a chatty command can't flood the UI.
+    """
+
+    def __init__(self, root, write, flush=None, frame_ms=FRAME_MS, max_pending=MAX_PENDING):
+        self.root = root
+        self.write = write
+        self.flush = flush
+        self.frame_ms = frame_ms
+        self.max_pending = max_pending
+        self.pending = collections.deque()
+        self.condition = threading.Condition()
+        self.ui_thread = threading.current_thread()
+        self.root.after(self.frame_ms, self.tick)
+
+    def on_ui_thread(self):
+        """True when called from the Tk thread"""
+        return threading.current_thread() is self.ui_thread
+
+    def put(self, text):
+        """Queue text for the widget"""
+        self.enqueue(text)
+
+    def call(self, func, *args):
+        """Run func on the Tk thread once everything queued before it is written"""
+        if self.on_ui_thread():
+            self.drain()
+            func(*args)
+        else:
+            self.enqueue((func, args))
+
+    def enqueue(self, item):
+        """Add an item to the queue, waiting for room if called from a worker"""
+        with self.condition:
+            if not self.on_ui_thread():
+                while len(self.pending) >= self.max_pending:
+                    self.condition.wait()
+            self.pending.append(item)
+
+    def drain(self, limit=None):
+        """Write queued output to the widget - must run on the Tk thread"""
+        with self.condition:
+            count = len(self.pending) if limit is None else min(limit, len(self.pending))
+            items = [self.pending.popleft() for _ in range(count)]
+            self.condition.notify_all()
+
+        if not items:
+            return
+
+        fragments = []
+        for item in items:
+            if isinstance(item, str):
+                fragments.append(item)
+                continue
+            if fragments:
+                self.write("".join(fragments))
+                fragments = []
+            func, args = item
+            func(*args)
+        if fragments:
+            self.write("".join(fragments))
+
+        if self.flush is not None:
+            self.flush()
+
+    def tick(self):
+        """Per-frame drain scheduled with root.after"""
+        try:
+            self.drain(self.max_pending)
+        finally:
+            self.root.after(self.frame_ms, self.tick)
@@ -0,0 +1,140 @@
+import tkinter as tk
+
+from vt_screen import Screen
+
+# Mark in the Text widget where the rows of the screen start
+SCREEN_MARK = 'screen_start'
+
+
+class ScreenView:
+    """
+    Shows a vt_screen.Screen at the end of a Text widget. Lines that scroll
+    off the screen are inserted above it once and then left alone; of the
+    screen itself only the rows that changed are redrawn. Each attribute set
+    gets one Tk tag, created the first time it is used and reused after that.
+    """
+
+    def __init__(self, text, screen=None, fg='#00FF00', bg='black', font=('Courier', 10)):
+        self.text = text
+        self.screen = screen or Screen()
+        self.fg = fg
+        self.bg = bg
+        self.bold_font = tuple(font[:2]) + ('bold',)
+        self.tags = {}          # attribute id -> tag name
+        self.active = False     # True while the screen's rows are in the widget
+        self.shown_rows = 0
+
+    def tag(self, attr):
+        """The tag for an attribute id, or () for the default attributes"""
+        if not attr:
+            return ()
+        name = self.tags.get(attr)
+        if name is None:
+            foreground, background, bold, underline, reverse = self.screen.attributes[attr]
+            if reverse:
+                foreground, background = background or self.bg, foreground or self.fg
+            name = f"vt{attr}"
+            options = {'underline': underline}
+            if foreground:
+                options['foreground'] = foreground
+            if background:
+                options['background'] = background
+            if bold:
+                options['font'] = self.bold_font
+            self.text.tag_config(name, **options)
+            # Under the selection and suggestion tags
+            self.text.tag_lower(name)
+            self.tags[attr] = name
+        return name
+
+    def insert_args(self, lines):
+        """Arguments for Text.insert() showing lines of runs, joined by newlines"""
+        args = []
+        plain = []
+        for number, runs in enumerate(lines):
+            if number:
+                plain.append("\n")
+            for chunk, attr in runs:
+                if not attr:
+                    plain.append(chunk)
+                    continue
+                if plain:
+                    args += ["".join(plain), ()]
+                    plain = []
+                args += [chunk, self.tag(attr)]
+        if plain:
+            args += ["".join(plain), ()]
+        return args
+
+    def row_index(self, row):
+        """Text index of the start of a screen row"""
+        return SCREEN_MARK if row == 0 else f"{SCREEN_MARK} + {row} lines linestart"
+
+    def render(self):
+        """Bring the widget up to date with the screen - runs on the Tk thread"""
+        screen = self.screen
+        history = screen.take_history()
+        redraw, dirty = screen.take_dirty()
+        if not (history or redraw or dirty):
+            return
+        if not self.active:
+            self.text.mark_set(SCREEN_MARK, "end-1c")
+            self.text.mark_gravity(SCREEN_MARK, tk.LEFT)
+            self.active = True
+            self.shown_rows = 0
+
+        used = screen.used_rows()
+        if history or redraw or used < self.shown_rows:
+            # Scrolled or cleared: replace the whole screen, with the lines that left it above
+            self.text.delete(SCREEN_MARK, "end-1c")
+            if history:
+                self.text.insert("end-1c", *self.insert_args(history + [[]]))
+                self.text.mark_set(SCREEN_MARK, "end-1c")
+            self.shown_rows = 0
+            dirty = range(used)
+
+        for row in sorted(dirty):
+            if row >= used:
+                continue
+            if row < self.shown_rows:
+                start = self.row_index(row)
+                self.text.delete(start, f"{start} lineend")
+                args = self.insert_args([screen.line(row)])
+                if args:
+                    self.text.insert(start, *args)
+        if used > self.shown_rows:
+            # New rows are added below the ones shown, blank or not
+            lines = [screen.line(row) for row in range(self.shown_rows, used)]
+            if self.shown_rows:
+                lines.insert(0, [])
+            args = self.insert_args(lines)
+            if args:
+                self.text.insert("end-1c", *args)
+            self.shown_rows = used
+
+        if screen.alternate or not screen.newline_mode:
+            # Full-screen programs show where their cursor is
+            start = self.row_index(screen.y)
+            position = self.text.index(f"{start} + {min(screen.x, screen.cols - 1)} chars")
+            if self.text.compare(position, '>', f"{start} lineend"):
+                position = self.text.index(f"{start} lineend")
+            self.text.mark_set(tk.INSERT, position)
+
+    def finish(self):
+        """Leave what is shown as plain text and start an empty screen below it"""
+        self.render()
+        self.clear()
+
+    def clear(self):
+        """Forget the screen without drawing it - e.g. once the widget was cleared"""
+        self.active = False
+        self.shown_rows = 0
+        self.screen.reset()
+        self.screen.take_dirty()
+
+    def configure(self, rows, cols, newline_mode):
+        """Finish the current screen and size the next one"""
+        self.finish()
+        self.screen.newline_mode = newline_mode
+        self.screen.resize(rows, cols)
+        self.screen.take_dirty()
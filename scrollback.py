@@ -0,0 +1,109 @@
+import collections
+import gzip
+import os
+import tempfile
+
+# Default limits for text kept in the terminal widget
+MAX_LINES = 5000
+MAX_BYTES = 2 * 1024 * 1024
+
+# Once over a limit, trim down to this fraction of it so we don't trim every frame
+TRIM_TO = 0.9
+
+
+class ScrollbackSpool:
+    """Compressed on-disk store for text trimmed out of the terminal"""
+
+    def __init__(self, path=None):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="easy_terminal_", suffix=".spool.gz")
+            os.close(fd)
+        self.path = path
+        self.line_count = 0
+
+    def append(self, text):
+        """Append evicted text - each call adds one gzip member to the file"""
+        if not text:
+            return
+        with gzip.open(self.path, "at", encoding="utf-8") as spool:
+            spool.write(text)
+        self.line_count += text.count("\n")
+
+    def lines(self):
+        """Iterate over every spooled line, oldest first"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as spool:
+            for line in spool:
+                yield line
+
+    def tail(self, count):
+        """Return the newest count spooled lines"""
+        return list(collections.deque(self.lines(), maxlen=count))
+
+    def export(self, destination, current_text=""):
+        """Write the spooled text followed by current_text to a plain file"""
+        with open(destination, "w", encoding="utf-8") as out:
+            for line in self.lines():
+                out.write(line)
+            out.write(current_text)
+
+    def close(self):
+        """Delete the spool file"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class Scrollback:
+    """Keeps a Tk text widget under a line/byte limit, spooling what it trims"""
+
+    def __init__(self, widget, max_lines=MAX_LINES, max_bytes=MAX_BYTES, spool=None):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.spool = spool or ScrollbackSpool()
+
+    def trim(self, protect=None):
+        """
+        Evict the oldest lines if the widget is over its limits
+        Nothing at or after the protect index is removed
+        Returns: the number of lines removed
+        """
+        line_count = int(self.widget.index("end-1c").split(".")[0])
+        char_count = self.widget.count("1.0", "end-1c", "chars")
+        char_count = char_count[0] if char_count else 0
+
+        if line_count <= self.max_lines and char_count <= self.max_bytes:
+            return 0
+
+        cut_line = 1
+        if line_count > self.max_lines:
+            cut_line = line_count - int(self.max_lines * TRIM_TO) + 1
+        if char_count > self.max_bytes:
+            over = char_count - int(self.max_bytes * TRIM_TO)
+            byte_cut = self.widget.index(f"1.0 + {over} chars")
+            cut_line = max(cut_line, int(byte_cut.split(".")[0]) + 1)
+
+        if protect is not None:
+            cut_line = min(cut_line, int(self.widget.index(protect).split(".")[0]))
+        if cut_line <= 1:
+            return 0
+
+        cut = f"{cut_line}.0"
+        self.spool.append(self.widget.get("1.0", cut))
+        self.widget.delete("1.0", cut)
+        return cut_line - 1
+
+    def tail(self, count):
+        """Return the newest count lines that were trimmed from the widget"""
+        return self.spool.tail(count)
+
+    def export(self, destination):
+        """Save the full session transcript - spooled and on-screen text"""
+        self.spool.export(destination, self.widget.get("1.0", "end-1c"))
+
+    def close(self):
+        """Discard the spool"""
+        self.spool.close()
@@ -0,0 +1,226 @@
+import os
+import shlex
+import shutil
+import signal
+import subprocess
+import threading
+import uuid
+
+from output_stream import make_decoder, read_chunks
+from process_group import INTERRUPT_GRACE_SECONDS, escalate, new_group_options, signal_children
+from limits import process_cpu_seconds, restore_command
+
+
+def with_definitions(command, definitions):
+    """A bash -c script that recreates the session's aliases and functions before running command"""
+    if not definitions.strip():
+        return command
+    # Aliases only expand in lines read after they are defined
+    return f"shopt -s expand_aliases\n{definitions}\n{command}"
+
+
+class BashSession:
+    """A long-lived bash coprocess that runs commands one after another"""
+
+    def __init__(self, cwd=None, shell=None):
+        self.shell = shell or shutil.which("bash") or "/bin/bash"
+        self.cwd = cwd or os.getcwd()
+        self.process = None
+        self.killed = False     # True once Ctrl+C had to kill the shell
+        self.lock = threading.Lock()
+        self.idle = threading.Event()  # cleared while a command runs
+        self.idle.set()
+
+    def start(self):
+        """Start (or restart) the bash coprocess in the last known directory"""
+        self.close()
+        if not os.path.isdir(self.cwd):
+            self.cwd = os.path.expanduser("~")
+
+        self.process = subprocess.Popen(
+            [self.shell, "--noprofile", "--norc"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=self.cwd,
+            bufsize=0,
+            **new_group_options()
+        )
+        self.killed = False
+        # Aliases are off by default in non-interactive shells. Job control puts
+        # every command in a process group of its own that Ctrl+C can signal.
+        # Commands run at the top level (so declare and source define globals);
+        # SIGINT to bash itself runs the INT trap, which keeps bash alive,
+        # breaks out of every loop - ending loops of builtins - and flags the
+        # command as interrupted.
+        self.process.stdin.write(
+            b"shopt -s expand_aliases\nset -m\n"
+            b"trap '__easy_terminal_interrupted=1; break 1000 2>/dev/null' INT\n"
+        )
+
+    def is_alive(self):
+        """Health check - True if the coprocess is still running"""
+        return self.process is not None and self.process.poll() is None
+
+    def ensure_running(self):
+        """Restart the coprocess if it has died"""
+        if not self.is_alive():
+            self.start()
+
+    def run(self, command, on_output=None, limits=None, on_started=None):
+        """
+        Run a command in the session
+        If on_output is given, output is streamed to it chunk by chunk instead
+        of being collected. limits (a CommandLimits) sets soft rlimits for the
+        command only - the session's own limits are put back afterwards.
+        on_started() is called once the command has been handed to the shell.
+        Returns: (output, exit_status, cwd)
+        """
+        with self.lock:
+            self.ensure_running()
+
+            # Every command is framed with a unique sentinel that carries the
+            # exit status and working directory once the command has finished.
+            # eval keeps syntax errors from swallowing the sentinel line and
+            # stdin is detached so commands can't read our control pipe.
+            token = f"__EASY_TERMINAL_{uuid.uuid4().hex}__"
+            ulimit = limits.ulimit_command(process_cpu_seconds(self.process.pid)) if limits else ""
+            script = (
+                f"{ulimit}\n__easy_terminal_interrupted=\n"
+                f"{{ eval -- {shlex.quote(command)}\n}} < /dev/null\n"
+                f"__easy_terminal_status=$?\n"
+                f"{restore_command() if ulimit else ''}\n"
+                f"[ -n \"$__easy_terminal_interrupted\" ] && __easy_terminal_status=130\n"
+                f"printf '\\n%s %d %s\\n' '{token}' \"$__easy_terminal_status\" \"$PWD\"\n"
+            )
+
+            self.idle.clear()
+            try:
+                try:
+                    self.process.stdin.write(script.encode())
+                except (BrokenPipeError, OSError):
+                    self.start()
+                    self.process.stdin.write(script.encode())
+                if on_started is not None:
+                    on_started()
+
+                return self._read_until_sentinel(token.encode(), on_output)
+            finally:
+                self.idle.set()
+
+    def export_state(self):
+        """
+        Snapshot what a command started outside the session (on a pty or as a
+        background job) needs to see the session's state: its exported
+        environment, working directory, and bash source that recreates its
+        aliases and functions. Unexported variables, shell options and traps
+        don't carry over, and a cd or export made by that command stays in its
+        own shell.
+        Returns: (environment dict, cwd, definitions)
+        """
+        marker = f"__EASY_TERMINAL_STATE_{uuid.uuid4().hex}__"
+        output, status, cwd = self.run(f"env -0; printf '%s' '{marker}'; alias -p; declare -f")
+        environment, found, definitions = output.partition(marker)
+        if not found:
+            raise RuntimeError("the shell session didn't report its state")
+        env = dict(entry.split("=", 1) for entry in environment.split("\0") if "=" in entry)
+        return env, cwd, definitions
+
+    def busy(self):
+        """True while a command is running"""
+        return not self.idle.is_set()
+
+    def interrupt(self, grace=INTERRUPT_GRACE_SECONDS):
+        """
+        Ctrl+C: signal the running command's process groups, escalating from
+        SIGINT to SIGTERM to SIGKILL. bash itself gets the SIGINT too, which
+        ends a loop of builtins. A command that outlives all of that takes the
+        shell down with it; the next command starts a new one in the same
+        directory, and the interrupted command's output says that the rest
+        of the session's state was lost.
+        Returns: True if a command was running
+        """
+        process = self.process
+        if not self.busy() or process is None:
+            return False
+
+        def send(signum):
+            signal_children(process.pid, signum)
+            if signum == signal.SIGINT:
+                try:
+                    os.kill(process.pid, signum)
+                except OSError:
+                    pass
+
+        if os.name != 'nt' and escalate(send, self.idle.wait, grace):
+            return True
+        self.killed = True
+        process.kill()
+        self.idle.wait(grace)
+        return True
+
+    def _read_until_sentinel(self, token, on_output=None):
+        """Read command output until the sentinel line arrives"""
+        marker_bytes = b"\n" + token
+        decoder = make_decoder()
+        collected = []
+        state = {"tail": ""}
+        pending = b""
+
+        def emit(data, final=False):
+            text = decoder.decode(data, final=final)
+            if text:
+                state["tail"] = text[-1]
+                (on_output or collected.append)(text)
+
+        def finish():
+            emit(b"", final=True)
+            if state["tail"] and state["tail"] != "\n":
+                (on_output or collected.append)("\n")
+            return "".join(collected)
+
+        for chunk in read_chunks(self.process.stdout):
+            pending += chunk
+            marker = pending.find(marker_bytes)
+            if marker == -1:
+                # Hold back only a tail that could be the start of a sentinel
+                # split across reads
+                safe = pending.rfind(b"\n", max(0, len(pending) - len(marker_bytes) + 1))
+                if safe == -1 or not marker_bytes.startswith(pending[safe:]):
+                    safe = len(pending)
+                if safe > 0:
+                    emit(pending[:safe])
+                    pending = pending[safe:]
+                continue
+
+            end = pending.find(b"\n", marker + len(marker_bytes))
+            if end == -1:
+                continue
+
+            emit(pending[:marker])
+            output = finish()
+            status, cwd = pending[marker + len(marker_bytes):end].decode(errors="replace").strip().split(" ", 1)
+            self.cwd = cwd
+            return output, int(status), cwd
+
+        # The shell exited (e.g. the command was `exit`)
+        emit(pending)
+        if self.killed:
+            emit(b"\nCtrl+C had to restart the shell - exported variables, aliases and "
+                 b"functions were reset; the working directory is kept\n")
+        output = finish()
+        self.process.wait()
+        return output, self.process.returncode, self.cwd
+
+    def close(self):
+        """Terminate the coprocess"""
+        if self.process is None:
+            return
+        try:
+            if self.process.poll() is None:
+                self.process.stdin.close()
+                self.process.terminate()
+            self.process.wait(timeout=1)
+        except Exception:
+            self.process.kill()
+        self.process = None
@@ -0,0 +1,126 @@
+import threading
+from collections import deque
+
+from line_store import LineStore
+
+# Output kept in memory before it is moved to a temporary file
+SPILL_THRESHOLD = 4 * 1024 * 1024
+
+# Lines shown from each end of spilled output, and the longest line shown in full
+PREVIEW_LINES = 20
+PREVIEW_LINE_CHARS = 500
+
+# Spilled outputs a terminal keeps on disk before deleting the oldest
+KEPT_OUTPUTS = 5
+
+# How to page, search and copy a kept output with each shell's own commands
+OUTPUT_HINTS = {
+    'bash': "less {path} | grep <pattern> {path} | cp {path} <file>",
+    'cmd': 'more < "{path}" | findstr <pattern> "{path}" | copy "{path}" <file>',
+    'powershell': "Get-Content '{path}' | Select-String <pattern> '{path}' | Copy-Item '{path}' <file>",
+}
+
+
+class SpillBuffer:
+    """
+    Output callback that collects a command's output in memory up to
+    threshold characters and spills everything to a LineStore (a temporary
+    file) beyond that, so capturing any amount of output costs bounded memory.
+    """
+
+    def __init__(self, threshold=SPILL_THRESHOLD, keeper=None):
+        self.threshold = threshold
+        self.keeper = keeper    # SpillKeeper that owns the file once there is one
+        self.chunks = []
+        self.size = 0
+        self.store = None
+
+    def __call__(self, text):
+        if self.store is not None:
+            self.store.append(text)
+            return
+        self.chunks.append(text)
+        self.size += len(text)
+        if self.size > self.threshold:
+            self.store = LineStore()
+            if self.keeper is not None:
+                self.keeper.keep(self.store)
+            self.store.append("".join(self.chunks))
+            self.chunks = []
+
+    @property
+    def spilled(self):
+        """True once the output has moved to disk"""
+        return self.store is not None
+
+    def text(self):
+        """All of the output if it is in memory, else a head/tail preview saying where the rest is"""
+        if self.store is None:
+            return "".join(self.chunks)
+        return preview(self.store, hint=self.keeper.hint(self.store) if self.keeper is not None else "")
+
+    def close(self):
+        """Delete the temporary file, if there is one"""
+        if self.store is not None:
+            self.store.close()
+
+    def detach(self):
+        """
+        Release the temporary file without deleting it - whoever was told its
+        path deletes it
+        Returns: the path, or None if nothing was spilled
+        """
+        if self.store is None:
+            return None
+        self.store.owned = False
+        self.store.close()
+        return self.store.path
+
+
+class SpillKeeper:
+    """
+    The last few spilled outputs of a terminal. Their files stay on disk so
+    they can be paged, searched and copied with the shell's own commands;
+    the oldest is deleted when a new one comes in, and close() deletes the rest.
+    """
+
+    def __init__(self, shell='bash', count=KEPT_OUTPUTS):
+        self.shell = shell
+        self.count = count
+        self.stores = deque()
+        self.lock = threading.Lock()
+
+    def keep(self, store):
+        """Take over a LineStore, deleting the oldest one kept past count"""
+        with self.lock:
+            self.stores.append(store)
+            while len(self.stores) > self.count:
+                self.stores.popleft().close()
+
+    def hint(self, store):
+        """How to get at a kept output from the shell"""
+        return (f"Kept until {self.count} more large outputs or exit: "
+                + OUTPUT_HINTS[self.shell].format(path=store.path))
+
+    def close(self):
+        """Delete every kept output"""
+        with self.lock:
+            while self.stores:
+                self.stores.popleft().close()
+
+
+def preview(store, lines=PREVIEW_LINES, hint=""):
+    """
+    The first and last lines of a LineStore, with a note about what was left
+    out and hint (how to get at the rest), if any
+    """
+    total = store.line_count()
+    if total <= 2 * lines:
+        shown = store.get_lines(0, total, PREVIEW_LINE_CHARS)
+        return "\n".join(shown) + "\n" + (f"[{hint}]\n" if hint else "")
+    head = store.get_lines(0, lines, PREVIEW_LINE_CHARS)
+    tail = store.get_lines(total - lines, lines, PREVIEW_LINE_CHARS)
+    return ("\n".join(head) +
+            f"\n[... {total - 2 * lines} lines ({store.size / (1024 * 1024):.1f} MiB in total) "
+            f"not shown - full output in {store.path} ...]\n" +
+            "\n".join(tail) + "\n" + (f"[{hint}]\n" if hint else ""))
@@ -0,0 +1,71 @@
+import threading
+import time
+from concurrent.futures import Future
+
+# Time this module was first imported - frontends import it before anything heavy
+PROCESS_START = time.perf_counter()
+
+
+def run_in_background(func, *args):
+    """
+    Run func(*args) on a daemon thread
+    Returns: a concurrent.futures.Future for its result. The future is marked
+    running up front, so request cancellation can't cancel it by accident.
+    """
+    future = Future()
+    future.set_running_or_notify_cancel()
+
+    def run():
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase took. mark() closes the phase that
+    has been running since the previous mark; record() adds a phase that
+    was timed elsewhere (e.g. on a background thread).
+    """
+
+    def __init__(self, start=PROCESS_START):
+        self.start = start
+        self.last = start
+        self.phases = []
+        self.background = []
+        self.lock = threading.Lock()
+
+    def mark(self, name):
+        """End the current phase and name it"""
+        now = time.perf_counter()
+        with self.lock:
+            self.phases.append((name, now - self.last))
+            self.last = now
+
+    def record(self, name, seconds):
+        """Add a phase that ran off the critical path"""
+        with self.lock:
+            self.background.append((name, seconds))
+
+    def timed(self, name, func, *args):
+        """Call func(*args) and record how long it took as a background phase"""
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self):
+        """Per-phase breakdown as text"""
+        with self.lock:
+            lines = ["Startup time:"]
+            for name, seconds in self.phases:
+                lines.append(f"  {name:<32}{seconds * 1000:9.1f} ms")
+            lines.append(f"  {'total':<32}{(self.last - self.start) * 1000:9.1f} ms")
+            for name, seconds in self.background:
+                lines.append(f"  {name + ' (background)':<32}{seconds * 1000:9.1f} ms")
+            return "\n".join(lines) + "\n"
@@ -0,0 +1,70 @@
+import threading
+
+# Each use of a command counts as this many newer commands when ranking
+FREQUENCY_WEIGHT = 20
+
+# Only this many leading characters are indexed; longer prefixes are checked
+# against the suggestion found at that depth
+MAX_DEPTH = 48
+
+
+class SuggestionIndex:
+    """
+    Prefix trie for inline suggestions. Every node keeps the best-ranked
+    command that continues past it, so a lookup is a walk of len(prefix)
+    dict hits with no searching. A command's rank is its latest use plus FREQUENCY_WEIGHT per
+    use; ranks only ever grow, which lets add() keep every node's best
+    up to date incrementally.
+    """
+
+    def __init__(self, max_depth=MAX_DEPTH):
+        self.max_depth = max_depth
+        self.root = {}          # char -> node; a node is [best, children]
+        self.ranks = {}         # command -> (rank, uses, last use)
+        self.clock = 0
+        self.lock = threading.Lock()
+
+    def add(self, command, uses=1, last_used=None):
+        """Record uses of a command (as of last_used, default now)"""
+        command = command.strip()
+        if not command:
+            return
+        with self.lock:
+            if last_used is None:
+                self.clock += 1
+                last_used = self.clock
+            else:
+                self.clock = max(self.clock, last_used)
+            _, old_uses, old_last = self.ranks.get(command, (0, 0, 0))
+            total = old_uses + uses
+            last_used = max(last_used, old_last)
+            rank = last_used + FREQUENCY_WEIGHT * total
+            self.ranks[command] = (rank, total, last_used)
+
+            # A node only suggests commands longer than its prefix, so one that
+            # ends at a node (e.g. a bare 'git') can't hide longer ones
+            children = self.root
+            for depth, char in enumerate(command[:self.max_depth], 1):
+                longer = len(command) > depth
+                node = children.get(char)
+                if node is None:
+                    node = children[char] = [command if longer else None, {}]
+                elif longer and node[0] != command and (node[0] is None or self.ranks[node[0]][0] <= rank):
+                    node[0] = command
+                children = node[1]
+
+    def suggest(self, prefix):
+        """Best command starting with prefix (and longer than it), or None"""
+        if not prefix:
+            return None
+        children = self.root
+        node = None
+        for char in prefix[:self.max_depth]:
+            node = children.get(char)
+            if node is None:
+                return None
+            children = node[1]
+        best = node[0]
+        if best is not None and len(best) > len(prefix) and best.startswith(prefix):
+            return best
+        return None
@@ -1,17 +1,27 @@
+from startup import StartupTimer, run_in_background
+import asyncio
 import os
 import re
 import sys
 import subprocess
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
-import google.generativeai as genai
 import threading
+from concurrent.futures import CancelledError
+from output_stream import console_encoding, stream_process
+from process_group import interrupt_process, new_group_options
+from spill import SpillBuffer, SpillKeeper
+from render_pump import RenderPump
+from translation_cache import TranslationCache
+from fast_path import get_translator
+from llm_client import AsyncLLMClient
+from llm_provider import provider_from_environment
 
 GOOGLE_API_KEY = "Replace with your actual API key"  #Replace with your actual API key
 
 
 class NaturalLanguageTerminal:
-    def __init__(self, root):
+    def __init__(self, root, timer=None):
         self.root = root
         self.root.title("Easy Terminal for CMD")
         self.root.configure(bg='black')
@@ -28,6 +38,12 @@ class NaturalLanguageTerminal:
         # Current working directory
         self.current_directory = os.getcwd()
 
+        # Shell running the current command, for Ctrl+C
+        self.foreground_process = None
+
+        # Output too big to keep in memory stays in temporary files for a while
+        self.spill_keeper = SpillKeeper('cmd')
+
         # Create the terminal text area
         self.terminal = scrolledtext.ScrolledText(
             root,
@@ -38,13 +54,33 @@ class NaturalLanguageTerminal:
         )
         self.terminal.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
+        # Output from worker threads is batched onto the Tk thread
+        self.pump = RenderPump(self.root, self.write_output, self.scroll_to_end)
+
         # Terminal state tracking
         self.input_start = "1.0"
         self.input_active = False
         self.current_command = ""
 
-        # Setup Google Generative AI with Gemini
-        self.setup_genai()
+        # Setup the LLM provider (Google Generative AI with Gemini unless
+        # EASY_TERMINAL_LLM names another) on a background thread - importing
+        # it takes seconds, and only natural language queries need it
+        self.timer = timer or StartupTimer()
+        self.provider = None
+        self.setup_error = None
+        self.llm_ready = run_in_background(self.timer.timed, "LLM setup", self.setup_llm)
+
+        # Translations are cached in memory and on disk
+        self.translation_cache = TranslationCache()
+
+        # Common queries are translated locally without calling the LLM
+        self.fast_path = get_translator('cmd')
+
+        # cmd.exe writes in the console code page, not UTF-8
+        self.output_encoding = console_encoding()
+
+        # LLM requests run on an asyncio loop with deadlines and can be cancelled
+        self.llm_client = AsyncLLMClient()
 
         # Bind events
         self.terminal.bind('<Key>', self.handle_keypress)
@@ -78,17 +114,22 @@ class NaturalLanguageTerminal:
         # Set focus on terminal
         self.terminal.focus_set()
 
-    def setup_genai(self):
-        """Set up Google Generative AI with Gemini"""
+    def setup_llm(self):
+        """Set up the LLM provider"""
         try:
-            # Configure the API key
-            genai.configure(api_key=GOOGLE_API_KEY)
-
-            # Initialize the Gemini model
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+            self.provider = provider_from_environment(GOOGLE_API_KEY, 'genai')
 
         except Exception as e:
-            self.append_output(f"Error initializing Generative AI: {str(e)}\n")
+            self.provider = None
+            self.setup_error = f"Error initializing Generative AI: {str(e)}"
+
+    async def ask_llm(self, prompt):
+        """Query the model once it is ready - only queries that arrive early ever wait"""
+        # Shielded so that cancelling a request doesn't cancel the setup itself
+        await asyncio.shield(asyncio.wrap_future(self.llm_ready))
+        if self.provider is None:
+            raise RuntimeError(self.setup_error)
+        return await self.provider.agenerate(prompt)
 
     def disable_text_widget(self):
         """Disable user editing in areas they shouldn't edit"""
@@ -100,6 +141,10 @@ class NaturalLanguageTerminal:
 
     def display_prompt(self):
         """Display the terminal prompt with current directory"""
+        self.pump.call(self.draw_prompt)
+
+    def draw_prompt(self):
+        """Draw the prompt - runs on the Tk thread"""
         self.enable_text_widget()
         prompt = f"{self.current_directory}> "
         self.terminal.insert(tk.END, prompt)
@@ -108,9 +153,16 @@ class NaturalLanguageTerminal:
         self.input_active = True
 
     def append_output(self, text):
-        """Append output text to the terminal"""
+        """Append output text to the terminal (safe to call from any thread)"""
+        self.pump.put(text)
+
+    def write_output(self, text):
+        """Insert output text into the terminal - runs on the Tk thread"""
         self.enable_text_widget()
         self.terminal.insert(tk.END, text)
+
+    def scroll_to_end(self):
+        """Scroll the terminal to the latest output"""
         self.terminal.see(tk.END)
 
     def get_current_command(self):
@@ -151,6 +203,12 @@ class NaturalLanguageTerminal:
                 self.root.quit()
                 return "break"
 
+            # Startup time per phase
+            if command.lower() == ':startup':
+                self.append_output(self.timer.report())
+                self.display_prompt()
+                return "break"
+
             # Clear command handling
             if command.lower() in ['clear', 'cls']:
                 self.clear_terminal()
@@ -220,6 +278,15 @@ class NaturalLanguageTerminal:
 
     def handle_interrupt(self, event):
         """Handle Ctrl+C interrupt"""
+        # A running command gets Ctrl+Break, then its process tree is killed;
+        # the prompt comes back once it has ended
+        process = self.foreground_process
+        if process is not None:
+            threading.Thread(target=interrupt_process, args=(process,), daemon=True).start()
+            self.append_output("^C\n")
+            return "break"
+        # Cancel translations that are still waiting on the LLM
+        self.llm_client.cancel_all()
         self.append_output("\n^C\n")
         self.display_prompt()
         return "break"
@@ -302,16 +369,49 @@ class NaturalLanguageTerminal:
         command_type = self.detect_command_type(command)
 
         if command_type == 'cmd':
-            # Try to execute directly
-            output = self.execute_cmd_command(command)
-            self.append_output(output)
+            # Try to execute directly, streaming output as it arrives
+            self.stream_cmd_command(command, self.append_output)
         else:
             # Try to translate natural language to CMD
             self.append_output(f"Translating: {command}\n")
 
             try:
-                # Create prompt for Gemini
-                prompt = f"""
+                translated_command = self.translate_command(command)
+
+                # Check if it's already a valid command (no need for translation)
+                if translated_command == "VALID_COMMAND":
+                    self.append_output(f"Executing as-is: {command}\n")
+                    self.stream_cmd_command(command, self.append_output)
+                # Check for errors in translation
+                elif translated_command.startswith("ERROR:"):
+                    self.append_output(f"{translated_command}\n")
+                    self.display_prompt()
+                    return
+                # Execute the translated command
+                else:
+                    self.append_output(f"Executing: {translated_command}\n")
+                    self.stream_cmd_command(translated_command, self.append_output)
+
+            except CancelledError:
+                # Ctrl+C cancelled the translation and already drew a new prompt
+                return
+            except Exception as e:
+                self.append_output(f"Error processing command: {str(e)}\n")
+
+        self.display_prompt()
+
+    def translate_command(self, command):
+        """Translate natural language to CMD - local rules first, then the cache, then the LLM"""
+        translated_command = self.fast_path.translate(command)
+        if translated_command is not None:
+            return translated_command
+
+        translated_command = self.translation_cache.get(command, 'cmd', self.current_directory)
+        if translated_command is not None:
+            return translated_command
+
+        # Create prompt for Gemini
+        prompt = f"""
 You are an expert in translating natural language queries into Windows CMD commands.
 
 Current working directory: {self.current_directory}
@@ -331,35 +431,19 @@ there is no reasonable CMD command that can satisfy the request.
 
 If the query is asking for something that could be harmful or destructive, respond with 
 "ERROR: This command could be potentially harmful."
-                """
+        """
 
-                # Get response from Gemini
-                response = self.model.generate_content(prompt)
-                translated_command = response.text.strip()
+        # Get response from Gemini
+        response = self.llm_client.request(lambda: self.ask_llm(prompt))
+        translated_command = response.strip()
 
-                # Clean up response - remove any markdown or extra text that might appear
-                translated_command = self.clean_llm_response(translated_command)
+        # Clean up response - remove any markdown or extra text that might appear
+        translated_command = self.clean_llm_response(translated_command)
 
-                # Check if it's already a valid command (no need for translation)
-                if translated_command == "VALID_COMMAND":
-                    self.append_output(f"Executing as-is: {command}\n")
-                    output = self.execute_cmd_command(command)
-                # Check for errors in translation
-                elif translated_command.startswith("ERROR:"):
-                    self.append_output(f"{translated_command}\n")
-                    self.display_prompt()
-                    return
-                # Execute the translated command
-                else:
-                    self.append_output(f"Executing: {translated_command}\n")
-                    output = self.execute_cmd_command(translated_command)
-
-                self.append_output(output)
-
-            except Exception as e:
-                self.append_output(f"Error processing command: {str(e)}\n")
-
-        self.display_prompt()
+        # Errors are not cached so that they can be retried
+        if not translated_command.startswith("ERROR:"):
+            self.translation_cache.put(command, 'cmd', self.current_directory, translated_command)
+        return translated_command
 
     def clean_llm_response(self, response):
         """Clean LLM response from markdown, code blocks, or extra text"""
@@ -419,33 +503,66 @@ If the query is asking for something that could be harmful or destructive, respo
                 except Exception as e:
                     return f"Error listing directory: {str(e)}\n"
 
-            # For all other commands
+            # For all other commands - read as a stream, since communicate()
+            # would hold all of it in memory
             process = subprocess.Popen(
                 cmd_command,
                 shell=True,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=self.current_directory
+                stderr=subprocess.STDOUT,
+                cwd=self.current_directory,
+                **new_group_options()
             )
-            stdout, stderr = process.communicate()
-
-            if stderr:
-                return stderr
-            elif stdout:
-                return stdout
-            else:
-                return ""
+            output = SpillBuffer(keeper=self.spill_keeper)
+            self.foreground_process = process
+            try:
+                stream_process(process, output, encoding=self.output_encoding)
+            finally:
+                self.foreground_process = None
+            return output.text()
 
         except Exception as e:
             return f"Error executing command: {str(e)}\n"
 
+    def stream_cmd_command(self, cmd_command, on_output):
+        """Execute a CMD command, pushing its output to on_output as it arrives"""
+        try:
+            # Built-ins handled in-process have nothing to stream
+            if (cmd_command.strip().startswith("cd ") or cmd_command.strip() == "cd" or
+                    cmd_command.strip().lower() == "dir"):
+                on_output(self.execute_cmd_command(cmd_command))
+                return
+
+            process = subprocess.Popen(
+                cmd_command,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=self.current_directory,
+                **new_group_options()
+            )
+            self.foreground_process = process
+            try:
+                stream_process(process, on_output, encoding=self.output_encoding)
+            finally:
+                self.foreground_process = None
+
+        except Exception as e:
+            on_output(f"Error executing command: {str(e)}\n")
+
 
 def main():
+    timer = StartupTimer()
+    timer.mark("imports")
     root = tk.Tk()
     root.geometry("800x600")
-    app = NaturalLanguageTerminal(root)
+    timer.mark("Tk window")
+    app = NaturalLanguageTerminal(root, timer)
+    timer.mark("terminal and first prompt")
+    root.after_idle(timer.mark, "first frame")
     root.mainloop()
+    app.llm_client.close()
+    app.spill_keeper.close()
 
 
 if __name__ == "__main__":
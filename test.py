@@ -1,23 +1,43 @@
+from startup import StartupTimer, run_in_background
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import subprocess
 import os
-import google.generativeai as genai
+import queue
+import threading
+from output_stream import make_decoder, read_chunks
+from batch_translate import BatchTranslator, read_steps
+from process_group import interrupt_process, new_group_options
+from llm_provider import provider_from_environment
 
 # Hardcoded Gemini API key (replace with your actual key)
 GEMINI_API_KEY = "Replace with your actual API key"  # Replace with your key
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
 
 # Prompt for Bash script generation
 bash_prompt = "Generate a Bash script that accomplishes the following task: {task}. Provide only the script content without additional explanations or markdown just give me the command only command"
 
+# How often the terminal tab picks up streamed output, and how many chunks may
+# be waiting before the reader threads block
+OUTPUT_POLL_MS = 30
+OUTPUT_QUEUE_SIZE = 256
+
+def load_model():
+    """Set up the LLM provider (Gemini unless EASY_TERMINAL_LLM names another) - slow, so it runs on a background thread."""
+    return provider_from_environment(GEMINI_API_KEY, 'genai')
+
 class TerminalGUI(tk.Tk):
-    def __init__(self):
+    def __init__(self, timer=None):
         super().__init__()
+        self.timer = timer or StartupTimer()
+        self.timer.mark("Tk window")
+
+        # The model is only needed by the script generator, so the window
+        # doesn't wait for it
+        self.model_ready = run_in_background(self.timer.timed, "LLM setup", load_model)
 
         self.title("Custom Linux Terminal & Script Generator (Gemini)")
         self.geometry("800x500")
+        self.running_process = None
 
         # Create notebook (tabbed interface)
         self.notebook = ttk.Notebook(self)
@@ -48,6 +68,7 @@ class TerminalGUI(tk.Tk):
         self.terminal_output.bind("<KeyPress>", self.enforce_typing_restrictions)
         self.terminal_output.bind("<BackSpace>", self.prevent_deletion)
         self.terminal_output.bind("<Delete>", self.prevent_deletion)
+        self.terminal_output.bind("<Control-c>", self.interrupt_command)
 
         # Initial message
         self.terminal_output.insert(tk.END, "Created by Haider ♥\n", "header")
@@ -89,6 +110,8 @@ class TerminalGUI(tk.Tk):
         self.insert_prompt()
 
     def run_command(self, event):
+        if self.running_process is not None:
+            return "break"
         command = self.get_last_command()
         self.terminal_output.insert(tk.END, "\n")
         if not command.strip():
@@ -97,19 +120,64 @@ class TerminalGUI(tk.Tk):
         if command == "clear":
             self.clear_terminal()
             return "break"
+        if command == ":startup":
+            self.terminal_output.insert(tk.END, self.timer.report())
+            self.insert_prompt()
+            return "break"
         try:
-            process = subprocess.Popen(["bash", "-c", command], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            stdout, stderr = process.communicate()
-            if stdout:
-                self.terminal_output.insert(tk.END, stdout)
-            if stderr:
-                self.terminal_output.insert(tk.END, stderr, "error")
-                self.terminal_output.tag_config("error", foreground="red")
+            process = subprocess.Popen(["bash", "-c", command], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       **new_group_options())
         except Exception as e:
             self.terminal_output.insert(tk.END, f"Error: {e}", "error")
-        self.insert_prompt()
+            self.insert_prompt()
+            return "break"
+
+        # Stream stdout/stderr through a bounded queue so output shows up as it
+        # arrives and memory stays flat however much the command prints
+        self.running_process = process
+        self.output_queue = queue.Queue(maxsize=OUTPUT_QUEUE_SIZE)
+        self.open_streams = 2
+        threading.Thread(target=self.read_stream, args=(process.stdout, None), daemon=True).start()
+        threading.Thread(target=self.read_stream, args=(process.stderr, "error"), daemon=True).start()
+        self.after(OUTPUT_POLL_MS, self.poll_output)
         return "break"
 
+    def interrupt_command(self, event):
+        """Ctrl+C: signal the running command's process group, escalating to SIGKILL."""
+        if self.running_process is not None:
+            threading.Thread(target=interrupt_process, args=(self.running_process,), daemon=True).start()
+            self.terminal_output.insert(tk.END, "^C\n")
+        return "break"
+
+    def read_stream(self, stream, tag):
+        """Worker thread: push decoded chunks of a pipe onto the output queue."""
+        decoder = make_decoder()
+        for chunk in read_chunks(stream):
+            self.output_queue.put((decoder.decode(chunk), tag))
+        self.output_queue.put((decoder.decode(b"", final=True), tag))
+        self.output_queue.put((None, tag))
+
+    def poll_output(self):
+        """Move queued output into the terminal; runs on the Tk thread."""
+        try:
+            for _ in range(OUTPUT_QUEUE_SIZE):
+                text, tag = self.output_queue.get_nowait()
+                if text is None:
+                    self.open_streams -= 1
+                elif text:
+                    self.terminal_output.insert(tk.END, text, tag)
+        except queue.Empty:
+            pass
+        self.terminal_output.tag_config("error", foreground="red")
+        self.terminal_output.see(tk.END)
+
+        if self.open_streams == 0:
+            self.running_process.wait()
+            self.running_process = None
+            self.insert_prompt()
+        else:
+            self.after(OUTPUT_POLL_MS, self.poll_output)
+
     # SCRIPT GENERATOR FUNCTIONS
     def setup_script_generator(self):
         tk.Label(self.script_frame, text="Enter your task (e.g., 'List all .txt files'):").pack(pady=5)
@@ -117,6 +185,8 @@ class TerminalGUI(tk.Tk):
         self.script_entry.pack(pady=5)
 
         tk.Button(self.script_frame, text="Generate Script", command=self.generate_script).pack(pady=5)
+        tk.Button(self.script_frame, text="Generate From Steps File",
+                  command=self.generate_script_from_steps).pack(pady=5)
 
         tk.Label(self.script_frame, text="Generated Bash Script:").pack(pady=5)
         self.script_output = tk.Text(self.script_frame, height=10, width=60, bg="black", fg="red",
@@ -130,13 +200,46 @@ class TerminalGUI(tk.Tk):
         if not task:
             messagebox.showwarning("Input Error", "Please enter a task!")
             return
-        try:
-            response = model.generate_content(bash_prompt.format(task=task))
-            script = response.text.strip()
-            self.script_output.delete(1.0, tk.END)
-            self.script_output.insert(tk.END, script)
-        except Exception as e:
-            messagebox.showerror("API Error", f"Failed to generate script: {e}")
+        self.generate_in_background(
+            lambda: self.model_ready.result().generate(bash_prompt.format(task=task)).strip())
+
+    def generate_in_background(self, generate):
+        """Run generate() on a worker thread - waiting for the model and the LLM would freeze the window - and show the script it returns"""
+        def run():
+            try:
+                script = generate()
+            except Exception as e:
+                self.after(0, messagebox.showerror, "API Error", f"Failed to generate script: {e}")
+                return
+            self.after(0, self.show_script, script)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def show_script(self, script):
+        self.script_output.delete(1.0, tk.END)
+        self.script_output.insert(tk.END, script)
+
+    def generate_script_from_steps(self):
+        """Turn a file of natural-language steps into a script, translating the steps in batches."""
+        file_path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not file_path:
+            return
+        cwd = os.getcwd()
+
+        def generate():
+            steps = read_steps(file_path)
+            translator = BatchTranslator(self.model_ready.result().generate, 'bash')
+            commands = translator.translate(steps, cwd)
+            lines = []
+            for step, command in zip(steps, commands):
+                lines.append(f"# {step}")
+                if command.startswith("ERROR:"):
+                    lines.append(f"# {command}")
+                else:
+                    lines.append(step if command == "VALID_COMMAND" else command)
+            return "\n".join(lines)
+
+        self.generate_in_background(generate)
 
     def save_script(self):
         script_content = self.script_output.get(1.0, tk.END).strip()
@@ -151,5 +254,9 @@ class TerminalGUI(tk.Tk):
             messagebox.showinfo("Success", f"Script saved and made executable at {file_path}")
 
 if __name__ == "__main__":
-    app = TerminalGUI()
+    timer = StartupTimer()
+    timer.mark("imports")
+    app = TerminalGUI(timer)
+    timer.mark("tabs and first prompt")
+    app.after_idle(timer.mark, "first frame")
     app.mainloop()
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_index import CommandIndex
+from completion import MAX_MATCHES, Completer
+
+
+class CompleterTest(unittest.TestCase):
+    def test_truncated_matches_are_not_extended_past_what_all_share(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for number in range(2 * MAX_MATCHES):
+                open(os.path.join(directory, f"a{number:04d}"), "w").close()
+            start, matches, prefix = Completer().complete("cat a", directory)
+        self.assertEqual(len(matches), MAX_MATCHES)
+        self.assertEqual(prefix, "a")
+
+    def test_shared_prefix_below_the_word(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("report-2024.txt", "report-2025.txt"):
+                open(os.path.join(directory, name), "w").close()
+            result = Completer().complete("cat r", directory)
+        self.assertEqual(result, (4, ["report-2024.txt", "report-2025.txt"], "report-202"))
+
+    def test_command_names_without_io_use_the_index_as_it_is(self):
+        index = CommandIndex(path="")
+        completer = Completer(index)
+        self.assertIsNone(completer.complete("ech", "/", allow_io=False))
+        completer.complete("ech", "/")
+        index.refresh_seconds = 0
+        index.refresh = lambda: self.fail("refreshed on the calling thread")
+        completer.refresh_in_background = lambda: None
+        self.assertEqual(completer.complete("ech", "/", allow_io=False), (0, ["echo"], "echo"))
+
+
+if __name__ == "__main__":
+    unittest.main()
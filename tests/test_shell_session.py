@@ -0,0 +1,37 @@
+import os
+import shutil
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shell_session import BashSession
+
+
+@unittest.skipIf(shutil.which("bash") is None or os.name == 'nt', "needs bash")
+class BashSessionStateTest(unittest.TestCase):
+    def setUp(self):
+        self.session = BashSession(os.getcwd())
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_declared_variables_survive_to_the_next_command(self):
+        self.session.run('declare X=5; typeset -a A=(1 2); source <(echo "declare Y=7")')
+        output, status, _ = self.session.run('echo "X=$X A=${A[*]} Y=$Y"')
+        self.assertEqual(output, "X=5 A=1 2 Y=7\n")
+        self.assertEqual(status, 0)
+
+    def test_interrupting_a_builtin_loop_keeps_the_session(self):
+        self.session.run('export KEEP=1')
+        timer = threading.Timer(0.3, self.session.interrupt)
+        timer.start()
+        _, status, _ = self.session.run('while :; do :; done')
+        timer.join()
+        self.assertEqual(status, 130)
+        self.assertEqual(self.session.run('echo "$KEEP"')[0], "1\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from translation_cache import DATA_DIR
+
+# The trace file is rotated once it grows past this, keeping this many old files
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+# Durations kept per stage for ':stats'
+SESSION_SPANS = 10000
+
+# Stages in the order a command goes through them, for the report
+STAGES = ['classify', 'llm', 'clean', 'spawn', 'first_output', 'exit', 'render', 'command']
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    rank = max(int(len(values) * percent / 100.0 + 0.999999) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class Tracer:
+    """
+    Latency spans for each command: how long classification, the LLM call,
+    cleaning its response, spawning, the first output, the exit and the UI
+    render took. Every span is appended to a rotating JSONL file and kept in
+    memory for per-stage percentiles over the session. A trace groups the
+    spans of one command; start() makes it current for the calling thread,
+    and spans recorded on other threads (the LLM loop) pass it explicitly.
+    """
+
+    def __init__(self, path=None, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS,
+                 session_spans=SESSION_SPANS):
+        self.path = path or os.path.join(DATA_DIR, "trace.jsonl")
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.session_spans = session_spans
+        self.durations = {}
+        self.ids = itertools.count(1)
+        self.session = f"{os.getpid()}-{int(time.time())}"
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.file = None
+        self.enabled = True
+
+    def start(self):
+        """Begin a trace for a command on this thread; returns its id"""
+        trace = next(self.ids)
+        self.local.trace = trace
+        return trace
+
+    def finish(self):
+        """End this thread's trace"""
+        self.local.trace = None
+
+    def current(self):
+        """Id of this thread's trace, or None"""
+        return getattr(self.local, 'trace', None)
+
+    def record(self, stage, seconds, trace=None, **fields):
+        """Add a span that took seconds; trace defaults to this thread's"""
+        if not self.enabled:
+            return
+        span = {'session': self.session, 'trace': trace if trace is not None else self.current(),
+                'stage': stage, 'time': round(time.time(), 6), 'ms': round(seconds * 1000, 3)}
+        span.update(fields)
+        with self.lock:
+            stage_durations = self.durations.get(stage)
+            if stage_durations is None:
+                stage_durations = self.durations[stage] = deque(maxlen=self.session_spans)
+            stage_durations.append(seconds)
+            self.write(json.dumps(span))
+
+    @contextmanager
+    def span(self, stage, trace=None, **fields):
+        """Record how long the body of a with block takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, trace, **fields)
+
+    def watch_output(self, on_output, started, trace=None):
+        """on_output, recording a 'first_output' span (time since started) for the first text"""
+        seen = []
+
+        def write(text):
+            if not seen and text:
+                seen.append(True)
+                self.record('first_output', time.perf_counter() - started, trace)
+            on_output(text)
+
+        return write
+
+    def write(self, line):
+        """Append one line to the trace file, rotating it when full - holds self.lock"""
+        try:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(line + "\n")
+            self.file.flush()
+            if self.file.tell() > self.max_bytes:
+                self.rotate()
+        except OSError:
+            # Tracing must never break a command
+            pass
+
+    def rotate(self):
+        """trace.jsonl -> trace.jsonl.1 -> ... -> trace.jsonl.N, dropping the oldest"""
+        self.file.close()
+        self.file = None
+        for number in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{number}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{number + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def stats(self):
+        """
+        Per-stage latency for the session
+        Returns: {stage: (count, p50, p95, p99)} in seconds
+        """
+        with self.lock:
+            snapshot = {stage: sorted(values) for stage, values in self.durations.items()}
+        return {stage: (len(values),) + tuple(percentile(values, percent) for percent in PERCENTILES)
+                for stage, values in snapshot.items()}
+
+    def report(self):
+        """':stats' - percentiles per stage as text"""
+        stats = self.stats()
+        if not stats:
+            return "No commands traced yet\n"
+        stages = [stage for stage in STAGES if stage in stats] + sorted(set(stats) - set(STAGES))
+        lines = [f"{'stage':<14}{'count':>7}" + "".join(f"{f'p{percent}':>11}" for percent in PERCENTILES)]
+        for stage in stages:
+            count, *values = stats[stage]
+            lines.append(f"{stage:<14}{count:>7}" + "".join(f"{value * 1000:>8.1f} ms" for value in values))
+        lines.append(f"Spans are logged to {self.path}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """Close the trace file"""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,181 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Per-user data directory shared by the terminals
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".easy_terminal")
+
+# Defaults for the two cache tiers
+MEMORY_ENTRIES = 512
+DISK_ENTRIES = 20000
+TTL_SECONDS = 7 * 24 * 3600
+
+
+def normalize_query(query):
+    """Lower-case, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r'\s+', ' ', query.strip().lower()).rstrip('?.! ')
+
+
+class TranslationCache:
+    """
+    Two-tier cache for natural language -> command translations: an in-memory
+    LRU in front of a SQLite file. Entries are keyed on the normalized query,
+    the target shell and the working directory, and expire after ttl seconds.
+    """
+
+    def __init__(self, path=None, memory_entries=MEMORY_ENTRIES, disk_entries=DISK_ENTRIES,
+                 ttl=TTL_SECONDS):
+        self.path = path or os.path.join(DATA_DIR, "translations.db")
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        try:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, command TEXT NOT NULL, "
+                "created REAL NOT NULL, used REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS translations_used ON translations (used)")
+            self.db.commit()
+        except sqlite3.Error:
+            # Fall back to a memory-only cache if the disk tier can't be opened
+            self.db = None
+
+    @staticmethod
+    def make_key(query, shell, cwd):
+        """Cache key for a query translated for a shell in a directory"""
+        return f"{shell}\x00{cwd}\x00{normalize_query(query)}"
+
+    def get(self, query, shell, cwd):
+        """Return the cached command, or None on a miss"""
+        key = self.make_key(query, shell, cwd)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                command, created = entry
+                if now - created <= self.ttl:
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return command
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT command, created FROM translations WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    self.db.execute("UPDATE translations SET used = ? WHERE key = ?", (now, key))
+                    self.db.commit()
+                    self.remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, query, shell, cwd, command):
+        """Store a translation in both tiers"""
+        key = self.make_key(query, shell, cwd)
+        now = time.time()
+        with self.lock:
+            self.remember(key, command, now)
+            if self.db is None:
+                return
+            self.db.execute(
+                "INSERT OR REPLACE INTO translations (key, command, created, used) VALUES (?, ?, ?, ?)",
+                (key, command, now, now)
+            )
+            self.writes += 1
+            # Size-based eviction of the least recently used rows, checked now and then
+            if self.writes % 100 == 1:
+                self.db.execute("DELETE FROM translations WHERE created < ?", (now - self.ttl,))
+                self.db.execute(
+                    "DELETE FROM translations WHERE key IN ("
+                    "SELECT key FROM translations ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_entries,)
+                )
+            self.db.commit()
+
+    def remember(self, key, command, created):
+        """Add an entry to the memory tier, evicting the least recently used"""
+        self.memory[key] = (command, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def recent_queries(self, shell, limit):
+        """Normalized queries cached for a shell, most recently used first"""
+        with self.lock:
+            if self.db is None:
+                keys = [key for key in reversed(self.memory) if key.startswith(f"{shell}\x00")]
+            else:
+                keys = [row[0] for row in self.db.execute(
+                    "SELECT key FROM translations WHERE key >= ? AND key < ? ORDER BY used DESC LIMIT ?",
+                    (f"{shell}\x00", f"{shell}\x01", limit)
+                )]
+        # The same query may be cached for several directories
+        return list(dict.fromkeys(key.rsplit("\x00", 1)[-1] for key in keys[:limit]))
+
+    def invalidate(self, query=None, shell=None, cwd=None):
+        """
+        Drop one entry (query, shell and cwd given), every entry for a shell
+        (only shell given) or the whole cache (nothing given)
+        Returns: the number of disk entries removed
+        """
+        with self.lock:
+            if query is not None:
+                key = self.make_key(query, shell, cwd)
+                self.memory.pop(key, None)
+                where, args = "key = ?", (key,)
+            elif shell is not None:
+                prefix = f"{shell}\x00"
+                for key in [key for key in self.memory if key.startswith(prefix)]:
+                    del self.memory[key]
+                where, args = "key >= ? AND key < ?", (prefix, f"{shell}\x01")
+            else:
+                self.memory.clear()
+                where, args = "1", ()
+
+            if self.db is None:
+                return 0
+            removed = self.db.execute(f"DELETE FROM translations WHERE {where}", args).rowcount
+            self.db.commit()
+            return removed
+
+    def stats(self):
+        """Hit/miss counters and tier sizes"""
+        with self.lock:
+            disk_size = 0
+            if self.db is not None:
+                disk_size = self.db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'disk_entries': disk_size,
+            }
+
+    def close(self):
+        """Close the disk tier"""
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
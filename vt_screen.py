@@ -0,0 +1,577 @@
+import re
+from array import array
+
+# Columns used for output that isn't on a pseudo-terminal - long lines are
+# left to the widget to wrap instead of being broken up here
+LINE_MODE_COLUMNS = 2048
+
+# Distinct attribute sets kept per screen; later ones fall back to the default
+MAX_ATTRIBUTES = 1024
+
+# An escape sequence split across two reads is held back until the rest
+# arrives, as long as it is shorter than this
+MAX_SEQUENCE = 256
+
+# Cells hold codepoints in 4-byte items
+CELL_TYPE = 'I' if array('I').itemsize == 4 else 'L'
+BLANK = ord(' ')
+
+# The 16 basic colors (xterm defaults)
+ANSI_COLORS = ['#000000', '#cd0000', '#00cd00', '#cdcd00', '#0000ee', '#cd00cd', '#00cdcd', '#e5e5e5',
+               '#7f7f7f', '#ff0000', '#00ff00', '#ffff00', '#5c5cff', '#ff00ff', '#00ffff', '#ffffff']
+
+# Attributes are (foreground, background, bold, underline, reverse); None is the widget's color
+DEFAULT_ATTRIBUTE = (None, None, False, False, False)
+
+# Control sequences, titles and charset selections, two-character escapes,
+# a newline followed by whole lines of plain text, and C0 controls
+CONTROL_PATTERN = re.compile(
+    r'\x1b\[([\x30-\x3f]*)[\x20-\x2f]*([\x40-\x7e])'
+    r'|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)'
+    r'|\x1b[\x20-\x2f]+[\x30-\x7e]'
+    r'|\x1b[\x30-\x5a\x5c\x5e-\x7e]'
+    r'|\n((?:[^\x00-\x1f\x7f]*\n)+)'
+    r'|[\x00-\x1f\x7f]'
+)
+
+# Private modes that switch to the alternate screen
+ALTERNATE_SCREEN_MODES = ('47', '1047', '1049')
+
+
+def color_256(number):
+    """Hex color for an index into the xterm 256-color palette"""
+    if number < 16:
+        return ANSI_COLORS[number]
+    if number < 232:
+        number -= 16
+        levels = [0 if level == 0 else 55 + 40 * level for level in (number // 36, number // 6 % 6, number % 6)]
+        return '#%02x%02x%02x' % tuple(levels)
+    gray = 8 + (number - 232) * 10
+    return '#%02x%02x%02x' % (gray, gray, gray)
+
+
+def to_cells(text):
+    """Codepoints of text as an array of cells"""
+    cells = array(CELL_TYPE)
+    cells.frombytes(text.encode('utf-32-le', 'replace'))
+    return cells
+
+
+def cells_to_text(cells):
+    """Inverse of to_cells"""
+    return cells.tobytes().decode('utf-32-le', 'replace')
+
+
+class Screen:
+    """
+    A VT100/xterm screen: escape sequences fed in are applied to rows of
+    cells, each held as two compact arrays - codepoints, and indexes into a
+    table of attribute sets. Rows that changed are collected in dirty, and
+    lines scrolled off the top of the main screen in history, so a view
+    only has to redraw what changed.
+    """
+
+    def __init__(self, rows=24, cols=LINE_MODE_COLUMNS, newline_mode=True):
+        self.attributes = [DEFAULT_ATTRIBUTE]
+        self.attribute_ids = {DEFAULT_ATTRIBUTE: 0}
+        # Pipes send a bare '\n' for a new line; on a pty the line
+        # discipline has already turned it into '\r\n'
+        self.newline_mode = newline_mode
+        self.rows = max(rows, 1)
+        self.cols = max(cols, 1)
+        self.responses = []
+        self.reset()
+
+    def reset(self):
+        """Clear the screen and forget every mode - attribute ids stay valid"""
+        self.chars = [self.blank_chars() for _ in range(self.rows)]
+        self.attrs = [self.blank_attrs() for _ in range(self.rows)]
+        # Highest column written per row, so trailing blanks needn't be scanned
+        self.widths = [0] * self.rows
+        self.x = 0
+        self.y = 0
+        self.attr = 0
+        self.top = 0
+        self.bottom = self.rows - 1
+        self.autowrap = True
+        self.app_cursor_keys = False
+        self.saved_cursor = (0, 0, 0)
+        self.main_screen = None   # saved main screen while the alternate one is shown
+        self.partial = ""
+        self.history = []
+        self.dirty = set()
+        self.redraw = True
+
+    def blank_chars(self, count=None):
+        return array(CELL_TYPE, [BLANK]) * (self.cols if count is None else count)
+
+    def blank_attrs(self, count=None, attr=0):
+        return array('H', [attr]) * (self.cols if count is None else count)
+
+    @property
+    def alternate(self):
+        """True while a full-screen program has the alternate screen"""
+        return self.main_screen is not None
+
+    def resize(self, rows, cols):
+        """Change the size, keeping what fits and the rows around the cursor"""
+        rows, cols = max(rows, 1), max(cols, 1)
+        if (rows, cols) == (self.rows, self.cols):
+            return
+        if cols != self.cols:
+            for r in range(self.rows):
+                if cols < self.cols:
+                    del self.chars[r][cols:]
+                    del self.attrs[r][cols:]
+                    self.widths[r] = min(self.widths[r], cols)
+                else:
+                    self.chars[r].extend(self.blank_chars(cols - self.cols))
+                    self.attrs[r].extend(self.blank_attrs(cols - self.cols))
+            self.cols = cols
+        if rows < self.rows:
+            # Drop rows from the top, as a terminal does, so the cursor stays on screen
+            extra = max(self.y + 1 - rows, 0)
+            if extra and not self.alternate:
+                self.history.extend(self.line(r) for r in range(extra))
+            del self.chars[:extra], self.attrs[:extra], self.widths[:extra]
+            del self.chars[rows:], self.attrs[rows:], self.widths[rows:]
+            self.y -= extra
+        else:
+            for _ in range(rows - self.rows):
+                self.chars.append(self.blank_chars())
+                self.attrs.append(self.blank_attrs())
+                self.widths.append(0)
+        self.rows = rows
+        self.top, self.bottom = 0, rows - 1
+        self.x = min(self.x, cols - 1)
+        self.y = min(self.y, rows - 1)
+        self.redraw = True
+
+    def feed(self, text):
+        """Apply output from a command"""
+        if self.partial:
+            text = self.partial + text
+            self.partial = ""
+        position = 0
+        for match in CONTROL_PATTERN.finditer(text):
+            start = match.start()
+            if start > position:
+                self.write(text[position:start])
+            position = match.end()
+            sequence = match.group()
+            if sequence == '\x1b':
+                # Possibly the start of a sequence whose rest hasn't arrived yet
+                if len(text) - start < MAX_SEQUENCE:
+                    self.partial = text[start:]
+                    return
+                continue
+            if match.group(3) is not None:
+                self.control('\n')
+                self.write_lines(match.group(3)[:-1].split('\n'))
+            elif len(sequence) == 1:
+                self.control(sequence)
+            elif sequence[1] == '[':
+                self.csi(match.group(1), match.group(2))
+            elif len(sequence) == 2:
+                self.escape(sequence[1])
+        if position < len(text):
+            self.write(text[position:])
+
+    def write(self, text):
+        """Put printable text at the cursor, wrapping at the right margin"""
+        while text:
+            if self.x >= self.cols:
+                if self.autowrap:
+                    self.x = 0
+                    self.index()
+                else:
+                    self.x = self.cols - 1
+            count = min(len(text), self.cols - self.x)
+            x, row = self.x, self.y
+            self.chars[row][x:x + count] = to_cells(text[:count])
+            self.attrs[row][x:x + count] = self.blank_attrs(count, self.attr)
+            self.x = x + count
+            if self.x > self.widths[row]:
+                self.widths[row] = self.x
+            self.dirty.add(row)
+            text = text[count:]
+
+    def write_lines(self, lines):
+        """
+        Write whole lines of plain text, each followed by a newline. Plain
+        output appended at the bottom is the common case, and lines that would
+        scroll straight off the screen go to history without being drawn.
+        """
+        scrolled = self.y + len(lines) - (self.rows - 1)
+        if scrolled <= 0 or not self.appending() or any(len(line) > self.cols for line in lines):
+            for line in lines:
+                self.write(line)
+                self.control('\n')
+            return
+        old = min(scrolled, self.y)
+        attr = self.attr
+        self.history.extend(self.line(row) for row in range(old))
+        for line in lines[:scrolled - old]:
+            if not attr:
+                line = line.rstrip(' ')
+            self.history.append([(line, attr)] if line else [])
+        # The screen keeps what is left of its rows, then the last lines, then the cursor's empty row
+        self.chars, self.attrs, self.widths = self.chars[old:self.y], self.attrs[old:self.y], self.widths[old:self.y]
+        for line in lines[scrolled - old:] + [""]:
+            self.chars.append(to_cells(line) + self.blank_chars(self.cols - len(line)))
+            self.attrs.append(self.blank_attrs(len(line), attr) + self.blank_attrs(self.cols - len(line)))
+            self.widths.append(len(line))
+        self.x, self.y = 0, self.rows - 1
+        self.redraw = True
+
+    def appending(self):
+        """True when the cursor is at the start of an empty last line of plain output on the main screen"""
+        return (self.newline_mode and not self.alternate and self.x == 0 and
+                (self.top, self.bottom) == (0, self.rows - 1) and not any(self.widths[self.y:]))
+
+    def control(self, char):
+        """C0 control characters"""
+        if char in '\n\x0b\x0c':
+            if self.newline_mode:
+                self.x = 0
+            self.index()
+        elif char == '\r':
+            self.x = 0
+        elif char == '\b':
+            self.x = max(min(self.x, self.cols - 1) - 1, 0)
+        elif char == '\t':
+            self.x = min((self.x // 8 + 1) * 8, self.cols - 1)
+
+    def escape(self, char):
+        """Two-character escape sequences"""
+        if char == '7':
+            self.saved_cursor = (self.x, self.y, self.attr)
+        elif char == '8':
+            self.x, self.y, self.attr = self.saved_cursor
+            self.clamp_cursor()
+        elif char == 'D':
+            self.index()
+        elif char == 'E':
+            self.x = 0
+            self.index()
+        elif char == 'M':
+            self.reverse_index()
+        elif char == 'c':
+            self.reset()
+
+    def csi(self, parameters, final):
+        """Control sequences - ESC [ parameters final"""
+        private = parameters[:1] in ('?', '>', '=', '<')
+        if private:
+            marker, parameters = parameters[0], parameters[1:]
+        numbers = [int(number) if number.isdigit() else 0 for number in re.split('[;:]', parameters)]
+        count = max(numbers[0], 1)
+
+        if private:
+            if final in 'hl' and marker == '?':
+                self.private_modes(parameters.split(';'), final == 'h')
+            elif final == 'c':
+                # Secondary device attributes: an xterm
+                self.responses.append('\x1b[>0;276;0c')
+            return
+
+        if final == 'm':
+            self.select_graphic_rendition(numbers)
+        elif final == 'A':
+            self.y = max(self.y - count, self.top if self.y >= self.top else 0)
+            self.x = min(self.x, self.cols - 1)
+        elif final in 'Be':
+            self.y = min(self.y + count, self.bottom if self.y <= self.bottom else self.rows - 1)
+            self.x = min(self.x, self.cols - 1)
+        elif final in 'Ca':
+            self.x = min(self.x + count, self.cols - 1)
+        elif final == 'D':
+            self.x = max(min(self.x, self.cols - 1) - count, 0)
+        elif final in 'EF':
+            self.y = min(self.y + count, self.bottom) if final == 'E' else max(self.y - count, self.top)
+            self.x = 0
+        elif final in 'G`':
+            self.x = min(count, self.cols) - 1
+        elif final in 'Hf':
+            self.y = min(count, self.rows) - 1
+            self.x = min(max(numbers[1], 1) if len(numbers) > 1 else 1, self.cols) - 1
+        elif final == 'd':
+            self.y = min(count, self.rows) - 1
+        elif final == 'J':
+            self.erase_display(numbers[0])
+        elif final == 'K':
+            self.erase_line(numbers[0])
+        elif final == 'X':
+            x = min(self.x, self.cols - 1)
+            self.erase(self.y, x, min(x + count, self.cols))
+        elif final == 'P':
+            self.delete_chars(count)
+        elif final == '@':
+            self.insert_chars(count)
+        elif final == 'L':
+            if self.top <= self.y <= self.bottom:
+                self.scroll_down(count, self.y)
+        elif final == 'M':
+            if self.top <= self.y <= self.bottom:
+                self.scroll_up(count, self.y)
+        elif final == 'S':
+            self.scroll_up(count)
+        elif final == 'T':
+            self.scroll_down(count)
+        elif final == 'r':
+            top = max(numbers[0], 1) - 1
+            bottom = (numbers[1] if len(numbers) > 1 and numbers[1] else self.rows) - 1
+            if top < bottom < self.rows:
+                self.top, self.bottom = top, bottom
+                self.x, self.y = 0, 0
+        elif final == 's':
+            self.saved_cursor = (self.x, self.y, self.attr)
+        elif final == 'u':
+            self.x, self.y, self.attr = self.saved_cursor
+            self.clamp_cursor()
+        elif final == 'n':
+            # Device status reports - programs wait for the answers
+            if numbers[0] == 5:
+                self.responses.append('\x1b[0n')
+            elif numbers[0] == 6:
+                self.responses.append(f'\x1b[{self.y + 1};{min(self.x, self.cols - 1) + 1}R')
+        elif final == 'c' and numbers[0] == 0:
+            self.responses.append('\x1b[?1;2c')
+
+    def private_modes(self, modes, enable):
+        """DEC private modes set with ESC [ ? n h and reset with ESC [ ? n l"""
+        for mode in modes:
+            if mode == '1':
+                self.app_cursor_keys = enable
+            elif mode == '7':
+                self.autowrap = enable
+            elif mode in ALTERNATE_SCREEN_MODES:
+                if mode == '1049' and enable:
+                    self.saved_cursor = (self.x, self.y, self.attr)
+                self.switch_screen(enable)
+                if mode == '1049' and not enable:
+                    self.x, self.y, self.attr = self.saved_cursor
+                    self.clamp_cursor()
+
+    def switch_screen(self, alternate):
+        """Show a blank alternate screen, or go back to the saved main one"""
+        if alternate == self.alternate:
+            return
+        if alternate:
+            self.main_screen = (self.chars, self.attrs, self.widths)
+            self.chars = [self.blank_chars() for _ in range(self.rows)]
+            self.attrs = [self.blank_attrs() for _ in range(self.rows)]
+            self.widths = [0] * self.rows
+        else:
+            self.chars, self.attrs, self.widths = self.main_screen
+            self.main_screen = None
+        self.top, self.bottom = 0, self.rows - 1
+        self.redraw = True
+
+    def select_graphic_rendition(self, numbers):
+        """ESC [ ... m - colors and text styles"""
+        foreground, background, bold, underline, reverse = self.attributes[self.attr]
+        i = 0
+        while i < len(numbers):
+            number = numbers[i]
+            if number == 0:
+                foreground, background, bold, underline, reverse = DEFAULT_ATTRIBUTE
+            elif number == 1:
+                bold = True
+            elif number == 22:
+                bold = False
+            elif number == 4:
+                underline = True
+            elif number == 24:
+                underline = False
+            elif number == 7:
+                reverse = True
+            elif number == 27:
+                reverse = False
+            elif 30 <= number <= 37:
+                foreground = ANSI_COLORS[number - 30]
+            elif 90 <= number <= 97:
+                foreground = ANSI_COLORS[number - 90 + 8]
+            elif number == 39:
+                foreground = None
+            elif 40 <= number <= 47:
+                background = ANSI_COLORS[number - 40]
+            elif 100 <= number <= 107:
+                background = ANSI_COLORS[number - 100 + 8]
+            elif number == 49:
+                background = None
+            elif number in (38, 48) and i + 1 < len(numbers):
+                # 38;5;n (256 colors) or 38;2;r;g;b (true color)
+                color = None
+                if numbers[i + 1] == 5 and i + 2 < len(numbers):
+                    color = color_256(min(numbers[i + 2], 255))
+                    i += 2
+                elif numbers[i + 1] == 2 and i + 4 < len(numbers):
+                    color = '#%02x%02x%02x' % tuple(min(value, 255) for value in numbers[i + 2:i + 5])
+                    i += 4
+                if number == 38:
+                    foreground = color
+                else:
+                    background = color
+            i += 1
+        self.attr = self.attribute_id((foreground, background, bold, underline, reverse))
+
+    def attribute_id(self, attribute):
+        """Index of an attribute set in self.attributes, adding it if it's new"""
+        index = self.attribute_ids.get(attribute)
+        if index is None:
+            if len(self.attributes) >= MAX_ATTRIBUTES:
+                return 0
+            index = len(self.attributes)
+            self.attributes.append(attribute)
+            self.attribute_ids[attribute] = index
+        return index
+
+    def erase_attr(self):
+        """Erased cells keep the current background color, like xterm"""
+        background = self.attributes[self.attr][1]
+        return 0 if background is None else self.attribute_id((None, background, False, False, False))
+
+    def clamp_cursor(self):
+        self.x = min(max(self.x, 0), self.cols - 1)
+        self.y = min(max(self.y, 0), self.rows - 1)
+
+    def index(self):
+        """Move the cursor down a line, scrolling at the bottom margin"""
+        if self.y == self.bottom:
+            self.scroll_up(1)
+        elif self.y < self.rows - 1:
+            self.y += 1
+
+    def reverse_index(self):
+        """Move the cursor up a line, scrolling at the top margin"""
+        if self.y == self.top:
+            self.scroll_down(1)
+        elif self.y > 0:
+            self.y -= 1
+
+    def scroll_up(self, count, top=None):
+        """Scroll the rows from top to the bottom margin up; lines leaving the main screen go to history"""
+        top = self.top if top is None else top
+        count = min(count, self.bottom + 1 - top)
+        if top == 0 and not self.alternate:
+            self.history.extend(self.line(r) for r in range(count))
+        self.move_rows(top, self.bottom + 1, top + count, top)
+
+    def scroll_down(self, count, top=None):
+        """Scroll the rows from top to the bottom margin down, opening blank lines at top"""
+        top = self.top if top is None else top
+        count = min(count, self.bottom + 1 - top)
+        self.move_rows(top, self.bottom + 1, top, top + count)
+
+    def move_rows(self, start, end, source, target):
+        """Within rows start..end-1, move the rows from source to target and blank the rest"""
+        count = abs(target - source)
+        for rows, blank in ((self.chars, self.blank_chars), (self.attrs, self.blank_attrs), (self.widths, int)):
+            fresh = [blank() for _ in range(count)]
+            if source > target:
+                del rows[start:start + count]
+                rows[end - count:end - count] = fresh
+            else:
+                del rows[end - count:end]
+                rows[start:start] = fresh
+        self.redraw = True
+
+    def erase(self, row, start, end):
+        """Blank columns start..end-1 of a row"""
+        if start >= end:
+            return
+        self.chars[row][start:end] = self.blank_chars(end - start)
+        self.attrs[row][start:end] = self.blank_attrs(end - start, self.erase_attr())
+        if self.attrs[row][start] and end > self.widths[row]:
+            self.widths[row] = end
+        self.dirty.add(row)
+
+    def erase_line(self, mode):
+        x = min(self.x, self.cols - 1)
+        if mode == 0:
+            self.erase(self.y, x, self.cols)
+        elif mode == 1:
+            self.erase(self.y, 0, x + 1)
+        else:
+            self.erase(self.y, 0, self.cols)
+
+    def erase_display(self, mode):
+        if mode == 0:
+            self.erase_line(0)
+            rows = range(self.y + 1, self.rows)
+        elif mode == 1:
+            self.erase_line(1)
+            rows = range(0, self.y)
+        else:
+            rows = range(self.rows)
+        for row in rows:
+            self.erase(row, 0, self.cols)
+
+    def delete_chars(self, count):
+        """Delete characters at the cursor, pulling the rest of the line left"""
+        x = min(self.x, self.cols - 1)
+        count = min(count, self.cols - x)
+        for rows, blank in ((self.chars, self.blank_chars(count)), (self.attrs, self.blank_attrs(count))):
+            del rows[self.y][x:x + count]
+            rows[self.y].extend(blank)
+        self.dirty.add(self.y)
+
+    def insert_chars(self, count):
+        """Insert blanks at the cursor, pushing the rest of the line right"""
+        x = min(self.x, self.cols - 1)
+        count = min(count, self.cols - x)
+        for rows, blank in ((self.chars, self.blank_chars(count)), (self.attrs, self.blank_attrs(count))):
+            rows[self.y][x:x] = blank
+            del rows[self.y][self.cols:]
+        self.widths[self.y] = min(self.widths[self.y] + count, self.cols)
+        self.dirty.add(self.y)
+
+    def line(self, row):
+        """
+        The text of a row as attribute runs, without trailing blanks
+        Returns: a list of (text, attribute id) pairs
+        """
+        chars, attrs = self.chars[row], self.attrs[row]
+        end = self.widths[row]
+        while end and chars[end - 1] == BLANK and not attrs[end - 1]:
+            end -= 1
+        if not attrs[:end].tobytes().strip(b'\0'):
+            # Plain text - the common case
+            return [(cells_to_text(chars[:end]), 0)] if end else []
+        runs = []
+        start = 0
+        for column in range(1, end + 1):
+            if column == end or attrs[column] != attrs[start]:
+                runs.append((cells_to_text(chars[start:column]), attrs[start]))
+                start = column
+        return runs
+
+    def used_rows(self):
+        """Rows worth showing: up to the cursor or the last one written, or all of them on the alternate screen"""
+        if self.alternate:
+            return self.rows
+        used = self.y + 1
+        for row in range(self.rows - 1, self.y, -1):
+            if self.widths[row]:
+                return row + 1
+        return used
+
+    def take_history(self):
+        """Lines scrolled off the main screen since the last call"""
+        history, self.history = self.history, []
+        return history
+
+    def take_dirty(self):
+        """
+        Rows changed since the last call
+        Returns: (redraw, rows) - redraw is True when every row has to be drawn again
+        """
+        redraw, dirty = self.redraw, self.dirty
+        self.redraw, self.dirty = False, set()
+        return redraw, dirty
+
+    def take_responses(self):
+        """Replies to status queries, to be written back to the program"""
+        responses, self.responses = self.responses, []
+        return "".join(responses)